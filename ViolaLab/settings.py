@@ -194,3 +194,32 @@ BUNDESLIGA_BENCH_CSV = os.environ.get(
     "BUNDESLIGA_BENCH_CSV",
     str(BASE_DIR / "data" / "top6_overall_mean_last5_all_metrics_first22.csv"),
 )
+
+# Teams-Dashboard: wie lange (Sekunden) der Datenstand einer Liga für
+# vorberechnete Quantile als gültig gilt
+TEAMS_DATA_VERSION_TTL = int(os.getenv("TEAMS_DATA_VERSION_TTL", "60"))
+# Verzeichnis der memory-mapped Matrizen je Liga (manage.py build_team_matrices)
+TEAMS_MATRIX_DIR = os.getenv("TEAMS_MATRIX_DIR", str(BASE_DIR / "data" / "team_matrices"))
+
+# ------------------------------------------------------------
+# Players-App: Datenzugriff (Schema-Registry, Spieler-ID-Listen)
+# ------------------------------------------------------------
+# Beim ersten Request eines Workers im Hintergrund laden; nach TTL (Sekunden, 0 = nie) neu einlesen.
+# Schemaänderungen (z. B. refresh_player_positions) erreichen laufende Worker
+# nur über diese TTL, das Signal gilt nur im sendenden Prozess.
+PLAYERS_SCHEMA_WARMUP = env_bool("PLAYERS_SCHEMA_WARMUP", True)
+PLAYERS_SCHEMA_TTL = int(os.getenv("PLAYERS_SCHEMA_TTL", "300"))
+# Ab so vielen Spieler-IDs laufen Abfragen über eine Temp-Tabelle statt IN (...)
+PLAYERS_ID_TABLE_THRESHOLD = int(os.getenv("PLAYERS_ID_TABLE_THRESHOLD", "200"))
+# Threads für parallele Abfragen der async Dashboard-View (je Thread eine DB-Verbindung)
+PLAYERS_DB_POOL_SIZE = int(os.getenv("PLAYERS_DB_POOL_SIZE", "4"))
+# Nur die Pool-Threads halten ihre Verbindung so lange (Sekunden) offen, mit
+# Health-Check vor der ersten Abfrage nach einer Pause; Request-Verbindungen
+# bleiben beim Django-Standard (CONN_MAX_AGE=0, Schließen am Request-Ende)
+PLAYERS_DB_POOL_CONN_MAX_AGE = int(os.getenv("PLAYERS_DB_POOL_CONN_MAX_AGE", "300"))
+# Wie lange (Sekunden) der Datenstand einer Liga/Saison für ETag/304 gilt
+PLAYERS_DATA_VERSION_TTL = int(os.getenv("PLAYERS_DATA_VERSION_TTL", "60"))
+# Spieler-Suchindex (alle Ligen/Saisons) beim ersten Request im Hintergrund aufbauen
+PLAYERS_SEARCH_WARMUP = env_bool("PLAYERS_SEARCH_WARMUP", True)
+# Karriere-Ansicht: Cache je Spieler (Sekunden)
+PLAYERS_CAREER_CACHE_TTL = int(os.getenv("PLAYERS_CAREER_CACHE_TTL", "900"))
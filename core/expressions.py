@@ -0,0 +1,191 @@
+"""Small expression language for derived metrics.
+
+A derived metric combines base columns with ``+ - * /``, parentheses,
+unary minus, numeric literals and the functions ``abs``, ``min`` and ``max``,
+e.g. ``(np_xg + xa) / 90s_played``.  Column names may start with a digit.
+
+Expressions are parsed and validated once (at import of the label modules)
+and compiled into a tree of NumPy closures; evaluation works on whole
+columns.  Division by zero and every other non-finite result becomes NaN,
+NaN inputs propagate.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Collection, Mapping, Sequence
+
+import numpy as np
+
+_Evaluator = Callable[[Mapping[str, np.ndarray]], np.ndarray]
+
+_TOKEN = re.compile(
+    r"\s*(?:(?P<number>\d+(?:\.\d+)?(?![A-Za-z0-9_]))|(?P<name>[A-Za-z0-9_]+)|(?P<op>[-+*/(),]))"
+)
+_BINARY = {"+": np.add, "-": np.subtract, "*": np.multiply, "/": np.divide}
+_FUNCTIONS: dict[str, tuple[int, Callable[..., np.ndarray]]] = {
+    "abs": (1, np.abs),
+    "min": (2, np.minimum),
+    "max": (2, np.maximum),
+}
+
+
+class ExpressionError(ValueError):
+    """Invalid derived-metric expression (syntax or unknown column)."""
+
+
+@dataclass(frozen=True, slots=True)
+class DerivedMetric:
+    key: str
+    expression: str
+    columns: tuple[str, ...]
+    _evaluator: _Evaluator = field(repr=False, compare=False)
+
+    def evaluate(self, columns: Mapping[str, Sequence[float] | np.ndarray]) -> np.ndarray:
+        """Evaluate over *columns* (base column -> equally long values)."""
+        arrays = {name: np.asarray(columns[name], dtype=np.float64) for name in self.columns}
+        with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+            result = np.array(self._evaluator(arrays), dtype=np.float64)
+        result[~np.isfinite(result)] = np.nan
+        return result
+
+
+def _tokenize(expression: str) -> list[tuple[str, str]]:
+    tokens: list[tuple[str, str]] = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if match is None:
+            raise ExpressionError(
+                f"Unexpected character at {position}: {expression[position:]!r}"
+            )
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive descent over the token list; every rule returns an evaluator."""
+
+    def __init__(self, expression: str, known_columns: Collection[str]) -> None:
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.position = 0
+        self.known_columns = known_columns
+        self.columns: dict[str, None] = {}
+
+    def parse(self) -> _Evaluator:
+        evaluator = self._sum()
+        if self.position != len(self.tokens):
+            raise ExpressionError(f"Unexpected token {self._peek()!r} in {self.expression!r}")
+        if not self.columns:
+            raise ExpressionError(f"Expression references no column: {self.expression!r}")
+        return evaluator
+
+    def _peek(self) -> str | None:
+        return self.tokens[self.position][1] if self.position < len(self.tokens) else None
+
+    def _take(self, expected: str | None = None) -> tuple[str, str]:
+        if self.position >= len(self.tokens):
+            raise ExpressionError(f"Incomplete expression: {self.expression!r}")
+        token = self.tokens[self.position]
+        if expected is not None and token[1] != expected:
+            raise ExpressionError(f"Expected {expected!r}, got {token[1]!r} in {self.expression!r}")
+        self.position += 1
+        return token
+
+    def _binary(self, operators: str, operand: Callable[[], _Evaluator]) -> _Evaluator:
+        evaluator = operand()
+        while self._peek() is not None and self._peek() in operators:
+            operation = _BINARY[self._take()[1]]
+            left, right = evaluator, operand()
+            evaluator = lambda columns, op=operation, a=left, b=right: op(a(columns), b(columns))
+        return evaluator
+
+    def _sum(self) -> _Evaluator:
+        return self._binary("+-", self._product)
+
+    def _product(self) -> _Evaluator:
+        return self._binary("*/", self._unary)
+
+    def _unary(self) -> _Evaluator:
+        if self._peek() == "-":
+            self._take()
+            operand = self._unary()
+            return lambda columns: np.negative(operand(columns))
+        return self._atom()
+
+    def _atom(self) -> _Evaluator:
+        kind, value = self._take()
+        if kind == "number":
+            number = float(value)
+            return lambda columns: number
+        if value == "(":
+            evaluator = self._sum()
+            self._take(")")
+            return evaluator
+        if kind != "name":
+            raise ExpressionError(f"Unexpected token {value!r} in {self.expression!r}")
+        if self._peek() == "(":
+            return self._call(value)
+        if value not in self.known_columns:
+            raise ExpressionError(f"Unknown column {value!r} in {self.expression!r}")
+        self.columns[value] = None
+        return lambda columns: columns[value]
+
+    def _call(self, name: str) -> _Evaluator:
+        if name not in _FUNCTIONS:
+            raise ExpressionError(f"Unknown function {name!r} in {self.expression!r}")
+        arity, function = _FUNCTIONS[name]
+        self._take("(")
+        arguments = [self._sum()]
+        while self._peek() == ",":
+            self._take()
+            arguments.append(self._sum())
+        self._take(")")
+        if len(arguments) != arity:
+            raise ExpressionError(f"{name}() takes {arity} argument(s) in {self.expression!r}")
+        return lambda columns: function(*(argument(columns) for argument in arguments))
+
+
+def compile_expression(
+    key: str, expression: str, known_columns: Collection[str]
+) -> DerivedMetric:
+    """Parse *expression*; every referenced name must be in *known_columns*."""
+    parser = _Parser(expression, known_columns)
+    evaluator = parser.parse()
+    return DerivedMetric(
+        key=key,
+        expression=expression,
+        columns=tuple(parser.columns),
+        _evaluator=evaluator,
+    )
+
+
+def compile_derived_metrics(
+    definitions: Mapping[str, tuple[str, str, str | None, str]],
+    known_columns: Collection[str],
+) -> tuple[dict[str, DerivedMetric], dict[str, tuple[str, str | None, str]]]:
+    """Compile ``key -> (expression, label, legend, format)`` definitions.
+
+    Returns the compiled metrics and their label triples in the
+    ``COLUMN_LABELS`` format.  Keys must not shadow base columns.
+    """
+    metrics: dict[str, DerivedMetric] = {}
+    labels: dict[str, tuple[str, str | None, str]] = {}
+    for key, (expression, label, legend, fmt) in definitions.items():
+        if key in known_columns:
+            raise ExpressionError(f"Derived metric {key!r} shadows a base column")
+        metrics[key] = compile_expression(key, expression, known_columns)
+        labels[key] = (label, legend or expression, fmt)
+    return metrics, labels
+
+
+__all__ = [
+    "DerivedMetric",
+    "ExpressionError",
+    "compile_derived_metrics",
+    "compile_expression",
+]
@@ -1,3 +1,98 @@
-from django.test import TestCase
+from datetime import date
 
-# Create your tests here.
+import numpy as np
+from django.http import QueryDict
+from django.test import SimpleTestCase
+
+from .expressions import ExpressionError, compile_derived_metrics, compile_expression
+from .windows import MatchWindow, match_window
+
+COLUMNS = {"np_xg", "xa", "goals", "assists", "90s_played", "minutes"}
+
+
+class CompileExpressionTests(SimpleTestCase):
+    def test_digit_leading_column_is_a_name(self):
+        metric = compile_expression("npxg_xa_90", "(np_xg + xa) / 90s_played", COLUMNS)
+        self.assertEqual(metric.columns, ("np_xg", "xa", "90s_played"))
+        result = metric.evaluate({"np_xg": [1.0, 2.0], "xa": [0.5, 1.0], "90s_played": [1.5, 2.0]})
+        np.testing.assert_allclose(result, [1.0, 1.5])
+
+    def test_numbers_and_precedence(self):
+        metric = compile_expression("k", "2 + goals * 3 - 0.5", COLUMNS)
+        np.testing.assert_allclose(metric.evaluate({"goals": [1, 2]}), [4.5, 7.5])
+
+    def test_unary_minus_and_functions(self):
+        metric = compile_expression("k", "max(-goals, abs(assists - 3)) + min(goals, 1)", COLUMNS)
+        np.testing.assert_allclose(metric.evaluate({"goals": [2, 0], "assists": [1, 5]}), [3.0, 2.0])
+
+    def test_division_by_zero_and_nan_become_nan(self):
+        metric = compile_expression("k", "goals / minutes * 90", COLUMNS)
+        result = metric.evaluate({"goals": [1, 1, np.nan], "minutes": [90, 0, 90]})
+        self.assertEqual(result[0], 1.0)
+        self.assertTrue(np.isnan(result[1]))
+        self.assertTrue(np.isnan(result[2]))
+
+    def test_columns_are_deduplicated_in_order(self):
+        metric = compile_expression("k", "goals + assists + goals", COLUMNS)
+        self.assertEqual(metric.columns, ("goals", "assists"))
+
+    def test_invalid_expressions(self):
+        cases = {
+            "": "Incomplete expression",
+            "1 + 2": "references no column",
+            "goals +": "Incomplete expression",
+            "(goals + xa": "Incomplete expression",
+            "goals xa": "Unexpected token",
+            "goals % 2": "Unexpected character",
+            "shots / 90s_played": "Unknown column 'shots'",
+            "sqrt(goals)": "Unknown function 'sqrt'",
+            "max(goals)": r"max\(\) takes 2 argument",
+            "abs(goals, xa)": r"abs\(\) takes 1 argument",
+            "goals * )": "Unexpected token",
+        }
+        for expression, message in cases.items():
+            with self.subTest(expression=expression):
+                with self.assertRaisesRegex(ExpressionError, message):
+                    compile_expression("k", expression, COLUMNS)
+
+    def test_expression_error_is_a_value_error(self):
+        with self.assertRaises(ValueError):
+            compile_expression("k", "unknown", COLUMNS)
+
+
+class CompileDerivedMetricsTests(SimpleTestCase):
+    def test_labels_fall_back_to_the_expression(self):
+        metrics, labels = compile_derived_metrics(
+            {
+                "ga_90": ("(goals + assists) / 90s_played", "G+A / 90", None, "float"),
+                "xa_share": ("xa / np_xg", "xA-Anteil", "xA je npxG", "percent"),
+            },
+            COLUMNS,
+        )
+        self.assertEqual(set(metrics), {"ga_90", "xa_share"})
+        self.assertEqual(labels["ga_90"], ("G+A / 90", "(goals + assists) / 90s_played", "float"))
+        self.assertEqual(labels["xa_share"], ("xA-Anteil", "xA je npxG", "percent"))
+
+    def test_key_must_not_shadow_a_base_column(self):
+        with self.assertRaisesRegex(ExpressionError, "shadows a base column"):
+            compile_derived_metrics({"goals": ("assists * 2", "Goals", None, "int")}, COLUMNS)
+
+
+class MatchWindowTests(SimpleTestCase):
+    def test_parses_dates_and_weeks(self):
+        window = match_window(QueryDict("window_from=2024-08-01&window_to=2024-09-30&week_from=2&week_to=5"))
+        self.assertEqual(window, MatchWindow(date(2024, 8, 1), date(2024, 9, 30), 2, 5))
+        self.assertEqual(
+            window.as_dict(),
+            {"date_from": "2024-08-01", "date_to": "2024-09-30", "week_from": 2, "week_to": 5},
+        )
+
+    def test_invalid_values_are_ignored(self):
+        window = match_window({"window_from": "01.08.2024", "window_to": "", "week_from": "-1", "week_to": "x"})
+        self.assertEqual(window, MatchWindow())
+        self.assertFalse(window)
+
+    def test_a_single_bound_makes_a_window(self):
+        window = match_window({"week_to": "3"})
+        self.assertTrue(window)
+        self.assertEqual(window.as_dict()["date_from"], None)
@@ -0,0 +1,55 @@
+"""Date/matchweek windows shared by the players and teams dashboards.
+
+Both dashboards accept the same optional query parameters
+``?window_from=YYYY-MM-DD&window_to=...&week_from=N&week_to=M``; invalid
+values are ignored.  All bounds are inclusive.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+
+
+@dataclass(slots=True, frozen=True)
+class MatchWindow:
+    """Inclusive date and/or matchweek range within one competition/season."""
+
+    date_from: date | None = None
+    date_to: date | None = None
+    week_from: int | None = None
+    week_to: int | None = None
+
+    def __bool__(self) -> bool:
+        return any(
+            bound is not None
+            for bound in (self.date_from, self.date_to, self.week_from, self.week_to)
+        )
+
+    def as_dict(self) -> dict[str, object]:
+        return {
+            "date_from": self.date_from.isoformat() if self.date_from else None,
+            "date_to": self.date_to.isoformat() if self.date_to else None,
+            "week_from": self.week_from,
+            "week_to": self.week_to,
+        }
+
+
+def _parse_date(value: str | None) -> date | None:
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def _parse_week(value: str | None) -> int | None:
+    return int(value) if value and str(value).isdigit() else None
+
+
+def match_window(query) -> MatchWindow:
+    """Build the window from a ``QueryDict`` (or any mapping with ``get``)."""
+    return MatchWindow(
+        date_from=_parse_date(query.get("window_from")),
+        date_to=_parse_date(query.get("window_to")),
+        week_from=_parse_week(query.get("week_from")),
+        week_to=_parse_week(query.get("week_to")),
+    )
@@ -1,6 +1,45 @@
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
+
+_warmup_lock = threading.Lock()
+_warmed_up = False
+
+
+def _warm_caches(sender=None, **kwargs):
+    """Startet das Vorladen beim ersten Request eines Prozesses (nicht bei migrate, shell, ...)."""
+    global _warmed_up
+    with _warmup_lock:
+        if _warmed_up:
+            return
+        _warmed_up = True
+    request_started.disconnect(dispatch_uid="players-warmup")
+
+    from .schema import schema_registry
+    from .search import player_search_index
+
+    # Schema im Hintergrund vorladen, damit Folge-Requests nicht warten
+    if getattr(settings, "PLAYERS_SCHEMA_WARMUP", True):
+        threading.Thread(
+            target=schema_registry.warm,
+            name="players-schema-warmup",
+            daemon=True,
+        ).start()
+    # Suchindex ebenso (Spielernamen aller Ligen/Saisons)
+    if getattr(settings, "PLAYERS_SEARCH_WARMUP", True):
+        threading.Thread(
+            target=player_search_index.warm,
+            name="players-search-warmup",
+            daemon=True,
+        ).start()
 
 
 class PlayersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'players'
+
+    def ready(self):
+        # Nur Prozesse, die Requests bedienen, wärmen Schema und Suchindex vor
+        request_started.connect(_warm_caches, dispatch_uid="players-warmup")
@@ -0,0 +1,96 @@
+"""Cached multi-season career data for single players."""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from .data_access import (
+    CareerColumns,
+    base_columns,
+    fetch_player_career,
+    in_db_pool,
+    numeric_season_metrics,
+)
+from .labels import SEASON_METRIC_CATEGORIES, metric_definition
+
+# Zählwerte werden bei mehreren Zeilen je Saison addiert, Raten gewichtet gemittelt
+_SUMMED_EXTRA = ("90s_played",)
+
+
+def _career_metrics() -> tuple[list[str], list[str]]:
+    metrics = numeric_season_metrics(
+        [metric for group in SEASON_METRIC_CATEGORIES.values() for metric in group]
+    )
+    summed = [
+        metric
+        for metric in base_columns(metrics)
+        if metric_definition(metric)[2] == "int" or metric in _SUMMED_EXTRA
+    ]
+    return metrics, summed
+
+
+class _CareerCache:
+    """LRU of :class:`CareerColumns` per player (all season metrics at once)."""
+
+    def __init__(self, max_players: int = 256) -> None:
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[int, tuple[float, CareerColumns]] = OrderedDict()
+        self._max_players = max_players
+
+    def get(self, player_id: int) -> CareerColumns:
+        player_id = int(player_id)
+        ttl = float(getattr(settings, "PLAYERS_CAREER_CACHE_TTL", 900))
+        with self._lock:
+            entry = self._entries.get(player_id)
+            if entry is not None and time.monotonic() - entry[0] < ttl:
+                self._entries.move_to_end(player_id)
+                return entry[1]
+        metrics, summed = _career_metrics()
+        career = fetch_player_career(player_id, metrics, summed)
+        with self._lock:
+            self._entries[player_id] = (time.monotonic(), career)
+            self._entries.move_to_end(player_id)
+            while len(self._entries) > self._max_players:
+                self._entries.popitem(last=False)
+        return career
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_careers = _CareerCache()
+
+
+def player_career(player_id: int) -> CareerColumns:
+    return _careers.get(player_id)
+
+
+aplayer_career = in_db_pool(player_career)
+
+
+def sparkline_points(values: np.ndarray, width: int = 120, height: int = 28) -> list[str]:
+    """SVG ``points`` strings for *values*; NaN seasons split the line."""
+    if not len(values) or np.isnan(values).all():
+        return []
+    low, high = np.nanmin(values), np.nanmax(values)
+    span = high - low or 1.0
+    step = width / max(len(values) - 1, 1)
+    x = np.arange(len(values)) * step if len(values) > 1 else np.array([width / 2])
+    y = height - 2 - (values - low) / span * (height - 4)
+    segments: list[str] = []
+    current: list[str] = []
+    for px, py in zip(x.tolist(), y.tolist()):
+        if py != py:
+            if current:
+                segments.append(" ".join(current))
+            current = []
+            continue
+        current.append(f"{px:.1f},{py:.1f}")
+    if current:
+        segments.append(" ".join(current))
+    return segments
@@ -1,69 +1,298 @@
 """Raw SQL helpers for the players dashboard."""
 from __future__ import annotations
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from datetime import date
-from functools import lru_cache
-from typing import Sequence
+from datetime import date, datetime, timezone
+from functools import lru_cache, partial, wraps
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Mapping, ParamSpec, Sequence, TypeVar
 
-from django.db import DatabaseError, connection
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+
+from core.windows import MatchWindow
+
+from .labels import DERIVED_METRICS, is_rate_metric
+from .schema import schema_changed, schema_registry
 @dataclass(slots=True)
 class CompetitionRecord:
     key: str
     label: str
     competition_id: int
     season_id: int
-@dataclass(slots=True)
-class SeasonRow:
-    player_id: int
-    player_name: str
-    team_name: str | None
-    primary_position: str | None
-    secondary_position: str | None
-    metrics: dict[str, float | None]
+class MetricSchema:
+    """Metric name -> column index, shared by every row of a :class:`RowSet`."""
+
+    __slots__ = ("names", "index")
+
+    def __init__(self, names: Sequence[str]):
+        self.names = tuple(names)
+        self.index = {name: position for position, name in enumerate(self.names)}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+@lru_cache(maxsize=256)
+def _metric_schema(names: tuple[str, ...]) -> MetricSchema:
+    return MetricSchema(names)
+
+
+class MetricValues(Mapping[str, "float | None"]):
+    """Read-only ``row.metrics`` view: schema lookup plus one array index."""
+
+    __slots__ = ("_schema", "_values")
+
+    def __init__(self, schema: MetricSchema, values: np.ndarray):
+        self._schema = schema
+        self._values = values
+
+    def __getitem__(self, key: str) -> float | None:
+        value = self._values[self._schema.index[key]]
+        return None if value != value else float(value)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._schema.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._schema.names)
+
+    def __len__(self) -> int:
+        return len(self._schema)
+
+
+class _MetricRow:
+    """Base for rows whose metric values live in a shared float64 block."""
+
+    __slots__ = ("_schema", "_values")
+    _fields: tuple[str, ...] = ()
+
+    @property
+    def metrics(self) -> MetricValues:
+        return MetricValues(self._schema, self._values)
+
+    @metrics.setter
+    def metrics(self, metrics: Mapping[str, object]) -> None:
+        names = tuple(name for name in metrics if name not in self._fields)
+        self._schema = _metric_schema(names)
+        self._values = _float_column([metrics[name] for name in names])
+
     def __getattr__(self, item: str):  # pragma: no cover - convenience for templates
-        if item in self.metrics:
-            return self.metrics[item]
+        if item[:1] != "_":
+            position = self._schema.index.get(item)
+            if position is not None:
+                value = self._values[position]
+                return None if value != value else float(value)
         raise AttributeError(item)
+
+    @classmethod
+    def _bound(cls, schema: MetricSchema, values: np.ndarray, *fields: object):
+        row = cls.__new__(cls)
+        for name, value in zip(cls._fields, fields):
+            setattr(row, name, value)
+        row._schema = schema
+        row._values = values
+        return row
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self._fields
+        ) and dict(self.metrics) == dict(other.metrics)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{self.__class__.__name__}({fields}, metrics={dict(self.metrics)!r})"
+
+
+class SeasonRow(_MetricRow):
+    __slots__ = (
+        "player_id",
+        "player_name",
+        "team_name",
+        "primary_position",
+        "secondary_position",
+    )
+    _fields = __slots__
+
+    def __init__(
+        self,
+        player_id: int,
+        player_name: str,
+        team_name: str | None,
+        primary_position: str | None,
+        secondary_position: str | None,
+        metrics: Mapping[str, float | None],
+    ):
+        self.player_id = player_id
+        self.player_name = player_name
+        self.team_name = team_name
+        self.primary_position = primary_position
+        self.secondary_position = secondary_position
+        self.metrics = metrics
+
+
+class MatchRow(_MetricRow):
+    __slots__ = ("match_id", "match_date", "player_id", "player_name")
+    _fields = __slots__
+
+    def __init__(
+        self,
+        match_id: int,
+        match_date: date | None,
+        player_id: int,
+        player_name: str,
+        metrics: Mapping[str, float | None],
+    ):
+        self.match_id = match_id
+        self.match_date = match_date
+        self.player_id = player_id
+        self.player_name = player_name
+        self.metrics = metrics
+
+
+class RowSet(list):
+    """List of rows that share one :class:`MetricSchema`.
+
+    All metric values sit in ``values`` (rows x metrics, float64, NaN for
+    NULL); every row holds a view of its line of that block.
+    """
+
+    __slots__ = ("schema", "values")
+
+    def __init__(self, rows=(), schema: MetricSchema | None = None, values: np.ndarray | None = None):
+        super().__init__(rows)
+        self.schema = schema or _metric_schema(())
+        self.values = values if values is not None else np.empty((0, len(self.schema)))
+
+    def column(self, metric: str) -> np.ndarray:
+        return self.values[:, self.schema.index[metric]]
+
+
+def _row_set(
+    row_cls: type[_MetricRow],
+    rows: Sequence[dict[str, object]],
+    metrics: Sequence[str],
+    fields: Callable[[dict[str, object]], tuple[object, ...]],
+) -> RowSet:
+    schema = _metric_schema(
+        tuple(dict.fromkeys(metric for metric in metrics if metric not in row_cls._fields))
+    )
+    flat = [row.get(metric) for row in rows for metric in schema.names]
+    values = _float_column(flat).reshape(len(rows), len(schema))
+    return RowSet(
+        (row_cls._bound(schema, line, *fields(row)) for row, line in zip(rows, values)),
+        schema,
+        values,
+    )
+
+
 @dataclass(slots=True)
-class MatchRow:
-    match_id: int
-    match_date: date | None
-    player_id: int
-    player_name: str
-    metrics: dict[str, float | None]
-    def __getattr__(self, item: str):  # pragma: no cover - convenience for templates
-        if item in self.metrics:
-            return self.metrics[item]
-        raise AttributeError(item)
+class SeasonColumns:
+    """Column-oriented season rows: one float64 array per metric, NaN for NULL."""
+
+    metrics: tuple[str, ...]
+    player_id: np.ndarray
+    player_name: np.ndarray
+    team_name: np.ndarray
+    primary_position: np.ndarray
+    secondary_position: np.ndarray
+    values: dict[str, np.ndarray]
+    def __len__(self) -> int:
+        return len(self.player_id)
+    def column(self, metric: str) -> np.ndarray:
+        return self.values[metric]
+@dataclass(slots=True)
+class MatchColumns:
+    """Column-oriented match rows; ``match_date`` is ``datetime64[D]`` (NaT for NULL)."""
+
+    metrics: tuple[str, ...]
+    match_id: np.ndarray
+    match_date: np.ndarray
+    player_id: np.ndarray
+    player_name: np.ndarray
+    values: dict[str, np.ndarray]
+    def __len__(self) -> int:
+        return len(self.player_id)
+    def column(self, metric: str) -> np.ndarray:
+        return self.values[metric]
+    def select_players(self, player_ids: Sequence[int]) -> MatchColumns:
+        mask = np.isin(self.player_id, np.asarray(player_ids, dtype=np.int64))
+        return MatchColumns(
+            metrics=self.metrics,
+            match_id=self.match_id[mask],
+            match_date=self.match_date[mask],
+            player_id=self.player_id[mask],
+            player_name=self.player_name[mask],
+            values={metric: values[mask] for metric, values in self.values.items()},
+        )
 
 
 PLAYER_SEASON_TABLE = "player_season_data"
 PLAYER_MATCH_TABLE = "player_match_data"
+PLAYER_POSITION_TABLE = "player_positions"
 
 
-@lru_cache(maxsize=None)
-def _table_columns(table_name: str) -> set[str]:
-    sql = """
-    SELECT COLUMN_NAME
-    FROM INFORMATION_SCHEMA.COLUMNS
-    WHERE UPPER(TABLE_NAME) = UPPER(%s)
-    """
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute(sql, [table_name])
-            return {row[0].lower() for row in cursor.fetchall()}
-    except DatabaseError:
-        return set()
+def _table_columns(table_name: str) -> Mapping[str, str]:
+    return schema_registry.columns(table_name)
 
 
 def _has_psd_column(column: str) -> bool:
     return column.lower() in _table_columns(PLAYER_SEASON_TABLE)
 
 
+_NUMERIC_TYPES = frozenset(
+    {"bigint", "int", "smallint", "tinyint", "bit", "decimal", "numeric", "float", "real", "money"}
+)
+
+
+def numeric_season_metrics(metrics: Sequence[str]) -> list[str]:
+    """Keep the *metrics* that are numeric columns of ``player_season_data``.
+
+    Derived metrics count as numeric when all their base columns are.
+    """
+    columns = _table_columns(PLAYER_SEASON_TABLE)
+    return [
+        metric
+        for metric in dict.fromkeys(metrics)
+        if all(columns.get(column.lower()) in _NUMERIC_TYPES for column in base_columns([metric]))
+    ]
+
+
+def base_columns(metrics: Sequence[str]) -> list[str]:
+    """Columns to SELECT for *metrics*: derived metrics contribute their inputs."""
+    columns: dict[str, None] = {}
+    for metric in metrics:
+        derived = DERIVED_METRICS.get(metric)
+        columns.update(dict.fromkeys(derived.columns if derived is not None else (metric,)))
+    return list(columns)
+
+
+def _derived_values(
+    metrics: Sequence[str], columns: Mapping[str, np.ndarray]
+) -> dict[str, np.ndarray]:
+    """Evaluate the derived *metrics* over already fetched base *columns*."""
+    return {
+        metric: DERIVED_METRICS[metric].evaluate(columns)
+        for metric in dict.fromkeys(metrics)
+        if metric in DERIVED_METRICS
+    }
+
+
 def _has_pmd_column(column: str) -> bool:
     return column.lower() in _table_columns(PLAYER_MATCH_TABLE)
 
 
+def _has_position_store() -> bool:
+    return bool(_table_columns(PLAYER_POSITION_TABLE))
+
+
 def _position_select_columns(alias: str = "psd") -> list[str]:
     columns: list[str] = []
     if _has_psd_column("primary_position"):
@@ -88,8 +317,186 @@ def _position_expression(alias: str = "psd") -> str | None:
     if len(expressions) == 1:
         return expressions[0]
     return f"COALESCE({', '.join(expressions)})"
-def fetch_competitions() -> list[CompetitionRecord]:
-    rows = _fetch_dicts(
+class _QueryCache:
+    """Statement texts keyed on their shape, not on parameter values.
+
+    Keys carry the builder name, scope placeholders, metric tuple, team
+    filter and padded id bucket; the schema version is appended so a schema
+    refresh never serves stale column lists.  Identical texts let SQL Server
+    reuse one plan per shape.
+    """
+
+    def __init__(self, max_size: int = 512):
+        self._max_size = max_size
+        self._templates: dict[tuple[object, ...], str | None] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def sql(self, key: tuple[object, ...], build: Callable[[], str | None]) -> str | None:
+        cache_key = (*key, schema_registry.version)
+        try:
+            sql = self._templates[cache_key]
+        except KeyError:
+            sql = build()
+            with self._lock:
+                self.misses += 1
+                if len(self._templates) >= self._max_size:
+                    self._templates.pop(next(iter(self._templates)))
+                self._templates[cache_key] = sql
+            return sql
+        self.hits += 1
+        return sql
+
+    def stats(self) -> dict[str, int]:
+        texts = {sql for sql in self._templates.values() if sql is not None}
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "templates": len(self._templates),
+            "distinct_plans": len(texts),
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._templates.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_query_cache = _QueryCache()
+
+
+def query_cache_stats() -> dict[str, int]:
+    """Hit/miss counters and the number of distinct statement texts in use."""
+    return _query_cache.stats()
+
+
+@dataclass(slots=True, frozen=True)
+class _Scope:
+    """SQL fragments that pin a statement to one competition/season."""
+
+    competition: str
+    season: str
+    params: tuple[object, ...] = ()
+
+
+def _bind_scope(competition_id: int, season_id: int) -> _Scope:
+    return _Scope("%s", "%s", (competition_id, season_id))
+
+
+# Inside a bundled batch the scope lives in T-SQL variables declared once by
+# ``_BUNDLE_PRELUDE`` so every statement shares the resolved competition.
+_BATCH_SCOPE = _Scope("@competition_id", "@season_id")
+
+_BUNDLE_PRELUDE = """
+SET NOCOUNT ON;
+DECLARE @competition_id int = %s;
+DECLARE @season_id int = %s;
+IF NOT EXISTS (
+    SELECT 1
+    FROM player_season_data
+    WHERE competition_id = @competition_id
+      AND season_id = @season_id
+)
+    SELECT TOP 1
+        @competition_id = competition_id,
+        @season_id = season_id
+    FROM player_season_data
+    ORDER BY competition_id, season_id;
+SELECT @competition_id AS competition_id, @season_id AS season_id
+"""
+
+# Large id sets travel as ONE comma-separated parameter into a session temp
+# table instead of ``IN (%s, ...)``: no 2100-parameter limit and one plan.
+_PLAYER_ID_TABLE = "#player_ids"
+_ID_TABLE_BUCKET = "table"
+_PLAYER_ID_SETUP = f"""
+SET NOCOUNT ON;
+IF OBJECT_ID(N'tempdb..{_PLAYER_ID_TABLE}') IS NOT NULL
+    DROP TABLE {_PLAYER_ID_TABLE};
+CREATE TABLE {_PLAYER_ID_TABLE} (player_id int NOT NULL PRIMARY KEY);
+INSERT INTO {_PLAYER_ID_TABLE} (player_id)
+SELECT DISTINCT CAST(value AS int)
+FROM STRING_SPLIT(%s, ',')
+WHERE value <> ''
+"""
+
+
+# Default selection of a bundle (no players requested): the first players of
+# the player list, resolved inside the batch into the same temp table, so the
+# season/match statements of the batch can filter on it without a round trip.
+_DEFAULT_PLAYERS_SETUP = f"""
+IF OBJECT_ID(N'tempdb..{_PLAYER_ID_TABLE}') IS NOT NULL
+    DROP TABLE {_PLAYER_ID_TABLE};
+CREATE TABLE {_PLAYER_ID_TABLE} (player_id int NOT NULL PRIMARY KEY, sort_order int NOT NULL);
+INSERT INTO {_PLAYER_ID_TABLE} (player_id, sort_order)
+SELECT TOP (%s)
+    psd.player_id,
+    ROW_NUMBER() OVER (
+        ORDER BY MIN(COALESCE(pl.player_name, CONCAT('Player ', psd.player_id))), psd.player_id
+    )
+FROM player_season_data AS psd
+LEFT JOIN players AS pl
+  ON pl.player_id = psd.player_id
+WHERE psd.competition_id = @competition_id
+  AND psd.season_id = @season_id
+GROUP BY psd.player_id
+ORDER BY MIN(COALESCE(pl.player_name, CONCAT('Player ', psd.player_id))), psd.player_id;
+SELECT player_id FROM {_PLAYER_ID_TABLE} ORDER BY sort_order
+"""
+
+
+def _uses_id_table(player_ids: Sequence[int]) -> bool:
+    threshold = getattr(settings, "PLAYERS_ID_TABLE_THRESHOLD", 200)
+    return len(set(player_ids)) > threshold
+
+
+def _player_id_filter(
+    player_ids: Sequence[int] | None, id_table: bool = False
+) -> tuple[int | str | None, list[object]]:
+    """Return the id bucket (part of the query cache key) and its parameters.
+
+    ``None`` means no filter, ``"table"`` the temp-table path (forced by
+    *id_table* when the batch has filled the table itself).  IN lists are
+    padded to the next power of two by repeating the last id, so only a
+    handful of distinct statement texts (and server plans) exist.
+    """
+    if id_table:
+        return _ID_TABLE_BUCKET, []
+    if not player_ids:
+        return None, []
+    if _uses_id_table(player_ids):
+        return _ID_TABLE_BUCKET, []
+    ids = [int(pid) for pid in dict.fromkeys(player_ids)]
+    size = 1 << (len(ids) - 1).bit_length()
+    return size, ids + ids[-1:] * (size - len(ids))
+
+
+def _player_id_sql(column: str, bucket: int | str) -> str:
+    if bucket == _ID_TABLE_BUCKET:
+        return f"{column} IN (SELECT player_id FROM {_PLAYER_ID_TABLE})"
+    placeholders = ", ".join(["%s"] * int(bucket))
+    return f"{column} IN ({placeholders})"
+
+
+def _player_id_setup(player_ids: Sequence[int] | None) -> tuple[str, list[object]] | None:
+    if not player_ids or not _uses_id_table(player_ids):
+        return None
+    return _PLAYER_ID_SETUP, [",".join(str(int(pid)) for pid in player_ids)]
+
+
+def _with_player_ids(
+    query: tuple[str, list[object]], player_ids: Sequence[int] | None
+) -> tuple[str, list[object]]:
+    """Prefix *query* with the temp-table setup when *player_ids* needs it."""
+    setup = _player_id_setup(player_ids)
+    if setup is None:
+        return query
+    sql, params = query
+    return f"{setup[0].strip()};\n{sql}", [*setup[1], *params]
+def _competitions_query() -> tuple[str, list[object]]:
+    return (
         """
         SELECT DISTINCT
             psd.competition_id,
@@ -102,7 +509,11 @@ def fetch_competitions() -> list[CompetitionRecord]:
          AND c.season_id = psd.season_id
         ORDER BY psd.competition_id, psd.season_id
         """,
+        [],
     )
+
+
+def _competitions_from_rows(rows: Sequence[dict[str, object]]) -> list[CompetitionRecord]:
     competitions: list[CompetitionRecord] = []
     for row in rows:
         competition_id = int(row["competition_id"])
@@ -125,49 +536,170 @@ def fetch_competitions() -> list[CompetitionRecord]:
         )
     return competitions
 
-def fetch_teams(competition_id: int | None, season_id: int | None) -> list[dict[str, object]]:
-    """Historic helper – kept for backwards compatibility."""
 
-    if competition_id is None or season_id is None:
-        return []
-    return _fetch_dicts(
-        """
+def fetch_competitions() -> list[CompetitionRecord]:
+    return _competitions_from_rows(_fetch_dicts(*_competitions_query()))
+
+def _teams_query(scope: _Scope) -> tuple[str, list[object]]:
+    return (
+        f"""
         SELECT DISTINCT
             psd.team_id,
             psd.team_name
         FROM player_season_data AS psd
-        WHERE psd.competition_id = %s
-          AND psd.season_id = %s
+        WHERE psd.competition_id = {scope.competition}
+          AND psd.season_id = {scope.season}
           AND psd.team_id IS NOT NULL
         ORDER BY psd.team_name
         """,
-        [competition_id, season_id],
+        [*scope.params],
     )
-def fetch_players(
-    competition_id: int | None,
-    season_id: int | None,
-    position: str | None = None,
-) -> list[dict[str, object]]:
+
+
+def fetch_teams(competition_id: int | None, season_id: int | None) -> list[dict[str, object]]:
+    """Historic helper – kept for backwards compatibility."""
+
     if competition_id is None or season_id is None:
         return []
-    params: list[object] = [competition_id, season_id]
-    position_filter = ""
-    if position:
-        clauses: list[str] = []
-        if _has_psd_column("primary_position"):
-            clauses.append("psd.primary_position = %s")
-        if _has_psd_column("secondary_position"):
-            clauses.append("psd.secondary_position = %s")
-        if clauses:
+    return _fetch_dicts(*_teams_query(_bind_scope(competition_id, season_id)))
+@dataclass(slots=True)
+class CareerColumns:
+    """One player's season metrics per competition/season, oldest first."""
+
+    player_id: int
+    player_name: str
+    seasons: list[CompetitionRecord]
+    team_names: list[str | None]
+    values: dict[str, np.ndarray]
+
+    def __len__(self) -> int:
+        return len(self.seasons)
+
+    def column(self, metric: str) -> np.ndarray:
+        return self.values[metric]
+
+
+_CAREER_WEIGHT_COLUMN = "90s_played"
+
+
+def _career_metric_sql(metric: str, summed: bool, weighted: bool) -> str:
+    column = f"CAST(psd.[{metric}] AS float)"
+    if summed:
+        return f"SUM({column}) AS [{metric}]"
+    if not weighted:
+        return f"AVG({column}) AS [{metric}]"
+    # Mehrere Zeilen je Saison (Vereinswechsel) nach Spielzeit gewichten
+    weight = f"CAST(psd.[{_CAREER_WEIGHT_COLUMN}] AS float)"
+    return (
+        f"COALESCE(SUM({column} * {weight}) / NULLIF(SUM(CASE WHEN psd.[{metric}] IS NOT NULL "
+        f"THEN {weight} END), 0), AVG({column})) AS [{metric}]"
+    )
+
+
+def fetch_player_career(
+    player_id: int,
+    metrics: Sequence[str],
+    summed: Sequence[str] = (),
+) -> CareerColumns:
+    """All competitions/seasons of *player_id* in one grouped query.
+
+    Rows of the same competition/season (e.g. after a transfer) are merged:
+    *summed* metrics are added up, all others averaged weighted by
+    ``90s_played`` where that column exists.  Derived metrics are evaluated
+    over the merged base columns.
+    """
+    metrics = tuple(metrics)
+    summed_set = frozenset(summed)
+
+    def build() -> str:
+        weighted = _has_psd_column(_CAREER_WEIGHT_COLUMN)
+        metric_sql = "".join(
+            f",\n            {_career_metric_sql(metric, metric in summed_set, weighted)}"
+            for metric in base_columns(metrics)
+        )
+        return f"""
+        SELECT
+            psd.competition_id,
+            psd.season_id,
+            MAX(c.competition_name) AS competition_name,
+            MAX(c.season_name) AS season_name,
+            MAX(pl.player_name) AS player_name,
+            STRING_AGG(psd.team_name, ' / ') AS team_names{metric_sql}
+        FROM player_season_data AS psd
+        LEFT JOIN competitions AS c
+          ON c.competition_id = psd.competition_id
+         AND c.season_id = psd.season_id
+        LEFT JOIN players AS pl
+          ON pl.player_id = psd.player_id
+        WHERE psd.player_id = %s
+        GROUP BY psd.competition_id, psd.season_id
+        ORDER BY MAX(c.season_name), psd.season_id, psd.competition_id
+        """
+
+    key = ("career", metrics, tuple(sorted(summed_set)))
+    result = _fetch_result(_query_cache.sql(key, build), [int(player_id)])
+    names = [name for name in result.column("player_name") if name]
+    values = {column: _float_column(result.column(column)) for column in base_columns(metrics)}
+    values.update(_derived_values(metrics, values))
+    return CareerColumns(
+        player_id=int(player_id),
+        player_name=str(names[0]) if names else f"Player {player_id}",
+        seasons=_competitions_from_rows(result.dicts()),
+        team_names=list(result.column("team_names")),
+        values={metric: values[metric] for metric in metrics},
+    )
+
+
+def fetch_player_directory() -> list[dict[str, object]]:
+    """Every (player, competition, season, team) of ``player_season_data``."""
+    return _fetch_dicts(
+        """
+        SELECT DISTINCT
+            psd.player_id,
+            COALESCE(pl.player_name, CONCAT('Player ', psd.player_id)) AS player_name,
+            psd.competition_id,
+            psd.season_id,
+            psd.team_name
+        FROM player_season_data AS psd
+        LEFT JOIN players AS pl
+          ON pl.player_id = psd.player_id
+        """
+    )
+
+
+def player_directory_stamp() -> str:
+    """Cheap stamp that changes when players or season rows are added/renamed."""
+    rows = _fetch_dicts(
+        """
+        SELECT
+            (SELECT COUNT_BIG(*) FROM player_season_data) AS season_rows,
+            (SELECT COUNT_BIG(*) FROM players) AS players,
+            (SELECT MAX(updated_at_utc) FROM players) AS players_updated
+        """
+    )
+    row = rows[0] if rows else {}
+    return ":".join(str(row.get(column) or 0) for column in ("season_rows", "players", "players_updated"))
+
+
+def _players_query(scope: _Scope, position: str | None = None) -> tuple[str, list[object]]:
+    position_columns = [
+        column
+        for column in ("primary_position", "secondary_position")
+        if position and _has_psd_column(column)
+    ]
+    params: list[object] = [*scope.params, *([position] * len(position_columns))]
+
+    def build() -> str:
+        position_filter = ""
+        if position_columns:
+            clauses = [f"psd.{column} = %s" for column in position_columns]
             position_filter = f"""
           AND (
                 {' OR '.join(clauses)}
           )
         """
-            params.extend([position] * len(clauses))
-    position_select_sql = ",\n            ".join(_position_select_columns())
-    rows = _fetch_dicts(
-        f"""
+        position_select_sql = ",\n            ".join(_position_select_columns())
+        return f"""
         SELECT DISTINCT
             psd.player_id,
             COALESCE(pl.player_name, CONCAT('Player ', psd.player_id)) AS player_name,
@@ -177,79 +709,155 @@ def fetch_players(
         FROM player_season_data AS psd
         LEFT JOIN players AS pl
           ON pl.player_id = psd.player_id
-        WHERE psd.competition_id = %s
-          AND psd.season_id = %s
+        WHERE psd.competition_id = {scope.competition}
+          AND psd.season_id = {scope.season}
           {position_filter}
         ORDER BY player_name, psd.player_id
-        """,
-        params,
-    )
-    return rows
+        """
 
+    key = ("players", scope.competition, scope.season, len(position_columns))
+    return _query_cache.sql(key, build), params
 
-def fetch_positions(
-    competition_id: int | None, season_id: int | None
-) -> list[str]:
+def fetch_players(
+    competition_id: int | None,
+    season_id: int | None,
+    position: str | None = None,
+) -> list[dict[str, object]]:
     if competition_id is None or season_id is None:
         return []
-    cte_sql, params = _build_position_cte(competition_id, season_id)
-    if cte_sql:
-        rows = _fetch_dicts(
-            f"""
+    return _fetch_dicts(*_players_query(_bind_scope(competition_id, season_id), position))
+
+
+def _stored_positions_missing(scope: _Scope) -> str:
+    """Predicate: ``player_positions`` has no rows for *scope* (never refreshed)."""
+    return f"""NOT EXISTS (
+            SELECT 1
+            FROM {PLAYER_POSITION_TABLE} AS stored
+            WHERE stored.competition_id = {scope.competition}
+              AND stored.season_id = {scope.season}
+        )"""
+
+
+def _position_store_params(scope: _Scope, id_params: Sequence[object] = ()) -> list[object]:
+    """Parameters of a positions statement built by the functions below.
+
+    With both the store and the ``resolved_positions`` fallback the text
+    binds the CTE, the stored rows and the fallback predicate in that order.
+    """
+    if _has_position_store() and _has_pmd_column("position"):
+        return [*scope.params, *id_params, *scope.params, *id_params, *scope.params]
+    return [*scope.params, *id_params]
+
+
+def _positions_query(scope: _Scope) -> tuple[str, list[object]] | None:
+    def build() -> str | None:
+        cte_sql = _position_cte_sql(scope)
+        if _has_position_store():
+            stored = f"""
+                SELECT
+                    positions.position
+                FROM {PLAYER_POSITION_TABLE} AS pp
+                CROSS APPLY (
+                    VALUES (pp.primary_position), (pp.secondary_position)
+                ) AS positions (position)
+                WHERE pp.competition_id = {scope.competition}
+                  AND pp.season_id = {scope.season}
+                  AND positions.position IS NOT NULL
+            """
+            if not cte_sql:
+                return f"""
+                SELECT DISTINCT
+                    position
+                FROM ({stored}) AS positions
+                ORDER BY position
+                """
+            # Wettbewerbe ohne gespeicherte Positionen (noch nie refresht)
+            # fallen auf die Berechnung aus player_match_data zurück
+            return f"""
+            ;WITH {cte_sql}
+            SELECT DISTINCT
+                position
+            FROM (
+                {stored}
+                UNION ALL
+                SELECT
+                    rp.position
+                FROM ranked_positions AS rp
+                WHERE rp.position IS NOT NULL
+                  AND {_stored_positions_missing(scope)}
+            ) AS positions
+            ORDER BY position
+            """
+        if cte_sql:
+            return f"""
             ;WITH {cte_sql}
             SELECT DISTINCT
                 rp.position
             FROM ranked_positions AS rp
             WHERE rp.position IS NOT NULL
             ORDER BY rp.position
-            """,
-            params,
-        )
-        return [str(row["position"]) for row in rows if row.get("position")]
-
-    position_expr = _position_expression()
-    if not position_expr:
-        return []
-    rows = _fetch_dicts(
-        f"""
+            """
+        position_expr = _position_expression()
+        if not position_expr:
+            return None
+        return f"""
         SELECT DISTINCT
             {position_expr} AS position
         FROM player_season_data AS psd
-        WHERE psd.competition_id = %s
-          AND psd.season_id = %s
+        WHERE psd.competition_id = {scope.competition}
+          AND psd.season_id = {scope.season}
         ORDER BY position
-        """,
-        [competition_id, season_id],
-    )
+        """
+
+    sql = _query_cache.sql(("positions", scope.competition, scope.season), build)
+    if sql is None:
+        return None
+    return sql, _position_store_params(scope)
+
+def _positions_from_rows(rows: Sequence[dict[str, object]]) -> list[str]:
     return [str(row["position"]) for row in rows if row.get("position")]
-def fetch_season_rows(
-    competition_id: int,
-    season_id: int,
-    player_ids: Sequence[int],
+
+
+def fetch_positions(
+    competition_id: int | None, season_id: int | None
+) -> list[str]:
+    if competition_id is None or season_id is None:
+        return []
+    query = _positions_query(_bind_scope(competition_id, season_id))
+    if query is None:
+        return []
+    return _positions_from_rows(_fetch_dicts(*query))
+def _season_rows_query(
+    scope: _Scope,
+    player_ids: Sequence[int] | None,
     metrics: Sequence[str],
     team_id: int | None = None,
-) -> list[SeasonRow]:
-    placeholders = ", ".join(["%s"] * len(player_ids))
-    where_clauses = [
-        "psd.competition_id = %s",
-        "psd.season_id = %s",
-        f"psd.player_id IN ({placeholders})",
-    ]
-    params: list[object] = [competition_id, season_id]
+    id_table: bool = False,
+) -> tuple[str, list[object]]:
+    id_bucket, id_params = _player_id_filter(player_ids, id_table)
+    params: list[object] = [*scope.params]
     if team_id is not None:
-        where_clauses.insert(2, "psd.team_id = %s")
         params.append(team_id)
-    params.extend(player_ids)
-    select_fields = [
-        "psd.player_id",
-        "COALESCE(pl.player_name, CONCAT('Player ', psd.player_id)) AS player_name",
-        "psd.team_name",
-        *_position_select_columns(),
-        *[f"psd.{metric} AS {metric}" for metric in metrics],
-    ]
-    select_clause = ",\n            ".join(select_fields)
-    rows = _fetch_dicts(
-        f"""
+    params.extend(id_params)
+
+    def build() -> str:
+        where_clauses = [
+            f"psd.competition_id = {scope.competition}",
+            f"psd.season_id = {scope.season}",
+        ]
+        if id_bucket is not None:
+            where_clauses.append(_player_id_sql("psd.player_id", id_bucket))
+        if team_id is not None:
+            where_clauses.insert(2, "psd.team_id = %s")
+        select_fields = [
+            "psd.player_id",
+            "COALESCE(pl.player_name, CONCAT('Player ', psd.player_id)) AS player_name",
+            "psd.team_name",
+            *_position_select_columns(),
+            *[f"psd.[{metric}] AS [{metric}]" for metric in base_columns(metrics)],
+        ]
+        select_clause = ",\n            ".join(select_fields)
+        return f"""
         SELECT
             {select_clause}
         FROM player_season_data AS psd
@@ -257,50 +865,151 @@ def fetch_season_rows(
           ON pl.player_id = psd.player_id
         WHERE {' AND '.join(where_clauses)}
         ORDER BY player_name, psd.player_id
-        """,
-        params,
+        """
+
+    key = (
+        "season_rows",
+        scope.competition,
+        scope.season,
+        tuple(metrics),
+        team_id is not None,
+        id_bucket,
     )
-    results: list[SeasonRow] = []
-    for row in rows:
-        metrics_map = {metric: row.get(metric) for metric in metrics}
-        results.append(
-            SeasonRow(
-                player_id=int(row["player_id"]),
-                player_name=str(row.get("player_name") or f"Player {row['player_id']}"),
-                team_name=row.get("team_name"),
-                primary_position=row.get("primary_position"),
-                secondary_position=row.get("secondary_position"),
-                metrics=metrics_map,
-            )
-        )
-    return results
+    return _query_cache.sql(key, build), params
 
+def _season_rows_from_rows(
+    rows: Sequence[dict[str, object]], metrics: Sequence[str]
+) -> RowSet[SeasonRow]:
+    row_set = _row_set(
+        SeasonRow,
+        rows,
+        [*metrics, *base_columns(metrics)],
+        lambda row: (
+            int(row["player_id"]),
+            str(row.get("player_name") or f"Player {row['player_id']}"),
+            row.get("team_name"),
+            row.get("primary_position"),
+            row.get("secondary_position"),
+        ),
+    )
+    index = row_set.schema.index
+    derived = _derived_values(
+        metrics, {name: row_set.values[:, position] for name, position in index.items()}
+    )
+    for metric, values in derived.items():
+        row_set.values[:, index[metric]] = values
+    return row_set
 
-def fetch_player_positions(
-    competition_id: int | None,
-    season_id: int | None,
-    player_ids: Sequence[int] | None = None,
-) -> dict[int, dict[str, str | None]]:
-    if (
-        competition_id is None
-        or season_id is None
-        or (player_ids is not None and not player_ids)
-    ):
-        return {}
-    cte_sql, params = _build_position_cte(competition_id, season_id, player_ids)
-    if not cte_sql:
-        return {}
+
+def fetch_season_rows(
+    competition_id: int,
+    season_id: int,
+    player_ids: Sequence[int],
+    metrics: Sequence[str],
+    team_id: int | None = None,
+) -> RowSet[SeasonRow]:
     rows = _fetch_dicts(
-        f"""
+        *_with_player_ids(
+            _season_rows_query(
+                _bind_scope(competition_id, season_id), player_ids, metrics, team_id
+            ),
+            player_ids,
+        )
+    )
+    return _season_rows_from_rows(rows, metrics)
+
+
+def _season_columns_from_result(
+    result: _ResultSet, metrics: Sequence[str]
+) -> SeasonColumns:
+    player_id = _int_column(result.column("player_id"))
+    values = {column: _float_column(result.column(column)) for column in base_columns(metrics)}
+    values.update(_derived_values(metrics, values))
+    return SeasonColumns(
+        metrics=tuple(metrics),
+        player_id=player_id,
+        player_name=_name_column(result.column("player_name"), player_id),
+        team_name=_object_column(result.column("team_name")),
+        primary_position=_object_column(result.column("primary_position")),
+        secondary_position=_object_column(result.column("secondary_position")),
+        values=values,
+    )
+
+
+def fetch_season_columns(
+    competition_id: int,
+    season_id: int,
+    player_ids: Sequence[int],
+    metrics: Sequence[str],
+    team_id: int | None = None,
+) -> SeasonColumns:
+    """Columnar variant of :func:`fetch_season_rows` (no per-row objects)."""
+    result = _fetch_result(
+        *_with_player_ids(
+            _season_rows_query(
+                _bind_scope(competition_id, season_id), player_ids, metrics, team_id
+            ),
+            player_ids,
+        )
+    )
+    return _season_columns_from_result(result, metrics)
+
+
+def _player_positions_query(
+    scope: _Scope, player_ids: Sequence[int] | None = None
+) -> tuple[str, list[object]] | None:
+    id_bucket, id_params = _player_id_filter(player_ids)
+
+    def build() -> str | None:
+        cte_sql = _position_cte_sql(scope, id_bucket)
+        if _has_position_store():
+            player_filter = ""
+            if id_bucket is not None:
+                player_filter = f" AND {_player_id_sql('pp.player_id', id_bucket)}"
+            stored = f"""
+            SELECT
+                pp.player_id,
+                pp.primary_position,
+                pp.secondary_position
+            FROM {PLAYER_POSITION_TABLE} AS pp
+            WHERE pp.competition_id = {scope.competition}
+              AND pp.season_id = {scope.season}
+              {player_filter}
+            """
+            if not cte_sql:
+                return stored
+            # Fallback für Wettbewerbe ohne gespeicherte Positionen
+            return f"""
+            ;WITH {cte_sql}
+            {stored}
+            UNION ALL
+            SELECT
+                player_id,
+                primary_position,
+                secondary_position
+            FROM resolved_positions
+            WHERE {_stored_positions_missing(scope)}
+            """
+        if not cte_sql:
+            return None
+        return f"""
         ;WITH {cte_sql}
         SELECT
             player_id,
             primary_position,
             secondary_position
-        FROM player_positions
-        """,
-        params,
-    )
+        FROM resolved_positions
+        """
+
+    key = ("player_positions", scope.competition, scope.season, id_bucket)
+    sql = _query_cache.sql(key, build)
+    if sql is None:
+        return None
+    return sql, _position_store_params(scope, id_params)
+
+def _player_positions_from_rows(
+    rows: Sequence[dict[str, object]],
+) -> dict[int, dict[str, str | None]]:
     lookup: dict[int, dict[str, str | None]] = {}
     for row in rows:
         lookup[int(row["player_id"])] = {
@@ -308,23 +1017,45 @@ def fetch_player_positions(
             "secondary_position": row.get("secondary_position"),
         }
     return lookup
-def fetch_match_rows(
-    competition_id: int,
-    season_id: int,
-    player_ids: Sequence[int],
+
+
+def fetch_player_positions(
+    competition_id: int | None,
+    season_id: int | None,
+    player_ids: Sequence[int] | None = None,
+) -> dict[int, dict[str, str | None]]:
+    if (
+        competition_id is None
+        or season_id is None
+        or (player_ids is not None and not player_ids)
+    ):
+        return {}
+    query = _player_positions_query(_bind_scope(competition_id, season_id), player_ids)
+    if query is None:
+        return {}
+    return _player_positions_from_rows(_fetch_dicts(*_with_player_ids(query, player_ids)))
+def _match_rows_query(
+    scope: _Scope,
+    player_ids: Sequence[int] | None,
     metrics: Sequence[str],
     team_id: int | None = None,
-) -> list[MatchRow]:
-    placeholders = ", ".join(["%s"] * len(player_ids))
-    metric_sql = ",\n            ".join(f"pmd.{metric} AS {metric}" for metric in metrics)
-    team_filter = ""
-    params: list[object] = [competition_id, season_id]
+    id_table: bool = False,
+) -> tuple[str, list[object]]:
+    id_bucket, id_params = _player_id_filter(player_ids, id_table)
+    params: list[object] = [*scope.params]
     if team_id is not None:
-        team_filter = " AND pmd.team_id = %s"
         params.append(team_id)
-    params.extend(player_ids)
-    rows = _fetch_dicts(
-        f"""
+    params.extend(id_params)
+
+    def build() -> str:
+        metric_sql = ",\n            ".join(f"pmd.{metric} AS {metric}" for metric in metrics)
+        team_filter = " AND pmd.team_id = %s" if team_id is not None else ""
+        player_filter = (
+            f" AND {_player_id_sql('pmd.player_id', id_bucket)}"
+            if id_bucket is not None
+            else ""
+        )
+        return f"""
         SELECT
             pmd.match_id,
             COALESCE(m.match_date, pmd.match_date) AS match_date,
@@ -336,53 +1067,697 @@ def fetch_match_rows(
           ON m.match_id = pmd.match_id
         LEFT JOIN players AS pl
           ON pl.player_id = pmd.player_id
-        WHERE m.competition_id = %s
-          AND m.season_id = %s
-          AND pmd.player_id IN ({placeholders})
+        WHERE m.competition_id = {scope.competition}
+          AND m.season_id = {scope.season}
+          {player_filter}
           {team_filter}
         ORDER BY m.match_date, pmd.match_id, pmd.player_id
-        """,
-        params,
+        """
+
+    key = (
+        "match_rows",
+        scope.competition,
+        scope.season,
+        tuple(metrics),
+        team_id is not None,
+        id_bucket,
     )
-    results: list[MatchRow] = []
-    for row in rows:
-        metrics_map = {metric: row.get(metric) for metric in metrics}
-        results.append(
-            MatchRow(
-                match_id=int(row["match_id"]),
-                match_date=row.get("match_date"),
-                player_id=int(row["player_id"]),
-                player_name=str(row.get("player_name") or f"Player {row['player_id']}"),
-                metrics=metrics_map,
+    return _query_cache.sql(key, build), params
+
+def _match_rows_from_rows(
+    rows: Sequence[dict[str, object]], metrics: Sequence[str]
+) -> RowSet[MatchRow]:
+    return _row_set(
+        MatchRow,
+        rows,
+        metrics,
+        lambda row: (
+            int(row["match_id"]),
+            row.get("match_date"),
+            int(row["player_id"]),
+            str(row.get("player_name") or f"Player {row['player_id']}"),
+        ),
+    )
+
+
+def fetch_match_rows(
+    competition_id: int,
+    season_id: int,
+    player_ids: Sequence[int],
+    metrics: Sequence[str],
+    team_id: int | None = None,
+) -> RowSet[MatchRow]:
+    rows = _fetch_dicts(
+        *_with_player_ids(
+            _match_rows_query(
+                _bind_scope(competition_id, season_id), player_ids, metrics, team_id
+            ),
+            player_ids,
+        )
+    )
+    return _match_rows_from_rows(rows, metrics)
+def _match_columns_from_result(
+    result: _ResultSet, metrics: Sequence[str]
+) -> MatchColumns:
+    player_id = _int_column(result.column("player_id"))
+    return MatchColumns(
+        metrics=tuple(metrics),
+        match_id=_int_column(result.column("match_id")),
+        match_date=np.array(result.column("match_date"), dtype="datetime64[D]"),
+        player_id=player_id,
+        player_name=_name_column(result.column("player_name"), player_id),
+        values={metric: _float_column(result.column(metric)) for metric in metrics},
+    )
+
+
+def match_columns_from_rows(rows: Sequence[MatchRow], metrics: Sequence[str]) -> MatchColumns:
+    """Columnar view of already loaded :class:`MatchRow` objects."""
+    player_id = _int_column([row.player_id for row in rows])
+    return MatchColumns(
+        metrics=tuple(metrics),
+        match_id=_int_column([row.match_id for row in rows]),
+        match_date=np.array(
+            [row.match_date or np.datetime64("NaT") for row in rows], dtype="datetime64[D]"
+        ),
+        player_id=player_id,
+        player_name=_name_column([row.player_name for row in rows], player_id),
+        values={
+            metric: _float_column([getattr(row, metric, None) for row in rows])
+            for metric in metrics
+        },
+    )
+
+
+def fetch_match_columns(
+    competition_id: int,
+    season_id: int,
+    player_ids: Sequence[int],
+    metrics: Sequence[str],
+    team_id: int | None = None,
+) -> MatchColumns:
+    """Columnar variant of :func:`fetch_match_rows` (no per-row objects)."""
+    result = _fetch_result(
+        *_with_player_ids(
+            _match_rows_query(
+                _bind_scope(competition_id, season_id), player_ids, metrics, team_id
+            ),
+            player_ids,
+        )
+    )
+    return _match_columns_from_result(result, metrics)
+
+
+# Kennzahlen jeder Zeitfenster-Zeile zusätzlich zu den Metriken
+WINDOW_INFO_COLUMNS = ("appearances", "minutes", "90s_played")
+
+
+def numeric_match_metrics(metrics: Sequence[str]) -> list[str]:
+    """Keep the *metrics* that are numeric columns of ``player_match_data``."""
+    columns = _table_columns(PLAYER_MATCH_TABLE)
+    return [
+        metric for metric in dict.fromkeys(metrics) if columns.get(metric.lower()) in _NUMERIC_TYPES
+    ]
+
+
+def _window_metric_sql(metric: str) -> str:
+    column = f"CAST(pmd.[{metric}] AS float)"
+    minutes = "CAST(pmd.minutes AS float)"
+    # Nur Minuten aus Spielen zählen, in denen die Metrik erfasst wurde
+    played = f"NULLIF(SUM(CASE WHEN pmd.[{metric}] IS NOT NULL THEN {minutes} END), 0)"
+    if is_rate_metric(metric):
+        return f"SUM({column} * {minutes}) / {played} AS [{metric}]"
+    return f"SUM({column}) * 90.0 / {played} AS [{metric}]"
+
+
+def _window_rows_query(
+    scope: _Scope, window: MatchWindow, metrics: Sequence[str]
+) -> tuple[str, list[object]]:
+    bounds = (
+        ("m.match_date >= %s", window.date_from),
+        ("m.match_date <= %s", window.date_to),
+        ("m.match_week >= %s", window.week_from),
+        ("m.match_week <= %s", window.week_to),
+    )
+    params: list[object] = [*scope.params, *(value for _, value in bounds if value is not None)]
+
+    def build() -> str:
+        window_filter = "".join(
+            f"\n          AND {clause}" for clause, value in bounds if value is not None
+        )
+        metric_sql = "".join(
+            f",\n            {_window_metric_sql(metric)}"
+            for metric in metrics
+            if metric not in WINDOW_INFO_COLUMNS
+        )
+        team_sql = "MAX(pmd.team_name)" if _has_pmd_column("team_name") else "NULL"
+        return f"""
+        SELECT
+            pmd.player_id,
+            COALESCE(MAX(pl.player_name), CONCAT('Player ', pmd.player_id)) AS player_name,
+            {team_sql} AS team_name,
+            NULL AS primary_position,
+            NULL AS secondary_position,
+            COUNT(DISTINCT pmd.match_id) AS appearances,
+            SUM(CAST(pmd.minutes AS float)) AS minutes,
+            SUM(CAST(pmd.minutes AS float)) / 90.0 AS [90s_played]{metric_sql}
+        FROM player_match_data AS pmd
+        INNER JOIN matches AS m
+          ON m.match_id = pmd.match_id
+        LEFT JOIN players AS pl
+          ON pl.player_id = pmd.player_id
+        WHERE m.competition_id = {scope.competition}
+          AND m.season_id = {scope.season}{window_filter}
+        GROUP BY pmd.player_id
+        HAVING SUM(pmd.minutes) > 0
+        ORDER BY player_name, pmd.player_id
+        """
+
+    key = (
+        "window_rows",
+        scope.competition,
+        scope.season,
+        tuple(metrics),
+        tuple(value is not None for _, value in bounds),
+    )
+    return _query_cache.sql(key, build), params
+
+
+def fetch_window_rows(
+    competition_id: int,
+    season_id: int,
+    window: MatchWindow,
+    metrics: Sequence[str],
+) -> RowSet[SeasonRow]:
+    """Season-style rows aggregated from ``player_match_data`` over *window*.
+
+    One grouped statement over all players: counting metrics come back per
+    90 minutes, rates (see :func:`~players.labels.is_rate_metric`) weighted
+    by minutes.  ``appearances``, ``minutes`` and ``90s_played`` are totals.
+    Positions are left empty; callers resolve them like for season rows.
+    """
+    rows = _fetch_dicts(
+        *_window_rows_query(_bind_scope(competition_id, season_id), window, metrics)
+    )
+    return _season_rows_from_rows(rows, [*WINDOW_INFO_COLUMNS, *metrics])
+
+
+EXPORT_BATCH_SIZE = 2000
+
+
+def iter_season_export(
+    competition_id: int,
+    season_id: int,
+    metrics: Sequence[str],
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[tuple[list[str], list[tuple[object, ...]]]]:
+    """Yield ``(columns, rows)`` batches of every season row of a competition.
+
+    Derived metrics are appended as extra columns, computed per batch.
+    """
+    query = _season_rows_query(_bind_scope(competition_id, season_id), None, metrics)
+    derived = [metric for metric in dict.fromkeys(metrics) if metric in DERIVED_METRICS]
+    inputs = frozenset(base_columns(derived))
+    for columns, rows in _fetch_batches(*query, batch_size=batch_size):
+        if derived:
+            values = _derived_values(
+                derived,
+                {
+                    column: _float_column([row[position] for row in rows])
+                    for position, column in enumerate(columns)
+                    if column in inputs
+                },
             )
+            extra = zip(*(
+                [None if value != value else value for value in values[metric].tolist()]
+                for metric in derived
+            ))
+            columns = [*columns, *derived]
+            rows = [(*row, *more) for row, more in zip(rows, extra)]
+        yield columns, rows
+
+
+def iter_match_export(
+    competition_id: int,
+    season_id: int,
+    metrics: Sequence[str],
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[tuple[list[str], list[tuple[object, ...]]]]:
+    """Yield ``(columns, rows)`` batches of every match row of a competition."""
+    query = _match_rows_query(_bind_scope(competition_id, season_id), None, metrics)
+    yield from _fetch_batches(*query, batch_size=batch_size)
+@dataclass(slots=True)
+class DashboardBundle:
+    competition_id: int | None
+    season_id: int | None
+    competitions: list[CompetitionRecord]
+    positions: list[str]
+    players: list[dict[str, object]]
+    teams: list[dict[str, object]]
+    player_positions: dict[int, dict[str, str | None]]
+    player_ids: tuple[int, ...]
+    season_rows: list[SeasonRow]
+    match_rows: list[MatchRow]
+    match_columns: MatchColumns | None = None
+
+    @property
+    def competition_key(self) -> str | None:
+        if self.competition_id is None or self.season_id is None:
+            return None
+        return f"{self.competition_id}:{self.season_id}"
+
+
+def fetch_dashboard_bundle(
+    competition_id: int | None,
+    season_id: int | None,
+    player_ids: Sequence[int],
+    season_metrics: Sequence[str],
+    match_metrics: Sequence[str],
+    columnar_matches: bool = False,
+    default_players: int = 0,
+    team_id: int | None = None,
+) -> DashboardBundle:
+    """Load everything one dashboard render needs in a single round trip.
+
+    The competition is resolved inside the batch: an unknown or missing
+    competition/season falls back to the first one in ``player_season_data``,
+    mirroring the view's default.  Season and match rows are only fetched for
+    *player_ids*; ``DashboardBundle.player_ids`` records which ids those were.
+    Without *player_ids*, *default_players* > 0 selects the first players of
+    the player list inside the batch and loads their rows; with *team_id* the
+    season rows of that whole team are loaded instead (match rows are not).
+    With *columnar_matches* the match rows arrive as ``match_columns`` instead
+    of ``match_rows``.
+    """
+
+    player_ids = tuple(int(pid) for pid in player_ids)
+    use_defaults = not player_ids and team_id is None and default_players > 0
+    scope = _BATCH_SCOPE
+    statements: list[tuple[str, Sequence[object]]] = [
+        (_BUNDLE_PRELUDE, [competition_id, season_id]),
+    ]
+    id_setup = _player_id_setup(player_ids)
+    if id_setup is not None:
+        statements.append(id_setup)
+    if use_defaults:
+        statements.append((_DEFAULT_PLAYERS_SETUP, [int(default_players)]))
+    statements += [
+        _competitions_query(),
+        _players_query(scope),
+        _teams_query(scope),
+    ]
+    positions_query = _positions_query(scope)
+    if positions_query is not None:
+        statements.append(positions_query)
+    player_positions_query = _player_positions_query(scope)
+    if player_positions_query is not None:
+        statements.append(player_positions_query)
+    load_season = (
+        bool((player_ids or use_defaults) and season_metrics) or team_id is not None
+    )
+    load_matches = bool((player_ids or use_defaults) and match_metrics)
+    if load_season:
+        statements.append(
+            _season_rows_query(scope, player_ids, season_metrics, team_id, id_table=use_defaults)
         )
-    return results
+    if load_matches:
+        statements.append(
+            _match_rows_query(scope, player_ids, match_metrics, id_table=use_defaults)
+        )
+
+    result_sets = iter(_fetch_result_sets(statements))
+    empty = _ResultSet([], [])
+    scope_row = next(result_sets, empty).dicts()
+    resolved = scope_row[0] if scope_row else {}
+    resolved_competition = resolved.get("competition_id")
+    resolved_season = resolved.get("season_id")
+    if use_defaults:
+        player_ids = tuple(int(row["player_id"]) for row in next(result_sets, empty).dicts())
+    competitions = _competitions_from_rows(next(result_sets, empty).dicts())
+    players = next(result_sets, empty).dicts()
+    teams = next(result_sets, empty).dicts()
+    positions = (
+        _positions_from_rows(next(result_sets, empty).dicts())
+        if positions_query is not None
+        else []
+    )
+    player_positions = (
+        _player_positions_from_rows(next(result_sets, empty).dicts())
+        if player_positions_query is not None
+        else {}
+    )
+    season_rows = (
+        _season_rows_from_rows(next(result_sets, empty).dicts(), season_metrics)
+        if load_season
+        else []
+    )
+    match_rows: list[MatchRow] = []
+    match_columns: MatchColumns | None = None
+    if load_matches:
+        match_result = next(result_sets, empty)
+        if columnar_matches:
+            match_columns = _match_columns_from_result(match_result, match_metrics)
+        else:
+            match_rows = _match_rows_from_rows(match_result.dicts(), match_metrics)
+    return DashboardBundle(
+        competition_id=None if resolved_competition is None else int(resolved_competition),
+        season_id=None if resolved_season is None else int(resolved_season),
+        competitions=competitions,
+        positions=positions,
+        players=players,
+        teams=teams,
+        player_positions=player_positions,
+        player_ids=player_ids,
+        season_rows=season_rows,
+        match_rows=match_rows,
+        match_columns=match_columns,
+    )
+def _data_stamp_sql(scope_count: int) -> str:
+    """Stamp columns for *scope_count* ``(competition_id, season_id)`` pairs in one statement."""
+    scopes = ", ".join(["(%s, %s)"] * scope_count)
+    return f"""
+    SELECT
+        scope.competition_id,
+        scope.season_id,
+        (SELECT COUNT_BIG(*)
+           FROM {PLAYER_SEASON_TABLE} AS psd
+          WHERE psd.competition_id = scope.competition_id
+            AND psd.season_id = scope.season_id) AS season_rows,
+        matches_agg.match_rows,
+        matches_agg.match_count,
+        matches_agg.last_match_date
+    FROM (VALUES {scopes}) AS scope (competition_id, season_id)
+    OUTER APPLY (
+        SELECT
+            COUNT_BIG(*) AS match_rows,
+            COUNT(DISTINCT pmd.match_id) AS match_count,
+            MAX(m.match_date) AS last_match_date
+        FROM {PLAYER_MATCH_TABLE} AS pmd
+        INNER JOIN matches AS m
+          ON m.match_id = pmd.match_id
+        WHERE m.competition_id = scope.competition_id
+          AND m.season_id = scope.season_id
+    ) AS matches_agg
+    """
+
+
+class _DataVersions:
+    """Cheap per competition/season data stamps for conditional GETs.
+
+    The stamp combines row and match counts with the last match date; it is
+    re-read at most every ``PLAYERS_DATA_VERSION_TTL`` seconds.  The time a
+    stamp was first seen serves as ``Last-Modified``.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[tuple[int, int], tuple[str, datetime, float]] = {}
+
+    def get(self, competition_id: int, season_id: int) -> tuple[str, datetime]:
+        key = (int(competition_id), int(season_id))
+        return self.get_many([key])[key]
+
+    def get_many(
+        self, keys: Sequence[tuple[int, int]]
+    ) -> dict[tuple[int, int], tuple[str, datetime]]:
+        """Stamps for several competitions/seasons; expired ones are read in one query."""
+        keys = list(dict.fromkeys((int(c), int(s)) for c, s in keys))
+        ttl = float(getattr(settings, "PLAYERS_DATA_VERSION_TTL", 60))
+        now = time.monotonic()
+        result: dict[tuple[int, int], tuple[str, datetime]] = {}
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[2] < ttl:
+                result[key] = (entry[0], entry[1])
+        missing = [key for key in keys if key not in result]
+        if not missing:
+            return result
+
+        rows = _fetch_dicts(
+            _data_stamp_sql(len(missing)), [value for key in missing for value in key]
+        )
+        by_key = {(int(row["competition_id"]), int(row["season_id"])): row for row in rows}
+        with self._lock:
+            for key in missing:
+                row = by_key.get(key, {})
+                stamp = ":".join(
+                    str(row.get(column) or 0)
+                    for column in ("season_rows", "match_rows", "match_count", "last_match_date")
+                )
+                stamp = f"{stamp}:{schema_registry.version}"
+                previous = self._entries.get(key)
+                seen_at = (
+                    previous[1]
+                    if previous is not None and previous[0] == stamp
+                    else datetime.now(timezone.utc).replace(microsecond=0)
+                )
+                self._entries[key] = (stamp, seen_at, time.monotonic())
+                result[key] = (stamp, seen_at)
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_data_versions = _DataVersions()
+
+
+def data_version(competition_id: int, season_id: int) -> tuple[str, datetime]:
+    """Return ``(stamp, last_modified)`` for one competition/season."""
+    return _data_versions.get(competition_id, season_id)
+
+
+def data_versions(
+    keys: Sequence[tuple[int, int]],
+) -> dict[tuple[int, int], tuple[str, datetime]]:
+    """:func:`data_version` for several ``(competition_id, season_id)`` pairs at once."""
+    return _data_versions.get_many(keys)
+
+
+_P = ParamSpec("_P")
+_T = TypeVar("_T")
+_db_pool: ThreadPoolExecutor | None = None
+_db_pool_lock = threading.Lock()
+
+
+def _get_db_pool() -> ThreadPoolExecutor:
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = ThreadPoolExecutor(
+                    max_workers=max(1, int(getattr(settings, "PLAYERS_DB_POOL_SIZE", 4))),
+                    thread_name_prefix="players-db",
+                    initializer=_init_pool_connection,
+                )
+    return _db_pool
+
+
+def _init_pool_connection() -> None:
+    """Keep this pool thread's connection open between calls.
+
+    Only the thread's own connection gets ``PLAYERS_DB_POOL_CONN_MAX_AGE`` and
+    health checks; request connections keep the project's ``DATABASES`` setting.
+    """
+    connection.settings_dict = {
+        **connection.settings_dict,
+        "CONN_MAX_AGE": int(getattr(settings, "PLAYERS_DB_POOL_CONN_MAX_AGE", 300)),
+        "CONN_HEALTH_CHECKS": True,
+    }
+
+
+def in_db_pool(func: Callable[_P, _T]) -> Callable[_P, Awaitable[_T]]:
+    """Async twin of *func* that runs it on the bounded players DB pool.
+
+    Every pool thread keeps its own Django connection open between calls for
+    ``PLAYERS_DB_POOL_CONN_MAX_AGE`` seconds (see :func:`_init_pool_connection`);
+    after each call it is only closed when broken or expired, exactly like at
+    the end of a request, and a health check re-validates it before the next
+    query.
+    """
+
+    def call(*args: _P.args, **kwargs: _P.kwargs) -> _T:
+        try:
+            return func(*args, **kwargs)
+        finally:
+            connection.close_if_unusable_or_obsolete()
+
+    @wraps(func)
+    async def wrapper(*args: _P.args, **kwargs: _P.kwargs) -> _T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_db_pool(), partial(call, *args, **kwargs))
+
+    return wrapper
+
+
+async def aiter_in_db_pool(
+    batches: Callable[[], Iterator[_T]], max_pending: int = 2
+) -> AsyncIterator[_T]:
+    """Async iterator over ``batches()`` running on the players DB pool.
+
+    A streaming generator keeps its cursor open between pages, so it runs
+    start to finish inside one :func:`in_db_pool` call on a single pool
+    thread (and its connection) and hands every page over through a queue
+    of *max_pending* pages.  Stopping the iteration early (client gone)
+    closes the generator and frees the pool thread.
+    """
+    loop = asyncio.get_running_loop()
+    pages: asyncio.Queue[_T] = asyncio.Queue(max_pending)
+    stop = threading.Event()
+
+    def produce() -> None:
+        iterator = batches()
+        try:
+            for page in iterator:
+                asyncio.run_coroutine_threadsafe(pages.put(page), loop).result()
+                if stop.is_set():
+                    break
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    producer = asyncio.ensure_future(in_db_pool(produce)())
+    try:
+        while True:
+            getter = asyncio.ensure_future(pages.get())
+            await asyncio.wait({getter, producer}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+                continue
+            getter.cancel()
+            # Generator fertig (oder fehlgeschlagen): Restseiten liefern, Fehler weiterreichen
+            while not pages.empty():
+                yield pages.get_nowait()
+            producer.result()
+            return
+    finally:
+        if not producer.done():
+            stop.set()
+            # Wartendes put() im Pool-Thread freigeben, damit er ``stop`` sieht
+            while not pages.empty():
+                pages.get_nowait()
+
+
+afetch_season_rows = in_db_pool(fetch_season_rows)
+afetch_match_columns = in_db_pool(fetch_match_columns)
+afetch_dashboard_bundle = in_db_pool(fetch_dashboard_bundle)
+adata_version = in_db_pool(data_version)
+
+
 def _fetch_dicts(sql: str, params: Sequence[object] | None = None) -> list[dict[str, object]]:
     """Execute *sql* and return dicts with lowercase keys."""
+    return _fetch_result(sql, params).dicts()
+
+
+@dataclass(slots=True)
+class _ResultSet:
+    columns: list[str]
+    rows: list[tuple[object, ...]]
+    def dicts(self) -> list[dict[str, object]]:
+        return [dict(zip(self.columns, row)) for row in self.rows]
+    def column(self, name: str) -> list[object]:
+        index = self.columns.index(name)
+        return [row[index] for row in self.rows]
+
+
+def _read_result(cursor) -> _ResultSet:
+    columns = [column[0].lower() for column in cursor.description]
+    return _ResultSet(columns, [tuple(row) for row in cursor.fetchall()])
+
+
+def _fetch_result(sql: str, params: Sequence[object] | None = None) -> _ResultSet:
+    """Execute *sql* and return the raw tuples plus lowercase column names."""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params or [])
+        # Setup statements (temp tables) in front of the SELECT yield no rows
+        while cursor.description is None and cursor.nextset():
+            pass
+        return _read_result(cursor)
+
+
+def _fetch_batches(
+    sql: str,
+    params: Sequence[object] | None = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[tuple[list[str], list[tuple[object, ...]]]]:
+    """Streaming counterpart of :func:`_fetch_result` built on ``fetchmany``.
+
+    Only one batch is held in memory at a time; the cursor stays open until
+    the generator is exhausted or closed.
+    """
     with connection.cursor() as cursor:
         cursor.execute(sql, params or [])
+        while cursor.description is None and cursor.nextset():
+            pass
         columns = [column[0].lower() for column in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield columns, [tuple(row) for row in rows]
 
 
-def _build_position_cte(
-    competition_id: int | None,
-    season_id: int | None,
-    player_ids: Sequence[int] | None = None,
-) -> tuple[str, list[object]]:
-    if (
-        competition_id is None
-        or season_id is None
-        or not _has_pmd_column("position")
-    ):
-        return "", []
-    params: list[object] = [competition_id, season_id]
+def _fetch_result_sets(
+    statements: Sequence[tuple[str, Sequence[object]]],
+) -> list[_ResultSet]:
+    """Send *statements* as one batch and collect every result set via ``nextset()``."""
+    sql = "\n".join(f"{statement.strip().rstrip(';')};" for statement, _ in statements)
+    params: list[object] = []
+    for _statement, statement_params in statements:
+        params.extend(statement_params)
+    results: list[_ResultSet] = []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            if cursor.description is not None:
+                results.append(_read_result(cursor))
+            if not cursor.nextset():
+                break
+    return results
+
+
+def _float_column(values: Sequence[object]) -> np.ndarray:
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.fromiter(
+            (_float_or_nan(value) for value in values), dtype=np.float64, count=len(values)
+        )
+
+
+def _float_or_nan(value: object) -> float:
+    try:
+        return float(value)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _int_column(values: Sequence[object]) -> np.ndarray:
+    return np.asarray(values, dtype=np.int64)
+
+
+def _object_column(values: Sequence[object]) -> np.ndarray:
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+def _name_column(values: Sequence[object], player_ids: np.ndarray) -> np.ndarray:
+    return _object_column(
+        [str(name or f"Player {pid}") for name, pid in zip(values, player_ids.tolist())]
+    )
+
+
+def _position_cte_sql(scope: _Scope, id_bucket: int | str | None = None) -> str:
+    """CTE chain ending in ``resolved_positions``; its parameters are
+    ``scope.params`` followed by the id parameters of *id_bucket*."""
+    if not _has_pmd_column("position"):
+        return ""
     player_filter = ""
-    if player_ids:
-        placeholders = ", ".join(["%s"] * len(player_ids))
-        player_filter = f" AND pmd.player_id IN ({placeholders})"
-        params.extend(player_ids)
-    cte_sql = f"""
+    if id_bucket is not None:
+        player_filter = f" AND {_player_id_sql('pmd.player_id', id_bucket)}"
+    return f"""
     base_positions AS (
         SELECT
             pmd.player_id,
@@ -390,8 +1765,8 @@ def _build_position_cte(
         FROM {PLAYER_MATCH_TABLE} AS pmd
         INNER JOIN matches AS m
           ON m.match_id = pmd.match_id
-        WHERE m.competition_id = %s
-          AND m.season_id = %s
+        WHERE m.competition_id = {scope.competition}
+          AND m.season_id = {scope.season}
           AND pmd.position IS NOT NULL
           AND LTRIM(RTRIM(pmd.position)) <> ''
           {player_filter}
@@ -416,7 +1791,7 @@ def _build_position_cte(
             ) AS position_rank
         FROM counted_positions
     ),
-    player_positions AS (
+    resolved_positions AS (
         SELECT DISTINCT
             player_id,
             MAX(CASE WHEN position_rank = 1 THEN position END)
@@ -426,4 +1801,118 @@ def _build_position_cte(
         FROM ranked_positions
     )
     """
-    return cte_sql, params
+
+
+_POSITION_STORE_DDL = f"""
+IF OBJECT_ID(N'{PLAYER_POSITION_TABLE}', N'U') IS NULL
+BEGIN
+    CREATE TABLE {PLAYER_POSITION_TABLE} (
+        competition_id int NOT NULL,
+        season_id int NOT NULL,
+        player_id int NOT NULL,
+        primary_position nvarchar(16) NULL,
+        secondary_position nvarchar(16) NULL,
+        match_count int NOT NULL,
+        refreshed_at_utc datetime2 NOT NULL,
+        CONSTRAINT pk_{PLAYER_POSITION_TABLE}
+            PRIMARY KEY (competition_id, season_id, player_id)
+    );
+END
+"""
+
+
+def ensure_position_store() -> None:
+    """Create the ``player_positions`` table if it does not exist yet."""
+    with connection.cursor() as cursor:
+        cursor.execute(_POSITION_STORE_DDL)
+    schema_changed.send(sender=ensure_position_store)
+
+
+def stale_position_scopes(force: bool = False) -> list[tuple[int, int, int]]:
+    """Return ``(competition_id, season_id, match_count)`` needing a refresh.
+
+    A competition/season is stale when the number of matches in
+    ``player_match_data`` differs from the count recorded at its last refresh.
+    """
+    rows = _fetch_dicts(
+        f"""
+        ;WITH source AS (
+            SELECT
+                m.competition_id,
+                m.season_id,
+                COUNT(DISTINCT pmd.match_id) AS match_count
+            FROM {PLAYER_MATCH_TABLE} AS pmd
+            INNER JOIN matches AS m
+              ON m.match_id = pmd.match_id
+            GROUP BY m.competition_id, m.season_id
+        ),
+        stored AS (
+            SELECT
+                competition_id,
+                season_id,
+                MAX(match_count) AS match_count
+            FROM {PLAYER_POSITION_TABLE}
+            GROUP BY competition_id, season_id
+        )
+        SELECT
+            source.competition_id,
+            source.season_id,
+            source.match_count
+        FROM source
+        LEFT JOIN stored
+          ON stored.competition_id = source.competition_id
+         AND stored.season_id = source.season_id
+        WHERE %s = 1
+           OR stored.match_count IS NULL
+           OR stored.match_count <> source.match_count
+        ORDER BY source.competition_id, source.season_id
+        """,
+        [1 if force else 0],
+    )
+    return [
+        (int(row["competition_id"]), int(row["season_id"]), int(row["match_count"]))
+        for row in rows
+    ]
+
+
+def refresh_position_store(competition_id: int, season_id: int, match_count: int) -> int:
+    """Recompute the stored positions of one competition/season; return the row count."""
+    scope = _bind_scope(competition_id, season_id)
+    cte_sql = _position_cte_sql(scope)
+    if not cte_sql:
+        return 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                DELETE FROM {PLAYER_POSITION_TABLE}
+                WHERE competition_id = %s
+                  AND season_id = %s
+                """,
+                [competition_id, season_id],
+            )
+            cursor.execute(
+                f"""
+                ;WITH {cte_sql}
+                INSERT INTO {PLAYER_POSITION_TABLE} (
+                    competition_id,
+                    season_id,
+                    player_id,
+                    primary_position,
+                    secondary_position,
+                    match_count,
+                    refreshed_at_utc
+                )
+                SELECT
+                    %s,
+                    %s,
+                    player_id,
+                    primary_position,
+                    secondary_position,
+                    %s,
+                    SYSUTCDATETIME()
+                FROM resolved_positions
+                """,
+                [*scope.params, competition_id, season_id, match_count],
+            )
+            return cursor.rowcount
@@ -0,0 +1,282 @@
+"""Sorted per competition/season metric distributions for percentile ranks."""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Sequence
+
+import numpy as np
+
+from .data_access import (
+    data_version,
+    fetch_player_positions,
+    fetch_season_columns,
+    numeric_season_metrics,
+)
+from .labels import POSITION_GROUPS, SEASON_METRIC_CATEGORIES
+
+SCALES = ("raw", "minmax", "zscore", "percentile")
+
+
+@dataclass(slots=True)
+class SortedDistribution:
+    """Column-wise ascending metric values of one player group (NaN last).
+
+    ``mean``/``std``/``minimum``/``maximum`` are per metric column and NaN
+    where the group has no value for it.
+    """
+
+    sorted_values: np.ndarray
+    counts: np.ndarray
+    mean: np.ndarray
+    std: np.ndarray
+    minimum: np.ndarray
+    maximum: np.ndarray
+
+    @classmethod
+    def build(cls, values: np.ndarray) -> SortedDistribution:
+        sorted_values = np.sort(values, axis=0)
+        counts = np.count_nonzero(~np.isnan(values), axis=0)
+        columns = np.arange(values.shape[1])
+        has_values = counts > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.nansum(values, axis=0) / counts
+            std = np.sqrt(np.nansum(np.square(values - mean), axis=0) / counts)
+        if len(values):
+            minimum = np.where(has_values, sorted_values[0], np.nan)
+            maximum = np.where(
+                has_values, sorted_values[np.maximum(counts - 1, 0), columns], np.nan
+            )
+        else:
+            minimum = maximum = np.full(values.shape[1], np.nan)
+        return cls(
+            sorted_values=sorted_values,
+            counts=counts,
+            mean=mean,
+            std=std,
+            minimum=minimum,
+            maximum=maximum,
+        )
+
+    def ranks(self, column: int, values: np.ndarray) -> np.ndarray:
+        """Mid-rank percentiles (0-100) of *values* within *column*."""
+        count = int(self.counts[column])
+        if not count:
+            return np.full(len(values), np.nan)
+        population = self.sorted_values[:count, column]
+        below = np.searchsorted(population, values, side="left")
+        up_to = np.searchsorted(population, values, side="right")
+        ranks = (below + up_to) * (50.0 / count)
+        ranks[np.isnan(values)] = np.nan
+        return ranks
+
+    def scale(self, column: int, values: np.ndarray, scale: str) -> np.ndarray:
+        """Scale *values* of *column*: ``minmax``/``percentile`` 0-100, ``zscore`` in SD."""
+        if scale == "percentile":
+            return self.ranks(column, values)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if scale == "zscore":
+                spread = self.std[column]
+                return (values - self.mean[column]) / (spread if spread > 0 else np.nan)
+            if scale == "minmax":
+                low, high = self.minimum[column], self.maximum[column]
+                return (values - low) / (high - low if high > low else np.nan) * 100.0
+        return values
+
+
+@dataclass(slots=True)
+class SeasonDistributions:
+    """All players of one competition/season, one row per player.
+
+    After a transfer only the row with the most minutes is kept (see
+    :func:`_one_row_per_player`), so ranks and scaled values of such a
+    player always describe their main-club row.
+    """
+
+    stamp: str
+    metric_index: dict[str, int]
+    player_index: dict[int, int]
+    player_ids: np.ndarray
+    player_names: np.ndarray
+    team_names: np.ndarray
+    positions: np.ndarray
+    position_groups: np.ndarray
+    values: np.ndarray
+    group_summaries: dict[str | None, SortedDistribution]
+    groups: dict[str | None, SortedDistribution] = field(default_factory=dict)
+
+    def group(self, position: str | None = None) -> SortedDistribution:
+        """League-wide distribution, or the one of a primary *position*."""
+        distribution = self.groups.get(position)
+        if distribution is None:
+            rows = self.values if position is None else self.values[self.positions == position]
+            distribution = SortedDistribution.build(rows)
+            self.groups[position] = distribution
+        return distribution
+
+    def percentiles(
+        self,
+        player_ids: Sequence[int],
+        metrics: Sequence[str],
+        by_position: bool = False,
+    ) -> dict[int, dict[str, float | None]]:
+        return self._scaled(
+            player_ids,
+            metrics,
+            lambda row: self.group(self.positions[row] if by_position else None),
+            "percentile",
+        )
+
+    def normalized(
+        self,
+        player_ids: Sequence[int],
+        metrics: Sequence[str],
+        scale: str,
+    ) -> dict[int, dict[str, float | None]]:
+        """Scale each player's metrics against their position group summary.
+
+        Players without a known group are scaled against the whole league.
+        """
+        return self._scaled(
+            player_ids,
+            metrics,
+            lambda row: self.group_summaries.get(
+                self.position_groups[row], self.group_summaries[None]
+            ),
+            scale,
+        )
+
+    def _scaled(
+        self,
+        player_ids: Sequence[int],
+        metrics: Sequence[str],
+        distribution_of: Callable[[int], SortedDistribution],
+        scale: str,
+    ) -> dict[int, dict[str, float | None]]:
+        metrics = [metric for metric in metrics if metric in self.metric_index]
+        columns = [self.metric_index[metric] for metric in metrics]
+        known = [int(pid) for pid in player_ids if int(pid) in self.player_index]
+        result: dict[int, dict[str, float | None]] = {pid: {} for pid in known}
+        if not known or not columns:
+            return result
+
+        rows = np.array([self.player_index[pid] for pid in known], dtype=np.int64)
+        by_distribution: dict[int, tuple[SortedDistribution, list[int]]] = {}
+        for member, row in enumerate(rows.tolist()):
+            distribution = distribution_of(row)
+            by_distribution.setdefault(id(distribution), (distribution, []))[1].append(member)
+        digits = 1 if scale == "percentile" else 2
+        for distribution, members in by_distribution.values():
+            member_rows = rows[members]
+            for metric, column in zip(metrics, columns):
+                scaled = distribution.scale(column, self.values[member_rows, column], scale)
+                for member, value in zip(members, scaled.tolist()):
+                    result[known[member]][metric] = None if value != value else round(value, digits)
+        return result
+
+
+def _season_metric_keys() -> list[str]:
+    return list(
+        dict.fromkeys(
+            metric for metrics in SEASON_METRIC_CATEGORIES.values() for metric in metrics
+        )
+    )
+
+
+def _one_row_per_player(player_ids: np.ndarray, minutes: np.ndarray | None) -> np.ndarray:
+    """Row indices keeping one row per player (the one with most minutes).
+
+    Players who changed teams within a season have one row per team; the
+    distributions must count each player once.  The kept main-club row is
+    also the one ranked and scaled for that player, even where the
+    dashboard shows the row of another team.
+    """
+    if minutes is None:
+        minutes = np.zeros(len(player_ids))
+    order = np.lexsort((-np.nan_to_num(minutes, nan=-1.0), player_ids))
+    _, first = np.unique(player_ids[order], return_index=True)
+    return np.sort(order[first])
+
+
+def _build(competition_id: int, season_id: int, stamp: str) -> SeasonDistributions:
+    metrics = numeric_season_metrics(_season_metric_keys())
+    columns = fetch_season_columns(competition_id, season_id, None, metrics)
+    keep = _one_row_per_player(
+        columns.player_id, columns.column("minutes") if "minutes" in metrics else None
+    )
+    player_ids = columns.player_id[keep]
+    resolved = fetch_player_positions(competition_id, season_id)
+    positions = np.empty(len(keep), dtype=object)
+    positions[:] = [
+        (resolved.get(pid) or {}).get("primary_position") or primary or None
+        for pid, primary in zip(player_ids.tolist(), columns.primary_position[keep].tolist())
+    ]
+    values = (
+        np.column_stack([columns.column(metric)[keep] for metric in metrics])
+        if metrics
+        else np.empty((len(keep), 0))
+    )
+    position_groups = np.empty(len(keep), dtype=object)
+    position_groups[:] = [POSITION_GROUPS.get(position) for position in positions.tolist()]
+    # Zusammenfassungen je Positionsgruppe einmal vorab (None = ganze Liga)
+    group_summaries = {None: SortedDistribution.build(values)}
+    for group in dict.fromkeys(position_groups.tolist()):
+        if group is not None:
+            group_summaries[group] = SortedDistribution.build(values[position_groups == group])
+    return SeasonDistributions(
+        stamp=stamp,
+        metric_index={metric: index for index, metric in enumerate(metrics)},
+        player_index={pid: index for index, pid in enumerate(player_ids.tolist())},
+        player_ids=player_ids,
+        player_names=columns.player_name[keep],
+        team_names=columns.team_name[keep],
+        positions=positions,
+        position_groups=position_groups,
+        values=values,
+        group_summaries=group_summaries,
+    )
+
+
+class _DistributionCache:
+    """LRU of :class:`SeasonDistributions` per competition/season and data stamp."""
+
+    def __init__(self, max_scopes: int = 32) -> None:
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[int, int], SeasonDistributions] = OrderedDict()
+        self._max_scopes = max_scopes
+
+    def get(
+        self, competition_id: int, season_id: int, stamp: str | None = None
+    ) -> SeasonDistributions:
+        key = (int(competition_id), int(season_id))
+        if stamp is None:
+            stamp, _ = data_version(*key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.stamp == stamp:
+                self._entries.move_to_end(key)
+                return entry
+        entry = _build(*key, stamp)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_scopes:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_distributions = _DistributionCache()
+
+
+def season_distributions(
+    competition_id: int, season_id: int, stamp: str | None = None
+) -> SeasonDistributions:
+    """Distributions of one competition/season; pass *stamp* when the caller
+    already read it (see ``data_versions``) to skip the per-scope check."""
+    return _distributions.get(competition_id, season_id, stamp)
+
@@ -4,6 +4,8 @@ from __future__ import annotations
 
 from collections import OrderedDict
 
+from core.expressions import compile_derived_metrics
+
 
 # ---------------------------------------------------------------------------
 # Spaltenlabels / Formate
@@ -713,9 +715,58 @@ MATCH_COLUMN_LABELS: dict[str, tuple[str, str | None, str]] = {
 }
 
 
+# ---------------------------------------------------------------------------
+# Abgeleitete Season-Metriken: Schlüssel -> (Ausdruck, Label, Legende, Format)
+# Ausdrücke nur über Saisonsummen (SEASON_TOTAL_COLUMNS): Spalten wie np_xg
+# oder xgchain sind bereits pro Partie normiert, ein erneutes Teilen durch
+# 90s_played wäre falsch.  Sie werden beim Import einmal geparst/geprüft, die
+# Basisspalten landen automatisch im SELECT.
+# ---------------------------------------------------------------------------
+
+SEASON_TOTAL_COLUMNS: tuple[str, ...] = (
+    "appearances",
+    "starting_appearances",
+    "90s_played",
+    "goals",
+    "assists",
+)
+
+DERIVED_METRIC_DEFINITIONS: dict[str, tuple[str, str, str | None, str]] = {
+    "goal_contributions_90": (
+        "(goals + assists) / 90s_played",
+        "Scorerpunkte / 90",
+        "Tore und Assists pro 90 Minuten",
+        "float",
+    ),
+    "assists_90": (
+        "assists / 90s_played",
+        "Assists / 90",
+        "Assists pro 90 Minuten",
+        "float",
+    ),
+    "minutes_per_appearance": (
+        "90s_played * 90 / appearances",
+        "Minuten pro Einsatz",
+        "Einsatzminuten geteilt durch die Anzahl der Einsätze",
+        "float",
+    ),
+    "starting_share": (
+        "starting_appearances / appearances",
+        "Startelf-Quote",
+        "Anteil der Einsätze in der Startelf",
+        "percent",
+    ),
+}
+
+DERIVED_METRICS, DERIVED_COLUMN_LABELS = compile_derived_metrics(
+    DERIVED_METRIC_DEFINITIONS, SEASON_TOTAL_COLUMNS
+)
+
+
 COLUMN_LABELS: dict[str, tuple[str, str | None, str]] = {
     **SEASON_COLUMN_LABELS,
     **MATCH_COLUMN_LABELS,
+    **DERIVED_COLUMN_LABELS,
 }
 
 
@@ -791,6 +842,7 @@ SEASON_METRIC_CATEGORIES: dict[str, list[str]] = {
         "red_cards_90",
         "errors_90",
     ],
+    "derived": list(DERIVED_METRICS),
 }
 
 
@@ -940,6 +992,7 @@ CATEGORY_LABELS: dict[str, str] = {
     "duels": "Zweikämpfe",
     "obv": "On-Ball Value",
     "opponent": "Gegner",
+    "derived": "Abgeleitet",
 }
 
 
@@ -1003,6 +1056,20 @@ POSITION_LABELS: dict[str, str] = {
     "ST": "Stürmer (ST)",
 }
 
+# Grobe Positionsgruppen (z. B. für die Ähnlichkeitssuche)
+POSITION_GROUPS: dict[str, str] = {
+    "GK": "GK",
+    "DF": "DEF",
+    "FB": "DEF",
+    "WB": "DEF",
+    "DM": "MID",
+    "CM": "MID",
+    "AM": "MID",
+    "WM": "ATT",
+    "FW": "ATT",
+    "ST": "ATT",
+}
+
 
 def _merge_metric_categories() -> OrderedDict[str, list[str]]:
     merged: OrderedDict[str, list[str]] = OrderedDict()
@@ -1024,14 +1091,34 @@ def metric_definition(metric: str) -> tuple[str, str | None, str]:
     return COLUMN_LABELS.get(metric, (metric, None, "float"))
 
 
+# Quoten und Durchschnitte lassen sich nicht pro 90 Minuten aufsummieren; in
+# Zeitfenster-Aggregaten werden sie nach Spielminuten gewichtet gemittelt.
+_RATE_SUFFIXES = ("_ratio", "_avg", "_per_shot", "_per_possession")
+_RATE_METRICS = frozenset({"possession", "da_aggressive_distance"})
+
+
+def is_rate_metric(metric: str) -> bool:
+    """True for match metrics that are rates/averages rather than counts."""
+
+    return (
+        metric_definition(metric)[2] == "percent"
+        or metric.endswith(_RATE_SUFFIXES)
+        or metric in _RATE_METRICS
+    )
+
+
 __all__ = [
     "CATEGORY_GROUPS",
     "CATEGORY_LABELS",
     "COLUMN_LABELS",
+    "DERIVED_METRICS",
     "MATCH_METRIC_CATEGORIES",
     "METRIC_CATEGORIES",
     "PLAYER_INFO_FIELDS",
+    "POSITION_GROUPS",
     "POSITION_LABELS",
     "SEASON_METRIC_CATEGORIES",
+    "SEASON_TOTAL_COLUMNS",
+    "is_rate_metric",
     "metric_definition",
 ]
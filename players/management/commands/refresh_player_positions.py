@@ -0,0 +1,38 @@
+"""Refresh the materialized ``player_positions`` table.
+
+Only competitions/seasons whose match count in ``player_match_data`` changed
+since the last run are recomputed; ``--all`` rebuilds everything.
+"""
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from players.data_access import (
+    ensure_position_store,
+    refresh_position_store,
+    stale_position_scopes,
+)
+
+
+class Command(BaseCommand):
+    help = "Berechnet Haupt-/Nebenpositionen je Wettbewerb/Saison/Spieler neu."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Alle Wettbewerbe neu berechnen, nicht nur solche mit neuen Spielen.",
+        )
+
+    def handle(self, *args, **options):
+        ensure_position_store()
+        scopes = stale_position_scopes(force=options["all"])
+        if not scopes:
+            self.stdout.write("Keine Wettbewerbe mit neuen Spielen.")
+            return
+        for competition_id, season_id, match_count in scopes:
+            rows = refresh_position_store(competition_id, season_id, match_count)
+            self.stdout.write(
+                f"{competition_id}:{season_id} – {rows} Spieler ({match_count} Spiele)"
+            )
+        self.stdout.write(self.style.SUCCESS(f"{len(scopes)} Wettbewerb(e) aktualisiert."))
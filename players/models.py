@@ -27,10 +27,10 @@ class Player(models.Model):
 # ``id`` columns that do not exist in the underlying SQL Server views/tables
 # and therefore triggered ``Invalid column name 'id'`` errors once queried.
 #
-# The refactored dashboard now consumes lightweight dataclass rows defined in
+# The refactored dashboard now consumes lightweight row objects defined in
 # ``players.data_access`` instead.  To keep imports from older code paths from
 # breaking (e.g. ``from players.models import PlayerMatchStat``) we re-export
-# those dataclasses here under the legacy names.  This keeps backwards
+# those row classes here under the legacy names.  This keeps backwards
 # compatibility without reintroducing the faulty ORM models.
 PlayerSeasonStat = SeasonRow
 PlayerMatchStat = MatchRow
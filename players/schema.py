@@ -0,0 +1,140 @@
+"""Process-wide registry of the table columns the players app depends on.
+
+The registry is warmed once per worker on its first request (see
+``players.apps``) and re-read after ``settings.PLAYERS_SCHEMA_TTL`` seconds
+or whenever ``schema_changed`` is sent (e.g. after
+``refresh_player_positions`` created its table).  A failed lookup keeps the
+last good snapshot and is not retried before the TTL (or, without a TTL,
+``FAILED_RETRY_SECONDS``) has passed, so an unreachable database does not
+cost one INFORMATION_SCHEMA query per column lookup.
+
+``schema_changed`` is an in-process signal: it only refreshes the process
+that sends it (usually a management command).  Running web workers notice
+a schema change once their TTL expires, so ``PLAYERS_SCHEMA_TTL`` bounds
+how long they may keep building statements for the old columns.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Iterable, Mapping
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.dispatch import Signal, receiver
+
+logger = logging.getLogger(__name__)
+
+TRACKED_TABLES: tuple[str, ...] = (
+    "player_season_data",
+    "player_match_data",
+    "player_positions",
+    "players",
+    "matches",
+    "competitions",
+)
+
+# Wartezeit nach einem fehlgeschlagenen Lookup, wenn keine TTL gesetzt ist
+FAILED_RETRY_SECONDS = 30
+
+# Sent (with any sender) when a table used by the app was created or altered.
+schema_changed = Signal()
+
+
+class SchemaRegistry:
+    """Column name → data type mapping per table, loaded in one query."""
+
+    def __init__(self, tables: Iterable[str]):
+        self._tables: set[str] = {table.lower() for table in tables}
+        self._columns: dict[str, dict[str, str]] = {}
+        self._loaded_at: float | None = None
+        self._failed_at: float | None = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """Counter bumped whenever a refresh sees different columns."""
+        if self._is_stale():
+            self.refresh()
+        return self._version
+
+    def columns(self, table_name: str) -> Mapping[str, str]:
+        """Return ``{column: data_type}`` (lower-case) for *table_name*."""
+        table = table_name.lower()
+        if table not in self._tables:
+            with self._lock:
+                self._tables.add(table)
+            self._loaded_at = None
+        if self._is_stale():
+            self.refresh()
+        return self._columns.get(table, {})
+
+    def refresh(self) -> bool:
+        """Re-read every tracked table; keep the previous state on failure."""
+        with self._lock:
+            # Another thread may have refreshed while this one waited for the lock
+            if not self._is_stale():
+                return True
+            tables = sorted(self._tables)
+            placeholders = ", ".join(["%s"] * len(tables))
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"""
+                        SELECT
+                            LOWER(TABLE_NAME),
+                            LOWER(COLUMN_NAME),
+                            LOWER(DATA_TYPE)
+                        FROM INFORMATION_SCHEMA.COLUMNS
+                        WHERE LOWER(TABLE_NAME) IN ({placeholders})
+                        """,
+                        tables,
+                    )
+                    rows = cursor.fetchall()
+            except DatabaseError as exc:
+                logger.warning("Schema lookup failed, keeping the previous columns: %s", exc)
+                self._failed_at = time.monotonic()
+                return False
+            columns: dict[str, dict[str, str]] = {table: {} for table in tables}
+            for table, column, data_type in rows:
+                columns.setdefault(table, {})[column] = data_type
+            if columns != self._columns:
+                self._version += 1
+            self._columns = columns
+            self._loaded_at = time.monotonic()
+            self._failed_at = None
+            return True
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+        self._failed_at = None
+
+    def warm(self) -> None:
+        """Fill the registry from a background thread once the app registry is ready."""
+        while not apps.ready:
+            time.sleep(0.05)
+        try:
+            self.refresh()
+        finally:
+            connection.close()
+
+    def _is_stale(self) -> bool:
+        ttl = getattr(settings, "PLAYERS_SCHEMA_TTL", None)
+        if self._failed_at is not None:
+            # Nach einem Fehler erst nach Ablauf der Wartezeit erneut fragen
+            return time.monotonic() - self._failed_at > (ttl or FAILED_RETRY_SECONDS)
+        if self._loaded_at is None:
+            return True
+        return bool(ttl) and time.monotonic() - self._loaded_at > ttl
+
+
+schema_registry = SchemaRegistry(TRACKED_TABLES)
+
+
+@receiver(schema_changed)
+def _refresh_on_schema_change(sender, **kwargs):
+    schema_registry.invalidate()
+    schema_registry.refresh()
@@ -0,0 +1,216 @@
+"""In-memory, accent-folded prefix index for player name search."""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from dataclasses import dataclass
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from .data_access import (
+    fetch_competitions,
+    fetch_player_directory,
+    in_db_pool,
+    player_directory_stamp,
+)
+
+logger = logging.getLogger(__name__)
+
+# Zeichen ohne Zerlegung in NFKD (ß, ø, ł, ...)
+_FOLD_TABLE = str.maketrans(
+    {"ß": "ss", "ø": "o", "ł": "l", "đ": "d", "æ": "ae", "œ": "oe", "ı": "i", "þ": "th"}
+)
+
+
+def fold(text: str) -> str:
+    """Lower-case *text* and strip accents (``"Ødegaard"`` -> ``"odegaard"``)."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold().translate(_FOLD_TABLE))
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _tokens(folded: str) -> list[str]:
+    return [token for token in folded.replace("-", " ").replace("'", " ").split() if token]
+
+
+@dataclass(slots=True)
+class PlayerHit:
+    player_id: int
+    player_name: str
+    competition_id: int
+    season_id: int
+    competition_label: str
+    team_name: str | None
+
+
+@dataclass(slots=True)
+class _Index:
+    keys: list[str]
+    key_players: list[int]
+    names: list[str]
+    folded_names: list[str]
+    name_tokens: list[tuple[str, ...]]
+    appearances: list[list[PlayerHit]]
+
+
+def _build_index() -> _Index:
+    labels = {
+        (record.competition_id, record.season_id): record.label
+        for record in fetch_competitions()
+    }
+    by_player: dict[int, list[PlayerHit]] = {}
+    for row in fetch_player_directory():
+        competition_id, season_id = int(row["competition_id"]), int(row["season_id"])
+        by_player.setdefault(int(row["player_id"]), []).append(
+            PlayerHit(
+                player_id=int(row["player_id"]),
+                player_name=str(row["player_name"]),
+                competition_id=competition_id,
+                season_id=season_id,
+                competition_label=labels.get(
+                    (competition_id, season_id), f"{competition_id}:{season_id}"
+                ),
+                team_name=row.get("team_name"),
+            )
+        )
+
+    names: list[str] = []
+    folded_names: list[str] = []
+    name_tokens: list[tuple[str, ...]] = []
+    appearances: list[list[PlayerHit]] = []
+    pairs: list[tuple[str, int]] = []
+    for hits in by_player.values():
+        # Neueste Saison zuerst
+        hits.sort(key=lambda hit: (hit.season_id, hit.competition_id), reverse=True)
+        folded = fold(hits[0].player_name)
+        tokens = tuple(_tokens(folded))
+        position = len(names)
+        names.append(hits[0].player_name)
+        folded_names.append(folded)
+        name_tokens.append(tokens)
+        appearances.append(hits)
+        pairs.extend((token, position) for token in dict.fromkeys(tokens))
+    pairs.sort()
+    return _Index(
+        keys=[key for key, _ in pairs],
+        key_players=[player for _, player in pairs],
+        names=names,
+        folded_names=folded_names,
+        name_tokens=name_tokens,
+        appearances=appearances,
+    )
+
+
+class PlayerSearchIndex:
+    """Prefix index over player names; rebuilt in the background on data change.
+
+    Every ``PLAYERS_DATA_VERSION_TTL`` seconds a query triggers a stamp check
+    in a background thread; queries keep using the current index meanwhile.
+    """
+
+    # Bei sehr kurzen Präfixen nicht unbegrenzt Kandidaten sammeln
+    MAX_CANDIDATES = 500
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._index: _Index | None = None
+        self._stamp: str | None = None
+        self._checked_at: float | None = None
+        self._refreshing = False
+
+    def search(self, query: str, limit: int = 20) -> list[PlayerHit]:
+        index = self._current()
+        terms = _tokens(fold(query))
+        if not terms or index is None:
+            return []
+
+        lead = max(terms, key=len)
+        start = bisect_left(index.keys, lead)
+        end = bisect_left(index.keys, lead + "￿", lo=start)
+        others = [term for term in terms if term != lead]
+        candidates: dict[int, None] = {}
+        for position in range(start, end):
+            player = index.key_players[position]
+            if player in candidates:
+                continue
+            tokens = index.name_tokens[player]
+            if all(any(token.startswith(term) for token in tokens) for term in others):
+                candidates[player] = None
+                if len(candidates) >= self.MAX_CANDIDATES:
+                    break
+
+        phrase = " ".join(terms)
+        ranked = sorted(
+            candidates,
+            key=lambda player: (
+                not index.folded_names[player].startswith(phrase),
+                -index.appearances[player][0].season_id,
+                index.folded_names[player],
+            ),
+        )
+        hits: list[PlayerHit] = []
+        for player in ranked:
+            for hit in index.appearances[player]:
+                hits.append(hit)
+                if len(hits) >= limit:
+                    return hits
+        return hits
+
+    def refresh(self, force: bool = False) -> bool:
+        """Rebuild the index if the player directory stamp changed."""
+        try:
+            stamp = player_directory_stamp()
+            if force or stamp != self._stamp or self._index is None:
+                index = _build_index()
+                with self._lock:
+                    self._index, self._stamp = index, stamp
+        except DatabaseError as exc:
+            logger.warning("Player search index refresh failed: %s", exc)
+            return False
+        finally:
+            self._checked_at = time.monotonic()
+        return True
+
+    def warm(self) -> None:
+        """Build the index from a background thread once the app registry is ready."""
+        while not apps.ready:
+            time.sleep(0.05)
+        try:
+            self.refresh()
+        finally:
+            connection.close()
+
+    def _current(self) -> _Index | None:
+        if self._index is None:
+            self.refresh()
+            return self._index
+        ttl = float(getattr(settings, "PLAYERS_DATA_VERSION_TTL", 60))
+        if self._checked_at is None or time.monotonic() - self._checked_at >= ttl:
+            with self._lock:
+                start, self._refreshing = not self._refreshing, True
+            if start:
+                threading.Thread(
+                    target=self._background_refresh, name="players-search-refresh", daemon=True
+                ).start()
+        return self._index
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        finally:
+            self._refreshing = False
+            connection.close()
+
+
+player_search_index = PlayerSearchIndex()
+
+
+def search_players(query: str, limit: int = 20) -> list[PlayerHit]:
+    return player_search_index.search(query, limit)
+
+
+asearch_players = in_db_pool(search_players)
@@ -0,0 +1,142 @@
+"""Vectorized per-player series transforms for the match charts.
+
+All functions take a flat array of values sorted by player, then by match
+date, plus ``starts``: for every element the index of the first element of
+its player.  NaN values (metric not recorded) are skipped, not treated as 0.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+
+from .data_access import MatchColumns
+
+SERIES_MODES = ("raw", "rolling", "ewma", "cumulative")
+DEFAULT_WINDOW = 5
+MAX_WINDOW = 38
+
+
+def group_starts(groups: np.ndarray) -> np.ndarray:
+    """``starts`` for a sorted array of group keys."""
+    if not len(groups):
+        return np.zeros(0, dtype=np.int64)
+    first = np.ones(len(groups), dtype=bool)
+    first[1:] = groups[1:] != groups[:-1]
+    return np.maximum.accumulate(np.where(first, np.arange(len(groups)), 0))
+
+
+def rolling_mean(values: np.ndarray, starts: np.ndarray, window: int) -> np.ndarray:
+    """Mean of the last *window* matches per player (shorter at the start)."""
+    present = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(present, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(present)))
+    position = np.arange(len(values))
+    lower = np.maximum(position + 1 - window, starts)
+    window_sum = sums[position + 1] - sums[lower]
+    window_count = counts[position + 1] - counts[lower]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(window_count > 0, window_sum / window_count, np.nan)
+
+
+def cumulative_sum(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Running total per player (season-to-date)."""
+    present = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(present, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(present)))
+    position = np.arange(len(values))
+    total = sums[position + 1] - sums[starts]
+    return np.where(counts[position + 1] - counts[starts] > 0, total, np.nan)
+
+
+def ewma(values: np.ndarray, starts: np.ndarray, span: int) -> np.ndarray:
+    """Exponentially weighted mean with ``alpha = 2 / (span + 1)`` per player.
+
+    Matches without a value still advance the decay (pandas ``ewm`` with
+    ``ignore_na=False``).
+    """
+    decay = 1.0 - 2.0 / (span + 1.0)
+    present = ~np.isnan(values)
+    numerator = np.where(present, values, 0.0)
+    denominator = present.astype(float)
+    # Rekursion s_t = x_t + decay * s_{t-1} (Zähler und Nenner), je Schritt
+    # vektorisiert über alle Spieler: Schritt k bearbeitet das k-te Spiel jedes
+    # Spielers, also O(n) statt O(n²) je Spieler
+    offsets = np.arange(len(values)) - starts
+    order = np.argsort(offsets, kind="stable")
+    steps = np.split(order, np.cumsum(np.bincount(offsets))[:-1]) if len(values) else []
+    for positions in steps[1:]:
+        numerator[positions] += decay * numerator[positions - 1]
+        denominator[positions] += decay * denominator[positions - 1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def transform(values: np.ndarray, starts: np.ndarray, mode: str, window: int) -> np.ndarray:
+    if mode == "rolling":
+        return rolling_mean(values, starts, window)
+    if mode == "ewma":
+        return ewma(values, starts, window)
+    if mode == "cumulative":
+        return cumulative_sum(values, starts)
+    return values
+
+
+@dataclass(slots=True)
+class MatchPivot:
+    """Dense (player x date) grids per metric; NaN where a player has no value.
+
+    Players are ordered by name (then first appearance), dates ascending.
+    ``smoothed`` is filled when a non-raw mode was requested.
+    """
+
+    dates: np.ndarray
+    player_ids: np.ndarray
+    player_names: list[str]
+    grids: dict[str, np.ndarray]
+    smoothed: dict[str, np.ndarray]
+
+
+def pivot_matches(
+    columns: MatchColumns,
+    metrics: Sequence[str],
+    mode: str = "raw",
+    window: int = DEFAULT_WINDOW,
+) -> MatchPivot:
+    """Pivot columnar match rows in one pass; cost is linear in the rows."""
+    valid = ~np.isnat(columns.match_date)
+    dates, date_index = np.unique(columns.match_date[valid], return_inverse=True)
+    player_ids, first_seen, player_index = np.unique(
+        columns.player_id[valid], return_index=True, return_inverse=True
+    )
+    names = columns.player_name[valid][first_seen].tolist()
+    # Ausgabereihenfolge: Name, bei Gleichstand erstes Auftreten
+    ordered = sorted(range(len(player_ids)), key=lambda idx: (names[idx], first_seen[idx]))
+    rank = np.empty(len(ordered), dtype=np.int64)
+    rank[ordered] = np.arange(len(ordered))
+    rows = rank[player_index]
+
+    order = np.lexsort((date_index, rows))
+    starts = group_starts(rows[order])
+    shape = (len(player_ids), len(dates))
+    grids: dict[str, np.ndarray] = {}
+    smoothed: dict[str, np.ndarray] = {}
+    for metric in metrics:
+        values = columns.column(metric)[valid]
+        grid = np.full(shape, np.nan)
+        grid[rows, date_index] = values
+        grids[metric] = grid
+        if mode != "raw":
+            series = np.full(shape, np.nan)
+            series[rows[order], date_index[order]] = transform(
+                values[order], starts, mode, window
+            )
+            smoothed[metric] = series
+    return MatchPivot(
+        dates=dates,
+        player_ids=player_ids[ordered],
+        player_names=[names[idx] for idx in ordered],
+        grids=grids,
+        smoothed=smoothed,
+    )
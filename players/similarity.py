@@ -0,0 +1,204 @@
+"""Nearest-neighbour search over z-scored season metric vectors."""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+
+from .data_access import data_versions, in_db_pool
+from .distributions import season_distributions
+
+DISTANCES = ("euclidean", "cosine")
+
+
+@dataclass(slots=True)
+class SimilarityBlock:
+    """Players of one competition/season/position group as a float32 matrix.
+
+    Every metric column is z-scored within the block, so vectors from
+    different leagues compare players relative to their own peers.  Missing
+    values are set to 0 (the block mean).
+    """
+
+    competition_id: int
+    season_id: int
+    group: str | None
+    metric_index: dict[str, int]
+    player_ids: np.ndarray
+    player_names: np.ndarray
+    team_names: np.ndarray
+    matrix: np.ndarray
+
+    def row_of(self, player_id: int) -> int | None:
+        rows = np.flatnonzero(self.player_ids == player_id)
+        return int(rows[0]) if len(rows) else None
+
+
+@dataclass(slots=True)
+class SimilarPlayer:
+    player_id: int
+    player_name: str
+    team_name: str | None
+    competition_id: int
+    season_id: int
+    position_group: str | None
+    distance: float
+
+
+def _zscore(values: np.ndarray) -> np.ndarray:
+    if not len(values):
+        return values.astype(np.float32)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.nanmean(values, axis=0)
+        std = np.nanstd(values, axis=0)
+        scored = (values - mean) / np.where(std > 0, std, 1.0)
+    return np.nan_to_num(scored, nan=0.0).astype(np.float32)
+
+
+class _SimilarityIndex:
+    """LRU of blocks per competition/season, rebuilt when the data stamp changes."""
+
+    def __init__(self, max_scopes: int = 32) -> None:
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[
+            tuple[int, int], tuple[str, dict[str | None, SimilarityBlock]]
+        ] = OrderedDict()
+        self._max_scopes = max_scopes
+
+    def blocks(
+        self, competition_id: int, season_id: int, stamp: str | None = None
+    ) -> dict[str | None, SimilarityBlock]:
+        key = (int(competition_id), int(season_id))
+        distributions = season_distributions(*key, stamp)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == distributions.stamp:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        groups = distributions.position_groups
+        blocks: dict[str | None, SimilarityBlock] = {}
+        for group in dict.fromkeys(groups.tolist()):
+            rows = np.flatnonzero([value == group for value in groups.tolist()])
+            blocks[group] = SimilarityBlock(
+                competition_id=key[0],
+                season_id=key[1],
+                group=group,
+                metric_index=distributions.metric_index,
+                player_ids=distributions.player_ids[rows],
+                player_names=distributions.player_names[rows],
+                team_names=distributions.team_names[rows],
+                matrix=_zscore(distributions.values[rows]),
+            )
+        with self._lock:
+            self._entries[key] = (distributions.stamp, blocks)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_scopes:
+                self._entries.popitem(last=False)
+        return blocks
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_index = _SimilarityIndex()
+
+
+def _distances(matrix: np.ndarray, query: np.ndarray, distance: str) -> np.ndarray:
+    if distance == "cosine":
+        norms = np.linalg.norm(matrix, axis=1) * float(np.linalg.norm(query))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            similarity = (matrix @ query) / norms
+        return 1.0 - np.nan_to_num(similarity, nan=0.0)
+    return np.sqrt(np.square(matrix - query).sum(axis=1))
+
+
+def similar_players(
+    competition_id: int,
+    season_id: int,
+    player_id: int,
+    metrics: Sequence[str],
+    k: int = 10,
+    distance: str = "euclidean",
+    scopes: Sequence[tuple[int, int]] | None = None,
+    same_group: bool = True,
+) -> list[SimilarPlayer]:
+    """Return the *k* players closest to *player_id* on *metrics*.
+
+    Candidates come from *scopes* (``(competition_id, season_id)`` pairs,
+    default: the player's own competition/season) and, with *same_group*,
+    only from the player's position group.  *distance* is ``"euclidean"``
+    (standardized, on z-scores) or ``"cosine"``.
+    """
+    if distance not in DISTANCES:
+        raise ValueError(f"Unknown distance: {distance}")
+    player_id = int(player_id)
+    home_key = (int(competition_id), int(season_id))
+    # Datenstand aller Scopes einmal je Anfrage (eine Abfrage für alle abgelaufenen)
+    stamps = data_versions([home_key, *(scopes or [])])
+    home = next(
+        (
+            block
+            for block in _index.blocks(*home_key, stamps[home_key][0]).values()
+            if block.row_of(player_id) is not None
+        ),
+        None,
+    )
+    if home is None:
+        return []
+    columns = [home.metric_index[metric] for metric in metrics if metric in home.metric_index]
+    if not columns:
+        return []
+    query = home.matrix[home.row_of(player_id), columns]
+
+    candidates: list[SimilarityBlock] = []
+    for scope in dict.fromkeys(scopes or [home_key]):
+        scope = (int(scope[0]), int(scope[1]))
+        blocks = _index.blocks(*scope, stamps[scope][0])
+        if same_group:
+            block = blocks.get(home.group)
+            candidates.extend([block] if block is not None else [])
+        else:
+            candidates.extend(blocks.values())
+
+    distances: list[np.ndarray] = []
+    for block in candidates:
+        block_distances = _distances(block.matrix[:, columns], query, distance)
+        if block.competition_id == home.competition_id and block.season_id == home.season_id:
+            block_distances[block.player_ids == player_id] = np.inf
+        distances.append(block_distances)
+    if not distances:
+        return []
+
+    flat = np.concatenate(distances)
+    offsets = np.cumsum([0] + [len(values) for values in distances])
+    k = min(int(k), int(np.isfinite(flat).sum()))
+    if k <= 0:
+        return []
+    nearest = np.argpartition(flat, k - 1)[:k]
+    nearest = nearest[np.argsort(flat[nearest], kind="stable")]
+
+    results: list[SimilarPlayer] = []
+    for position in nearest.tolist():
+        block_index = int(np.searchsorted(offsets, position, side="right")) - 1
+        block = candidates[block_index]
+        row = position - int(offsets[block_index])
+        results.append(
+            SimilarPlayer(
+                player_id=int(block.player_ids[row]),
+                player_name=str(block.player_names[row]),
+                team_name=block.team_names[row],
+                competition_id=block.competition_id,
+                season_id=block.season_id,
+                position_group=block.group,
+                distance=round(float(flat[position]), 4),
+            )
+        )
+    return results
+
+
+asimilar_players = in_db_pool(similar_players)
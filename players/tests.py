@@ -1,3 +1,1152 @@
-from django.test import TestCase
+import asyncio
+import sqlite3
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.db import DatabaseError, connection
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.expressions import ExpressionError, compile_derived_metrics
+from core.windows import MatchWindow
+
+from . import career, data_access, distributions, search, similarity, views
+from .data_access import (
+    _ID_TABLE_BUCKET,
+    CompetitionRecord,
+    MatchColumns,
+    _ResultSet,
+    _bind_scope,
+    _match_columns_from_result,
+    _match_rows_from_rows,
+    _player_id_filter,
+    _player_id_sql,
+    _QueryCache,
+    _season_columns_from_result,
+    _season_rows_from_rows,
+    _with_player_ids,
+    SeasonRow,
+    aiter_in_db_pool,
+    in_db_pool,
+    _player_positions_query,
+    _positions_query,
+    fetch_dashboard_bundle,
+    fetch_player_positions,
+    match_columns_from_rows,
+)
+from . import schema
+from .labels import (
+    DERIVED_METRIC_DEFINITIONS,
+    DERIVED_METRICS,
+    SEASON_COLUMN_LABELS,
+    SEASON_TOTAL_COLUMNS,
+)
+from .schema import SchemaRegistry
+from .series import cumulative_sum, ewma, group_starts, pivot_matches, rolling_mean
+
+class _User:
+    is_authenticated = True
+
+
+def _request(path, query=None, **headers):
+    request = RequestFactory().get(path, query or {}, **headers)
+    request.user = _User()
+
+    async def auser():
+        return request.user
+
+    request.auser = auser
+    return request
+
+
+SCHEMA = {
+    "player_season_data": {
+        "player_id": "int",
+        "team_id": "int",
+        "team_name": "nvarchar",
+        "primary_position": "nvarchar",
+        "secondary_position": "nvarchar",
+        "goals": "int",
+        "assists": "int",
+        "np_xg": "float",
+        "minutes": "int",
+    },
+    "player_match_data": {
+        "player_id": "int",
+        "match_id": "int",
+        "minutes": "int",
+        "goals": "int",
+        "np_xg": "float",
+        "passing_ratio": "float",
+    },
+}
+
+
+class FakeSchemaMixin:
+    """Serve table columns from ``schema`` instead of INFORMATION_SCHEMA."""
+
+    schema = SCHEMA
+
+    def setUp(self):
+        super().setUp()
+        patchers = (
+            mock.patch.object(
+                data_access, "_table_columns", lambda table: self.schema.get(table.lower(), {})
+            ),
+            mock.patch.object(SchemaRegistry, "_is_stale", return_value=False),
+        )
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        data_access._query_cache.clear()
+        self.addCleanup(data_access._query_cache.clear)
+
+
+def _bundle_results(statements, competition=(1, 2), default_ids=(5, 3)):
+    """Result sets a SQL Server batch of *statements* would return, in order."""
+    results = []
+    for sql, _params in statements:
+        if "DECLARE @competition_id" in sql:
+            results.append(_ResultSet(["competition_id", "season_id"], [competition]))
+        elif "sort_order" in sql:
+            results.append(_ResultSet(["player_id"], [(pid,) for pid in default_ids]))
+        elif "FROM STRING_SPLIT" in sql:
+            continue
+        elif "LEFT JOIN competitions" in sql:
+            results.append(
+                _ResultSet(
+                    ["competition_id", "season_id", "competition_name", "season_name"],
+                    [(*competition, "Bundesliga", "2024/2025")],
+                )
+            )
+        elif "psd.team_id IS NOT NULL" in sql:
+            results.append(_ResultSet(["team_id", "team_name"], [(7, "T"), (8, "U")]))
+        elif "AS position" in sql and "DISTINCT" in sql:
+            results.append(_ResultSet(["position"], [("ST",)]))
+        elif "FROM player_match_data" in sql:
+            results.append(
+                _ResultSet(
+                    ["match_id", "match_date", "player_id", "player_name", "goals"],
+                    [(11, None, default_ids[0], "B", 1)],
+                )
+            )
+        elif "psd.team_name" in sql and "ORDER BY player_name" in sql and "goals" in sql:
+            results.append(
+                _ResultSet(
+                    ["player_id", "player_name", "team_name", "primary_position", "goals"],
+                    [(pid, f"P{pid}", "T", "ST", pid) for pid in default_ids],
+                )
+            )
+        else:
+            results.append(
+                _ResultSet(
+                    ["player_id", "player_name", "team_id", "team_name", "primary_position"],
+                    [(pid, f"P{pid}", 7, "T", "ST") for pid in default_ids],
+                )
+            )
+    return results
+
+
+class DashboardBundleTests(FakeSchemaMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.batches = []
+
+        def fetch_result_sets(statements):
+            self.batches.append(statements)
+            return _bundle_results(statements)
+
+        patcher = mock.patch.object(data_access, "_fetch_result_sets", fetch_result_sets)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_one_batch_with_the_competition_resolved_inside(self):
+        bundle = fetch_dashboard_bundle(None, None, [5], ["goals"], ["goals"])
+        self.assertEqual(len(self.batches), 1)
+        prelude, params = self.batches[0][0]
+        self.assertIn("DECLARE @competition_id", prelude)
+        self.assertEqual(params, [None, None])
+        self.assertEqual(bundle.competition_key, "1:2")
+        self.assertEqual([c.key for c in bundle.competitions], ["1:2"])
+        self.assertEqual(bundle.positions, ["ST"])
+        self.assertEqual(bundle.player_ids, (5,))
+        self.assertEqual([row.player_id for row in bundle.season_rows], [5, 3])
+        self.assertEqual([row.match_id for row in bundle.match_rows], [11])
+
+    def test_default_players_are_selected_inside_the_batch(self):
+        bundle = fetch_dashboard_bundle(1, 2, [], ["goals"], ["goals"], default_players=2)
+        self.assertEqual(len(self.batches), 1)
+        setup = next(
+            (sql, params) for sql, params in self.batches[0] if "sort_order" in sql
+        )
+        self.assertEqual(setup[1], [2])
+        self.assertEqual(bundle.player_ids, (5, 3))
+        filtered = [sql for sql, _ in self.batches[0] if "IN (SELECT player_id FROM #player_ids)" in sql]
+        self.assertEqual(len(filtered), 2)
+
+    def test_without_players_no_rows_are_loaded(self):
+        bundle = fetch_dashboard_bundle(1, 2, [], ["goals"], ["goals"])
+        self.assertFalse(any("sort_order" in sql for sql, _ in self.batches[0]))
+        self.assertEqual(bundle.player_ids, ())
+        self.assertEqual(list(bundle.season_rows), [])
+        self.assertIsNone(bundle.match_columns)
+
+
+POSITION_STORE = {
+    "competition_id": "int",
+    "season_id": "int",
+    "player_id": "int",
+    "primary_position": "nvarchar",
+    "secondary_position": "nvarchar",
+}
+
+
+class PositionQueryTests(FakeSchemaMixin, SimpleTestCase):
+    def _schema(self, store, pmd_position):
+        schema = {table: dict(columns) for table, columns in SCHEMA.items()}
+        if store:
+            schema["player_positions"] = POSITION_STORE
+        if pmd_position:
+            schema["player_match_data"]["position"] = "nvarchar"
+        return schema
+
+    def test_parameters_match_placeholders_for_every_schema(self):
+        scope = _bind_scope(1, 2)
+        for store in (False, True):
+            for pmd_position in (False, True):
+                with self.subTest(store=store, pmd_position=pmd_position):
+                    self.schema = self._schema(store, pmd_position)
+                    data_access._query_cache.clear()
+                    queries = [
+                        _positions_query(scope),
+                        _player_positions_query(scope),
+                        _player_positions_query(scope, [4, 5, 6]),
+                    ]
+                    for query in queries:
+                        if query is None:
+                            self.assertFalse(store or pmd_position)
+                            continue
+                        sql, params = query
+                        self.assertEqual(sql.count("%s"), len(params))
+
+    def test_store_falls_back_to_match_positions_per_competition(self):
+        self.schema = self._schema(store=True, pmd_position=True)
+        sql, params = _player_positions_query(_bind_scope(1, 2), [4])
+        self.assertIn("FROM player_positions AS pp", sql)
+        self.assertIn("FROM resolved_positions", sql)
+        self.assertIn("NOT EXISTS", sql)
+        # Fallback greift nur für den angefragten Wettbewerb
+        self.assertEqual(params[-2:], [1, 2])
+
+    def test_store_only_reads_stored_rows(self):
+        self.schema = self._schema(store=True, pmd_position=False)
+        sql, params = _positions_query(_bind_scope(1, 2))
+        self.assertNotIn("resolved_positions", sql)
+        self.assertEqual(params, [1, 2])
+
+    def test_fetch_player_positions_maps_rows_by_player(self):
+        self.schema = self._schema(store=True, pmd_position=True)
+        rows = [
+            {"player_id": 4, "primary_position": "ST", "secondary_position": None},
+            {"player_id": 5, "primary_position": "CB", "secondary_position": "DM"},
+        ]
+        with mock.patch.object(data_access, "_fetch_dicts", return_value=rows) as fetch:
+            lookup = fetch_player_positions(1, 2, [4, 5])
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(lookup[5], {"primary_position": "CB", "secondary_position": "DM"})
+        self.assertEqual(fetch_player_positions(1, 2, []), {})
+
+
+class _Cursor:
+    def __init__(self, rows=None, error=None):
+        self.rows, self.error, self.executed = rows or [], error, 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.executed += 1
+        if self.error is not None:
+            raise self.error
+
+    def fetchall(self):
+        return self.rows
+
+
+@override_settings(PLAYERS_SCHEMA_TTL=300)
+class SchemaRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        clock = SimpleNamespace(monotonic=lambda: self.now)
+        patcher = mock.patch.object(schema, "time", clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.registry = SchemaRegistry(["player_season_data"])
+
+    def _cursor(self, cursor):
+        return mock.patch.object(schema, "connection", SimpleNamespace(cursor=lambda: cursor))
+
+    def test_failed_refresh_keeps_columns_until_the_ttl_expires(self):
+        with self._cursor(_Cursor(rows=[("player_season_data", "goals", "int")])):
+            self.assertEqual(self.registry.columns("player_season_data"), {"goals": "int"})
+        version = self.registry.version
+
+        self.now += 301
+        failing = _Cursor(error=DatabaseError("down"))
+        with self._cursor(failing), self.assertLogs(schema.logger, "WARNING"):
+            for _ in range(3):
+                self.assertEqual(self.registry.columns("player_season_data"), {"goals": "int"})
+        self.assertEqual(failing.executed, 1)
+        self.assertEqual(self.registry.version, version)
+
+        self.now += 301
+        with self._cursor(_Cursor(rows=[("player_season_data", "assists", "int")])):
+            self.assertEqual(self.registry.columns("player_season_data"), {"assists": "int"})
+        self.assertEqual(self.registry.version, version + 1)
+
+    @override_settings(PLAYERS_SCHEMA_TTL=None)
+    def test_failed_first_load_retries_without_a_ttl(self):
+        failing = _Cursor(error=DatabaseError("down"))
+        with self._cursor(failing), self.assertLogs(schema.logger, "WARNING"):
+            self.assertEqual(self.registry.columns("player_season_data"), {})
+            self.assertEqual(self.registry.columns("player_season_data"), {})
+        self.assertEqual(failing.executed, 1)
+
+        self.now += schema.FAILED_RETRY_SECONDS + 1
+        with self._cursor(_Cursor(rows=[("player_season_data", "goals", "int")])):
+            self.assertEqual(self.registry.columns("player_season_data"), {"goals": "int"})
+
+    def test_schema_change_invalidates_immediately(self):
+        cursor = _Cursor(rows=[])
+        with self._cursor(cursor):
+            self.registry.columns("player_season_data")
+            self.registry.invalidate()
+            self.registry.columns("player_season_data")
+        self.assertEqual(cursor.executed, 2)
+
+
+MATCH_RESULT = _ResultSet(
+    ["match_id", "match_date", "player_id", "player_name", "goals"],
+    [
+        (11, date(2024, 8, 24), 5, "Anna", 1),
+        (12, None, 5, "Anna", None),
+        (11, date(2024, 8, 24), 3, None, Decimal("2")),
+    ],
+)
+
+
+class ColumnarResultTests(SimpleTestCase):
+    def test_season_columns_use_nan_for_null(self):
+        result = _ResultSet(
+            ["player_id", "player_name", "team_name", "primary_position", "secondary_position", "goals"],
+            [(5, "Anna", "T", "ST", None, 3), (3, None, "T", "CB", "DM", None)],
+        )
+        columns = _season_columns_from_result(result, ["goals"])
+        self.assertEqual(len(columns), 2)
+        self.assertEqual(columns.player_id.dtype, np.int64)
+        np.testing.assert_array_equal(columns.column("goals"), [3.0, np.nan])
+        self.assertEqual(list(columns.player_name), ["Anna", "Player 3"])
+        self.assertEqual(list(columns.secondary_position), [None, "DM"])
+
+    def test_match_columns_from_result_and_rows_agree(self):
+        from_result = _match_columns_from_result(MATCH_RESULT, ["goals"])
+        rows = _match_rows_from_rows(MATCH_RESULT.dicts(), ["goals"])
+        from_rows = match_columns_from_rows(list(rows), ["goals"])
+        for columns in (from_result, from_rows):
+            np.testing.assert_array_equal(columns.column("goals"), [1.0, np.nan, 2.0])
+            np.testing.assert_array_equal(columns.match_id, [11, 12, 11])
+            self.assertTrue(np.isnat(columns.match_date[1]))
+            self.assertEqual(list(columns.player_name), ["Anna", "Anna", "Player 3"])
+
+    def test_select_players_filters_every_column(self):
+        columns = _match_columns_from_result(MATCH_RESULT, ["goals"]).select_players([3])
+        self.assertEqual(len(columns), 1)
+        np.testing.assert_array_equal(columns.match_id, [11])
+        np.testing.assert_array_equal(columns.column("goals"), [2.0])
+
+
+class PlayerIdTableTests(SimpleTestCase):
+    def test_no_ids_means_no_filter(self):
+        self.assertEqual(_player_id_filter(None), (None, []))
+        self.assertEqual(_player_id_filter([]), (None, []))
+
+    @override_settings(PLAYERS_ID_TABLE_THRESHOLD=3)
+    def test_temp_table_above_the_threshold(self):
+        self.assertEqual(_player_id_filter([1, 2, 3])[0], 4)
+        self.assertEqual(_player_id_filter([1, 2, 3, 4]), (_ID_TABLE_BUCKET, []))
+        self.assertIn(
+            "SELECT player_id FROM #player_ids",
+            _player_id_sql("psd.player_id", _ID_TABLE_BUCKET),
+        )
+
+    @override_settings(PLAYERS_ID_TABLE_THRESHOLD=3)
+    def test_with_player_ids_prefixes_the_setup_only_for_the_table(self):
+        query = ("SELECT 1 WHERE x = %s", [9])
+        self.assertEqual(_with_player_ids(query, [1, 2]), query)
+        sql, params = _with_player_ids(query, [4, 5, 6, 7])
+        self.assertIn("#player_ids", sql)
+        self.assertTrue(sql.endswith(query[0]))
+        self.assertEqual(params, ["4,5,6,7", 9])
+
+    def test_id_table_flag_forces_the_table(self):
+        self.assertEqual(_player_id_filter(None, id_table=True), (_ID_TABLE_BUCKET, []))
+        self.assertEqual(_player_id_filter([1], id_table=True), (_ID_TABLE_BUCKET, []))
+
+
+@override_settings(PLAYERS_ID_TABLE_THRESHOLD=200)
+class PaddedIdBucketTests(FakeSchemaMixin, SimpleTestCase):
+    def test_in_lists_are_padded_to_the_next_power_of_two(self):
+        cases = {
+            (7,): (1, [7]),
+            (1, 2): (2, [1, 2]),
+            (1, 2, 3): (4, [1, 2, 3, 3]),
+            (5, 5, 6): (2, [5, 6]),
+            (1, 2, 3, 4, 5): (8, [1, 2, 3, 4, 5, 5, 5, 5]),
+        }
+        for ids, expected in cases.items():
+            with self.subTest(ids=ids):
+                self.assertEqual(_player_id_filter(list(ids)), expected)
+
+    def test_bucket_placeholders_match_the_padded_ids(self):
+        bucket, params = _player_id_filter(list(range(1, 12)))
+        self.assertEqual(bucket, 16)
+        self.assertEqual(_player_id_sql("psd.player_id", bucket).count("%s"), len(params))
+
+    def test_same_shape_reuses_one_statement_text(self):
+        scope = _bind_scope(1, 2)
+        first, _ = data_access._season_rows_query(scope, [1, 2, 3], ["goals"])
+        second, params = data_access._season_rows_query(scope, [7, 8, 9, 10], ["goals"])
+        self.assertIs(first, second)
+        self.assertEqual(params, [1, 2, 7, 8, 9, 10])
+        stats = data_access._query_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["distinct_plans"]), (1, 1, 1))
+
+    def test_query_cache_evicts_the_oldest_text(self):
+        cache = _QueryCache(max_size=2)
+        for name in ("a", "b", "c"):
+            cache.sql((name,), lambda name=name: name)
+        self.assertEqual(cache.stats()["templates"], 2)
+        cache.sql(("a",), lambda: "rebuilt")
+        self.assertEqual(cache.misses, 4)
+
+
+class CsvExportTests(SimpleTestCase):
+    def setUp(self):
+        self.closed = []
+
+        def season_export(competition_id, season_id, metrics):
+            try:
+                self.calls = (competition_id, season_id, list(metrics))
+                yield ["player_id", "goals"], [(5, 3), (3, None)]
+                yield ["player_id", "goals"], [(7, 1)]
+            finally:
+                self.closed.append(True)
+
+        patcher = mock.patch.object(views, "iter_season_export", season_export)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def _body(self, response):
+        return b"".join([line async for line in response.streaming_content]).decode()
+
+    async def test_streams_every_page_asynchronously(self):
+        response = await views.export_csv(
+            _request("/players/export/", {"competition": "1:2", "metrics": ["npg_90", "bogus"]})
+        )
+        self.assertTrue(response.is_async)
+        body = await self._body(response)
+        self.assertEqual(body.splitlines(), ["player_id,goals", "5,3", "3,", "7,1"])
+        self.assertEqual(self.calls, (1, 2, ["npg_90"]))
+        self.assertEqual(self.closed, [True])
+
+    async def test_requires_a_competition(self):
+        response = await views.export_csv(_request("/players/export/", {"kind": "season"}))
+        self.assertEqual(response.status_code, 400)
+
+
+class AsyncPoolIteratorTests(SimpleTestCase):
+    async def test_early_close_stops_the_generator(self):
+        produced, closed = [], []
+
+        def pages():
+            try:
+                for page in range(100):
+                    produced.append(page)
+                    yield page
+            finally:
+                closed.append(True)
+
+        iterator = aiter_in_db_pool(pages, max_pending=1)
+        self.assertEqual(await anext(iterator), 0)
+        await iterator.aclose()
+        for _ in range(100):
+            if closed:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(closed, [True])
+        self.assertLess(len(produced), 10)
+
+    async def test_errors_reach_the_consumer(self):
+        def pages():
+            yield 1
+            raise DatabaseError("gone")
+
+        received = []
+        with self.assertRaises(DatabaseError):
+            async for page in aiter_in_db_pool(pages):
+                received.append(page)
+        self.assertEqual(received, [1])
+
+
+class DbPoolTests(SimpleTestCase):
+    @override_settings(PLAYERS_DB_POOL_CONN_MAX_AGE=120)
+    async def test_only_pool_connections_are_kept_open(self):
+        def connection_settings():
+            data_access._init_pool_connection()
+            return connection.settings_dict
+
+        pooled = await in_db_pool(connection_settings)()
+        self.assertEqual(pooled["CONN_MAX_AGE"], 120)
+        self.assertTrue(pooled["CONN_HEALTH_CHECKS"])
+        self.assertEqual(connection.settings_dict["CONN_MAX_AGE"], 0)
+        self.assertIs(data_access._get_db_pool()._initializer, data_access._init_pool_connection)
+
+    async def test_pool_wrapper_returns_and_raises(self):
+        self.assertEqual(await in_db_pool(divmod)(7, 2), (3, 1))
+        with self.assertRaises(ZeroDivisionError):
+            await in_db_pool(divmod)(1, 0)
+
+
+SEASON_DICTS = [
+    {"player_id": 5, "player_name": "Anna", "team_name": "T", "primary_position": "ST",
+     "secondary_position": None, "goals": 3, "assists": None},
+    {"player_id": 3, "player_name": None, "team_name": "U", "primary_position": None,
+     "secondary_position": None, "goals": Decimal("1.5"), "assists": 2},
+]
+
+
+class RowSetTests(SimpleTestCase):
+    def test_rows_share_one_schema_and_value_block(self):
+        rows = _season_rows_from_rows(SEASON_DICTS, ["goals", "assists", "player_id"])
+        self.assertEqual(rows.schema.names, ("goals", "assists"))
+        self.assertEqual(rows.values.shape, (2, 2))
+        self.assertIs(rows[0]._schema, rows[1]._schema)
+        np.testing.assert_array_equal(rows.column("goals"), [3.0, 1.5])
+        # Zeilen sind Views auf den Block
+        rows.values[0, 0] = 4
+        self.assertEqual(rows[0].metrics["goals"], 4.0)
+
+    def test_row_access_matches_the_dict_api(self):
+        rows = _season_rows_from_rows(SEASON_DICTS, ["goals", "assists"])
+        self.assertEqual(dict(rows[0].metrics), {"goals": 3.0, "assists": None})
+        self.assertEqual(rows[1].player_name, "Player 3")
+        self.assertEqual(rows[1].assists, 2.0)
+        self.assertIn("goals", rows[0].metrics)
+        with self.assertRaises(AttributeError):
+            rows[0].shots
+
+    def test_built_rows_equal_bound_rows(self):
+        rows = _season_rows_from_rows(SEASON_DICTS[:1], ["goals", "assists"])
+        built = SeasonRow(5, "Anna", "T", "ST", None, {"goals": 3, "assists": None})
+        self.assertEqual(rows[0], built)
+        built.metrics = {"goals": 2}
+        self.assertNotEqual(rows[0], built)
+
+
+@mock.patch.object(views, "_selected_player_meta", lambda *args: [])
+@mock.patch.object(
+    views, "_chart_payloads", lambda *args: {"season_chart": None, "match_chart": None}
+)
+class DashboardDataETagTests(SimpleTestCase):
+    last_modified = datetime(2024, 8, 1, 12, tzinfo=timezone.utc)
+
+    def setUp(self):
+        self.stamp = "s1"
+        self.load = mock.AsyncMock(
+            return_value={
+                "bundle": mock.Mock(competition_key="1:2"),
+                "selected_position": None,
+                "selected_player_ids": ["4"],
+                "players": [],
+                "season_stats": [],
+                "match_stats": [],
+                "percentiles": {},
+                "normalized": {},
+            }
+        )
+        patcher = mock.patch.multiple(
+            views, _load_dashboard=self.load, adata_version=self._data_version
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def _data_version(self, competition_id, season_id):
+        return self.stamp, self.last_modified
+
+    def _request(self, query, **headers):
+        return _request("/players/data/", query, **headers)
+
+    async def test_etag_and_not_modified(self):
+        query = {"competition": "1:2", "players": ["4"]}
+        response = await views.dashboard_data(self._request(query))
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers["ETag"]
+        self.assertTrue(response.headers["Last-Modified"])
+        self.assertIn("no-cache", response.headers["Cache-Control"])
+        self.assertEqual(self.load.await_count, 1)
+
+        response = await views.dashboard_data(self._request(query, HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(self.load.await_count, 1)
+
+    async def test_etag_changes_with_data_and_parameters(self):
+        query = {"competition": "1:2", "players": ["4"]}
+        first = (await views.dashboard_data(self._request(query))).headers["ETag"]
+        other = (
+            await views.dashboard_data(self._request({**query, "players": ["5"]}))
+        ).headers["ETag"]
+        self.stamp = "s2"
+        response = await views.dashboard_data(self._request(query, HTTP_IF_NONE_MATCH=first))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(first, other)
+        self.assertNotEqual(response.headers["ETag"], first)
+
+    async def test_competition_is_required(self):
+        response = await views.dashboard_data(self._request({}))
+        self.assertEqual(response.status_code, 400)
+        self.load.assert_not_awaited()
+
+
+def _distributions(values, positions, groups, player_ids=None, metrics=("goals",), stamp="s"):
+    values = np.asarray(values, dtype=float)
+    player_ids = np.asarray(player_ids or range(1, len(values) + 1), dtype=np.int64)
+    summaries = {None: distributions.SortedDistribution.build(values)}
+    for group in set(groups) - {None}:
+        summaries[group] = distributions.SortedDistribution.build(
+            values[np.asarray(groups, dtype=object) == group]
+        )
+    return distributions.SeasonDistributions(
+        stamp=stamp,
+        metric_index={metric: index for index, metric in enumerate(metrics)},
+        player_index={pid: row for row, pid in enumerate(player_ids.tolist())},
+        player_ids=player_ids,
+        player_names=np.array([f"P{pid}" for pid in player_ids], dtype=object),
+        team_names=np.array(["T"] * len(values), dtype=object),
+        positions=np.array(positions, dtype=object),
+        position_groups=np.array(groups, dtype=object),
+        values=values,
+        group_summaries=summaries,
+    )
+
+
+class DistributionTests(SimpleTestCase):
+    def test_mid_rank_percentiles_ignore_missing_values(self):
+        distribution = distributions.SortedDistribution.build(
+            np.array([[1.0], [2.0], [2.0], [4.0], [np.nan]])
+        )
+        self.assertEqual(int(distribution.counts[0]), 4)
+        np.testing.assert_allclose(
+            distribution.ranks(0, np.array([1.0, 2.0, 4.0, np.nan])), [12.5, 50.0, 87.5, np.nan]
+        )
+        self.assertEqual((distribution.minimum[0], distribution.maximum[0]), (1.0, 4.0))
+
+    def test_scales(self):
+        distribution = distributions.SortedDistribution.build(np.array([[0.0], [5.0], [10.0]]))
+        np.testing.assert_allclose(distribution.scale(0, np.array([5.0]), "minmax"), [50.0])
+        np.testing.assert_allclose(
+            distribution.scale(0, np.array([10.0]), "zscore"), [5.0 / np.sqrt(50.0 / 3.0)]
+        )
+        flat = distributions.SortedDistribution.build(np.array([[3.0], [3.0]]))
+        self.assertTrue(np.isnan(flat.scale(0, np.array([3.0]), "zscore"))[0])
+
+    def test_percentiles_by_position(self):
+        season = _distributions(
+            [[1.0], [2.0], [3.0], [4.0]], ["ST", "ST", "CB", "CB"], ["FW", "FW", "DF", "DF"]
+        )
+        league = season.percentiles([2, 3, 99], ["goals", "bogus"])
+        self.assertEqual(league, {2: {"goals": 37.5}, 3: {"goals": 62.5}})
+        by_position = season.percentiles([2, 3], ["goals"], by_position=True)
+        self.assertEqual(by_position, {2: {"goals": 75.0}, 3: {"goals": 25.0}})
+        normalized = season.normalized([4], ["goals"], "minmax")
+        self.assertEqual(normalized, {4: {"goals": 100.0}})
+
+    def test_cache_keeps_the_most_recent_scopes(self):
+        built = []
+
+        def build(competition_id, season_id, stamp):
+            built.append((competition_id, season_id, stamp))
+            return mock.Mock(stamp=stamp)
+
+        cache = distributions._DistributionCache(max_scopes=2)
+        with mock.patch.object(distributions, "_build", build):
+            cache.get(1, 1, "a")
+            cache.get(1, 2, "a")
+            cache.get(1, 1, "a")
+            cache.get(1, 3, "a")
+            cache.get(1, 1, "a")
+            cache.get(1, 2, "a")
+            cache.get(1, 1, "b")
+        self.assertEqual(
+            built, [(1, 1, "a"), (1, 2, "a"), (1, 3, "a"), (1, 2, "a"), (1, 1, "b")]
+        )
+        self.assertEqual(len(cache._entries), 2)
+
+
+class SimilarPlayersTests(SimpleTestCase):
+    def setUp(self):
+        self.seasons = {
+            (1, 1): _distributions(
+                [[1.0, 1.0], [1.1, 0.9], [3.0, 3.0], [0.0, 5.0]],
+                ["ST", "ST", "ST", "CB"],
+                ["FW", "FW", "FW", "DF"],
+                metrics=("goals", "assists"),
+            ),
+            (2, 1): _distributions(
+                [[1.0, 1.0], [9.0, 9.0]],
+                ["ST", "ST"],
+                ["FW", "FW"],
+                player_ids=[10, 11],
+                metrics=("goals", "assists"),
+            ),
+        }
+        self.stamp_reads = []
+
+        def data_versions(keys):
+            self.stamp_reads.append(list(keys))
+            return {key: ("s", None) for key in keys}
+
+        patchers = (
+            mock.patch.object(
+                similarity, "season_distributions", lambda c, s, stamp=None: self.seasons[(c, s)]
+            ),
+            mock.patch.object(similarity, "data_versions", data_versions),
+            mock.patch.object(similarity, "_index", similarity._SimilarityIndex(max_scopes=1)),
+        )
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_nearest_players_of_the_same_group(self):
+        results = similarity.similar_players(1, 1, 1, ["goals", "assists"], k=5)
+        self.assertEqual([player.player_id for player in results], [2, 3])
+        self.assertEqual({player.position_group for player in results}, {"FW"})
+        self.assertLess(results[0].distance, results[1].distance)
+        self.assertEqual(similarity.similar_players(1, 1, 99, ["goals"]), [])
+
+    def test_scopes_share_one_stamp_read(self):
+        results = similarity.similar_players(
+            1, 1, 1, ["goals", "assists"], k=2, scopes=[(1, 1), (2, 1)], same_group=False
+        )
+        self.assertEqual(self.stamp_reads, [[(1, 1), (1, 1), (2, 1)]])
+        self.assertEqual(len(results), 2)
+        self.assertNotIn(1, [player.player_id for player in results])
+
+    def test_index_is_bounded(self):
+        similarity.similar_players(1, 1, 1, ["goals"], scopes=[(1, 1), (2, 1)])
+        self.assertEqual(list(similarity._index._entries), [(2, 1)])
+
+    def test_unknown_distance(self):
+        with self.assertRaises(ValueError):
+            similarity.similar_players(1, 1, 1, ["goals"], distance="manhattan")
+
+
+DIRECTORY = [
+    {"player_id": 1, "player_name": "Martin Ødegaard", "competition_id": 1, "season_id": 2,
+     "team_name": "Arsenal"},
+    {"player_id": 1, "player_name": "Martin Ødegaard", "competition_id": 3, "season_id": 1,
+     "team_name": "Real Sociedad"},
+    {"player_id": 2, "player_name": "Martin Terrier", "competition_id": 1, "season_id": 1,
+     "team_name": "Rennes"},
+    {"player_id": 3, "player_name": "Kévin Großkreutz", "competition_id": 1, "season_id": 1,
+     "team_name": None},
+]
+
+
+class PlayerSearchTests(SimpleTestCase):
+    def setUp(self):
+        self.stamp = "1"
+        self.builds = 0
+
+        def directory():
+            self.builds += 1
+            return DIRECTORY
+
+        patcher = mock.patch.multiple(
+            search,
+            fetch_competitions=lambda: [CompetitionRecord("1:2", "Premier League 24/25", 1, 2)],
+            fetch_player_directory=directory,
+            player_directory_stamp=lambda: self.stamp,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.index = search.PlayerSearchIndex()
+
+    def test_fold(self):
+        self.assertEqual(search.fold("Ødegaard"), "odegaard")
+        self.assertEqual(search.fold("Großkreutz"), "grosskreutz")
+
+    def test_accent_folded_prefixes(self):
+        self.assertEqual([hit.player_id for hit in self.index.search("odeg")], [1, 1])
+        self.assertEqual([hit.player_id for hit in self.index.search("KEVIN gross")], [3])
+        self.assertEqual(self.index.search("   "), [])
+
+    def test_every_appearance_newest_season_first(self):
+        hits = self.index.search("ødegaard")
+        self.assertEqual([(hit.competition_id, hit.season_id) for hit in hits], [(1, 2), (3, 1)])
+        self.assertEqual(hits[0].competition_label, "Premier League 24/25")
+        self.assertEqual(hits[1].competition_label, "3:1")
+
+    def test_phrase_matches_rank_first_and_limit_applies(self):
+        hits = self.index.search("martin", limit=2)
+        self.assertEqual([hit.player_id for hit in hits], [1, 1])
+        hits = self.index.search("terrier martin")
+        self.assertEqual([hit.player_id for hit in hits], [2])
+
+    def test_rebuilds_only_when_the_stamp_changes(self):
+        self.index.refresh()
+        self.index.refresh()
+        self.assertEqual(self.builds, 1)
+        self.stamp = "2"
+        self.index.refresh()
+        self.assertEqual(self.builds, 2)
+
+
+def _ewma_reference(values, span):
+    """pandas ``ewm(span, adjust=True, ignore_na=False).mean()`` for one player."""
+    decay = 1.0 - 2.0 / (span + 1.0)
+    result = []
+    for position in range(len(values)):
+        weights = decay ** np.arange(position, -1, -1, dtype=float)
+        present = ~np.isnan(values[: position + 1])
+        total = weights[present].sum()
+        result.append(
+            (weights[present] * values[: position + 1][present]).sum() / total if total else np.nan
+        )
+    return np.array(result)
+
+
+class SeriesTests(SimpleTestCase):
+    def test_group_starts(self):
+        np.testing.assert_array_equal(
+            group_starts(np.array([3, 3, 5, 5, 5, 8])), [0, 0, 2, 2, 2, 5]
+        )
+        self.assertEqual(len(group_starts(np.array([]))), 0)
+
+    def test_rolling_mean_skips_missing_values_per_player(self):
+        values = np.array([1.0, np.nan, 3.0, 5.0, 10.0, 20.0])
+        starts = group_starts(np.array([1, 1, 1, 1, 2, 2]))
+        np.testing.assert_allclose(
+            rolling_mean(values, starts, 2), [1.0, 1.0, 3.0, 4.0, 10.0, 15.0]
+        )
+
+    def test_cumulative_sum(self):
+        values = np.array([np.nan, 2.0, 3.0, 4.0])
+        starts = group_starts(np.array([1, 1, 2, 2]))
+        np.testing.assert_allclose(cumulative_sum(values, starts), [np.nan, 2.0, 3.0, 7.0])
+
+    def test_ewma_matches_the_weighted_definition(self):
+        rng = np.random.default_rng(7)
+        groups = np.sort(rng.integers(0, 6, 80))
+        values = rng.normal(size=len(groups))
+        values[rng.random(len(groups)) < 0.25] = np.nan
+        values[0] = np.nan
+        starts = group_starts(groups)
+        expected = np.concatenate(
+            [_ewma_reference(values[groups == group], 5) for group in np.unique(groups)]
+        )
+        np.testing.assert_allclose(ewma(values, starts, 5), expected)
+
+    def test_ewma_of_empty_input(self):
+        self.assertEqual(len(ewma(np.array([]), np.zeros(0, dtype=np.int64), 5)), 0)
+
+
+def _match_columns(rows, metric="goals"):
+    player_name = np.empty(len(rows), dtype=object)
+    player_name[:] = [row[2] for row in rows]
+    return MatchColumns(
+        metrics=(metric,),
+        match_id=np.arange(1, len(rows) + 1),
+        match_date=np.array([row[0] for row in rows], dtype="datetime64[D]"),
+        player_id=np.array([row[1] for row in rows], dtype=np.int64),
+        player_name=player_name,
+        values={metric: np.array([row[3] for row in rows], dtype=float)},
+    )
+
+
+class PivotMatchesTests(SimpleTestCase):
+    def setUp(self):
+        self.columns = _match_columns(
+            [
+                ("2024-08-10", 9, "Zach", 1.0),
+                ("2024-08-03", 4, "Anna", 2.0),
+                ("2024-08-10", 4, "Anna", np.nan),
+                ("2024-08-17", 4, "Anna", 6.0),
+                ("2024-08-17", 9, "Zach", 3.0),
+                (None, 9, "Zach", 100.0),
+            ]
+        )
+
+    def test_grid_by_player_name_and_date(self):
+        pivot = pivot_matches(self.columns, ["goals"])
+        self.assertEqual(pivot.player_names, ["Anna", "Zach"])
+        np.testing.assert_array_equal(pivot.player_ids, [4, 9])
+        np.testing.assert_array_equal(
+            pivot.dates, np.array(["2024-08-03", "2024-08-10", "2024-08-17"], dtype="datetime64[D]")
+        )
+        np.testing.assert_allclose(
+            pivot.grids["goals"], [[2.0, np.nan, 6.0], [np.nan, 1.0, 3.0]]
+        )
+        self.assertEqual(pivot.smoothed, {})
+
+    def test_smoothing_follows_each_players_dates(self):
+        pivot = pivot_matches(self.columns, ["goals"], mode="rolling", window=2)
+        np.testing.assert_allclose(
+            pivot.smoothed["goals"], [[2.0, 2.0, 6.0], [np.nan, 1.0, 2.0]]
+        )
+        cumulative = pivot_matches(self.columns, ["goals"], mode="cumulative")
+        np.testing.assert_allclose(
+            cumulative.smoothed["goals"], [[2.0, 2.0, 8.0], [np.nan, 1.0, 4.0]]
+        )
+
+
+class CareerTests(FakeSchemaMixin, SimpleTestCase):
+    def test_transfer_seasons_are_merged_per_competition(self):
+        db = sqlite3.connect(":memory:")
+        db.execute("CREATE TABLE psd (season_id int, goals int, npg_90 real, [90s_played] real)")
+        db.executemany(
+            "INSERT INTO psd VALUES (?, ?, ?, ?)",
+            [(1, 2, 0.5, 10.0), (1, 4, 0.2, 30.0), (1, 1, None, 5.0), (2, 3, 0.4, None)],
+        )
+
+        def merged(metric, summed, weighted):
+            sql = data_access._career_metric_sql(metric, summed, weighted)
+            return [
+                row[0]
+                for row in db.execute(f"SELECT {sql} FROM psd GROUP BY season_id ORDER BY season_id")
+            ]
+
+        goals = merged("goals", summed=True, weighted=True)
+        rate = merged("npg_90", summed=False, weighted=True)
+        plain = merged("npg_90", summed=False, weighted=False)
+        # Saison 1: Tore addiert, Rate nach 90s gewichtet (Zeile ohne Wert zählt nicht)
+        self.assertEqual(goals, [7.0, 3.0])
+        self.assertAlmostEqual(rate[0], (0.5 * 10 + 0.2 * 30) / 40)
+        self.assertAlmostEqual(plain[0], 0.35)
+        # Ohne Spielzeit fällt die Rate auf den einfachen Mittelwert zurück
+        self.assertAlmostEqual(rate[1], 0.4)
+
+    def test_fetch_player_career_maps_the_grouped_rows(self):
+        result = _ResultSet(
+            ["competition_id", "season_id", "competition_name", "season_name", "player_name",
+             "team_names", "goals"],
+            [(1, 1, "Serie A", "2023/2024", None, "Fiorentina", 3.0),
+             (1, 2, "Serie A", "2024/2025", "Kean", "Fiorentina / Roma", None)],
+        )
+        with mock.patch.object(data_access, "_fetch_result", return_value=result) as fetch:
+            columns = data_access.fetch_player_career(9, ["goals"], ["goals"])
+        sql, params = fetch.call_args.args
+        self.assertEqual(params, [9])
+        self.assertIn("SUM(CAST(psd.[goals] AS float)) AS [goals]", sql)
+        self.assertEqual(columns.player_name, "Kean")
+        self.assertEqual([season.key for season in columns.seasons], ["1:1", "1:2"])
+        self.assertEqual(columns.team_names[1], "Fiorentina / Roma")
+        np.testing.assert_array_equal(columns.column("goals"), [3.0, np.nan])
+
+    @override_settings(PLAYERS_CAREER_CACHE_TTL=900)
+    def test_cache_is_per_player_and_bounded(self):
+        cache = career._CareerCache(max_players=1)
+        with mock.patch.object(
+            career, "fetch_player_career", side_effect=lambda pid, *args: pid
+        ) as fetch:
+            self.assertEqual(cache.get(1), 1)
+            self.assertEqual(cache.get(1), 1)
+            cache.get(2)
+            cache.get(1)
+        self.assertEqual([call.args[0] for call in fetch.call_args_list], [1, 2, 1])
+
+    def test_sparkline_splits_at_missing_seasons(self):
+        points = career.sparkline_points(np.array([0.0, 1.0, np.nan, 0.5]), width=30, height=10)
+        self.assertEqual(points, ["0.0,8.0 10.0,2.0", "30.0,5.0"])
+        self.assertEqual(career.sparkline_points(np.array([np.nan])), [])
+
+
+class OneRowPerPlayerTests(SimpleTestCase):
+    def test_keeps_the_row_with_most_minutes(self):
+        player_ids = np.array([7, 4, 7, 9, 4], dtype=np.int64)
+        minutes = np.array([300.0, np.nan, 900.0, 10.0, 50.0])
+        np.testing.assert_array_equal(
+            distributions._one_row_per_player(player_ids, minutes), [2, 3, 4]
+        )
+        np.testing.assert_array_equal(distributions._one_row_per_player(player_ids, None), [0, 1, 3])
+
+    def test_transferred_player_is_ranked_on_the_main_club_row(self):
+        columns = data_access.SeasonColumns(
+            metrics=("goals", "minutes"),
+            player_id=np.array([1, 2, 2, 3], dtype=np.int64),
+            player_name=np.array(["A", "B", "B", "C"], dtype=object),
+            team_name=np.array(["T", "T", "U", "U"], dtype=object),
+            primary_position=np.array(["ST"] * 4, dtype=object),
+            secondary_position=np.array([None] * 4, dtype=object),
+            values={
+                "goals": np.array([1.0, 0.0, 5.0, 3.0]),
+                "minutes": np.array([900.0, 100.0, 800.0, 900.0]),
+            },
+        )
+        with mock.patch.multiple(
+            distributions,
+            numeric_season_metrics=lambda metrics: ["goals", "minutes"],
+            fetch_season_columns=lambda *args: columns,
+            fetch_player_positions=lambda *args: {},
+        ):
+            season = distributions._build(1, 2, "s")
+        self.assertEqual(len(season.player_ids), 3)
+        self.assertEqual(season.team_names[season.player_index[2]], "U")
+        self.assertEqual(season.percentiles([2], ["goals"]), {2: {"goals": 83.3}})
+
+
+class DashboardTeamsTests(FakeSchemaMixin, SimpleTestCase):
+    def test_teams_of_the_resolved_competition_come_with_the_bundle(self):
+        batches = []
+
+        def fetch_result_sets(statements):
+            batches.append(statements)
+            return _bundle_results(statements, competition=(3, 4))
+
+        with mock.patch.object(data_access, "_fetch_result_sets", fetch_result_sets):
+            bundle = fetch_dashboard_bundle(99, 99, [], [], [])
+        self.assertEqual(len(batches), 1)
+        teams_sql = next(sql for sql, _ in batches[0] if "psd.team_id IS NOT NULL" in sql)
+        self.assertIn("psd.competition_id = @competition_id", teams_sql)
+        self.assertEqual(bundle.competition_key, "3:4")
+        self.assertEqual(bundle.teams, [{"team_id": 7, "team_name": "T"}, {"team_id": 8, "team_name": "U"}])
+
+    def test_fetch_teams_binds_the_scope(self):
+        with mock.patch.object(data_access, "_fetch_dicts", return_value=[]) as fetch:
+            data_access.fetch_teams(1, 2)
+        self.assertEqual(fetch.call_args.args[1], [1, 2])
+        self.assertEqual(data_access.fetch_teams(None, 2), [])
+
+
+class DerivedSeasonMetricTests(FakeSchemaMixin, SimpleTestCase):
+    schema = {
+        "player_season_data": {
+            **SCHEMA["player_season_data"],
+            "appearances": "int",
+            "starting_appearances": "int",
+            "90s_played": "float",
+        },
+    }
+    totals = {
+        "goals": [4.0, 0.0, 1.0],
+        "assists": [2.0, 1.0, np.nan],
+        "90s_played": [10.0, 0.0, 2.0],
+        "appearances": [12.0, 3.0, 4.0],
+        "starting_appearances": [9.0, 0.0, 2.0],
+    }
+    expected = {
+        "goal_contributions_90": [0.6, np.nan, np.nan],
+        "assists_90": [0.2, np.nan, np.nan],
+        "minutes_per_appearance": [75.0, 0.0, 45.0],
+        "starting_share": [0.75, 0.0, 0.5],
+    }
+
+    def test_every_definition_is_covered(self):
+        self.assertEqual(set(DERIVED_METRICS), set(self.expected))
+
+    def test_definitions_evaluate_over_season_totals(self):
+        for key, metric in DERIVED_METRICS.items():
+            with self.subTest(metric=key):
+                self.assertTrue(set(metric.columns) <= set(SEASON_TOTAL_COLUMNS))
+                np.testing.assert_allclose(metric.evaluate(self.totals), self.expected[key])
+
+    def test_per_match_columns_are_rejected(self):
+        self.assertIn("np_xg", SEASON_COLUMN_LABELS)
+        with self.assertRaisesRegex(ExpressionError, "Unknown column 'np_xg'"):
+            compile_derived_metrics(
+                {"np_xg_per_90": ("np_xg / 90s_played", "NP xG / 90", None, "float")},
+                SEASON_TOTAL_COLUMNS,
+            )
+
+    def test_season_rows_select_quoted_base_columns(self):
+        sql, _ = data_access._season_rows_query(
+            _bind_scope(1, 2), [5], ["goal_contributions_90"]
+        )
+        self.assertIn("psd.[90s_played] AS [90s_played]", sql)
+        rows = _season_rows_from_rows(
+            [{"player_id": 5, "goals": 4, "assists": 2, "90s_played": 10.0}],
+            ["goal_contributions_90"],
+        )
+        self.assertAlmostEqual(rows[0].metrics["goal_contributions_90"], 0.6)
+        self.assertEqual(len(DERIVED_METRIC_DEFINITIONS), len(DERIVED_METRICS))
+
+
+def _window_db():
+    db = sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES)
+    db.create_function("CONCAT", -1, lambda *parts: "".join(str(part) for part in parts))
+    db.executescript(
+        """
+        CREATE TABLE matches (match_id int, competition_id int, season_id int,
+                              match_date date, match_week int);
+        CREATE TABLE players (player_id int, player_name text);
+        CREATE TABLE player_match_data (player_id int, match_id int, minutes int,
+                                        goals int, np_xg real, passing_ratio real);
+        INSERT INTO matches VALUES (1, 1, 2, '2024-08-03', 1), (2, 1, 2, '2024-08-10', 2),
+                                   (3, 1, 2, '2024-08-17', 3), (4, 9, 2, '2024-08-17', 3);
+        INSERT INTO players VALUES (5, 'Anna');
+        INSERT INTO player_match_data VALUES
+            (5, 1, 90, 1, 0.4, 0.80),
+            (5, 2, 30, 1, NULL, 0.50),
+            (5, 3, 60, 0, 0.2, NULL),
+            (7, 1, 45, 0, 0.1, 0.90),
+            (7, 2, 0, 0, 0.0, NULL),
+            (5, 4, 90, 5, 3.0, 0.10);
+        """
+    )
+    return db
+
+
+class WindowAggregateTests(FakeSchemaMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        db = _window_db()
+        self.addCleanup(db.close)
+
+        def fetch_dicts(sql, params=None):
+            cursor = db.execute(sql.replace("%s", "?"), params or [])
+            columns = [column[0].lower() for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        patcher = mock.patch.object(data_access, "_fetch_dicts", fetch_dicts)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _rows(self, window):
+        rows = data_access.fetch_window_rows(1, 2, window, ["goals", "np_xg", "passing_ratio"])
+        return {row.player_id: row for row in rows}
+
+    def test_counts_per_90_and_rates_weighted_by_minutes(self):
+        anna = self._rows(MatchWindow())[5]
+        self.assertEqual(anna.player_name, "Anna")
+        self.assertEqual((anna.appearances, anna.minutes, anna.metrics["90s_played"]), (3, 180, 2.0))
+        # Zählmetrik: 2 Tore in 180 Minuten
+        self.assertAlmostEqual(anna.goals, 2 * 90 / 180)
+        # nur Minuten der Spiele mit erfasstem Wert: 0.6 xG in 150 Minuten
+        self.assertAlmostEqual(anna.np_xg, 0.6 * 90 / 150)
+        # Rate: nach Minuten gewichtet über die Spiele mit Wert
+        self.assertAlmostEqual(anna.passing_ratio, (0.8 * 90 + 0.5 * 30) / 120)
+
+    def test_window_bounds_and_players_without_minutes(self):
+        rows = self._rows(MatchWindow(week_from=2))
+        self.assertEqual(list(rows), [5])
+        self.assertAlmostEqual(rows[5].goals, 1 * 90 / 90)
+        self.assertAlmostEqual(rows[5].np_xg, 0.2 * 90 / 60)
+        self.assertAlmostEqual(rows[5].passing_ratio, 0.5)
+        by_date = self._rows(MatchWindow(date_to=date(2024, 8, 3)))
+        self.assertEqual(sorted(by_date), [5, 7])
+        self.assertAlmostEqual(by_date[7].passing_ratio, 0.9)
@@ -3,4 +3,9 @@ from . import views
 app_name = "players"
 urlpatterns = [
     path("", views.dashboard, name="dashboard"),
+    path("data/", views.dashboard_data, name="dashboard_data"),
+    path("career/<int:player_id>/", views.career, name="career"),
+    path("search/", views.search, name="search"),
+    path("similar/", views.similar, name="similar"),
+    path("export/", views.export_csv, name="export"),
 ]
\ No newline at end of file
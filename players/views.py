@@ -1,23 +1,45 @@
 from __future__ import annotations
 
+import asyncio
+import csv
+import hashlib
 import json
-from collections import defaultdict
+from functools import partial
 from typing import Iterable, Sequence
+from urllib.parse import urlencode
 
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
 from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 
+import numpy as np
+
+from core.windows import match_window as _match_window
+
+from .career import aplayer_career, sparkline_points
 from .data_access import (
+    WINDOW_INFO_COLUMNS,
+    DashboardBundle,
+    MatchColumns,
     MatchRow,
+    SeasonColumns,
     SeasonRow,
-    fetch_competitions,
-    fetch_match_rows,
-    fetch_player_positions,
-    fetch_players,
-    fetch_positions,
-    fetch_season_rows,
+    adata_version,
+    afetch_dashboard_bundle,
+    afetch_match_columns,
+    afetch_season_rows,
+    aiter_in_db_pool,
+    in_db_pool,
+    iter_match_export,
+    iter_season_export,
+    match_columns_from_rows,
 )
+from .distributions import SCALES, season_distributions
 from .labels import (
     CATEGORY_LABELS,
     COLUMN_LABELS,
@@ -25,8 +47,13 @@ from .labels import (
     PLAYER_INFO_FIELDS,
     POSITION_LABELS,
     SEASON_METRIC_CATEGORIES,
+    is_rate_metric,
     metric_definition,
 )
+from .search import asearch_players
+from .series import DEFAULT_WINDOW, MAX_WINDOW, SERIES_MODES, pivot_matches
+from .similarity import DISTANCES, asimilar_players
+from .windows import awindow_aggregates
 
 DEFAULT_SEASON_METRICS: list[str] = [
     "npg_90",
@@ -37,47 +64,93 @@ DEFAULT_SEASON_METRICS: list[str] = [
     "dribble_ratio",
 ]
 DEFAULT_MATCH_METRICS: list[str] = ["np_xg", "goals", "assists", "xgchain"]
+# Nachkommastellen im Match-Chart-JSON (Tooltips zeigen 2)
+MATCH_CHART_PRECISION = 3
+# Kader-Modus: Obergrenze, Tabellenzeilen pro Seite, Spieler in den Charts
+SQUAD_MAX_PLAYERS = 40
+SQUAD_PAGE_SIZE = 20
+SQUAD_CHART_PLAYERS = 6
+DEFAULT_PLAYER_COUNT = 2
 
 PLAYER_INFO_KEYS: list[str] = [key for key, _label in PLAYER_INFO_FIELDS]
 
 
+def _parse_competition_key(key: str | None) -> tuple[int | None, int | None]:
+    if not key:
+        return None, None
+    competition, _, season = key.partition(":")
+    try:
+        return int(competition), int(season)
+    except ValueError:
+        return None, None
+
+
 def _metric_tuple(metric: str) -> tuple[str, str, str]:
     label, _legend, fmt = metric_definition(metric)
     fmt_key = "percent" if fmt == "percent" else "number"
     return metric, label, fmt_key
 
 
-@login_required
-def dashboard(request):
-    """Zentrale Spieler-Ansicht: Filter + Vergleichsgrafiken."""
+def _window_metric_tuple(metric: str) -> tuple[str, str, str]:
+    metric, label, fmt_key = _metric_tuple(metric)
+    if metric not in WINDOW_INFO_COLUMNS and not is_rate_metric(metric):
+        label = f"{label} / 90"
+    return metric, label, fmt_key
 
-    competition_choices = fetch_competitions()
-    selected_comp_key = request.GET.get("competition")
-    valid_comp_keys = [c.key for c in competition_choices]
-    if selected_comp_key not in valid_comp_keys:
-        selected_comp_key = competition_choices[0].key if competition_choices else None
 
-    selected_competition_id: int | None = None
-    selected_season_id: int | None = None
-    if selected_comp_key:
-        selected_competition_id, selected_season_id = map(int, selected_comp_key.split(":"))
+def _dashboard_request(request) -> dict[str, object]:
+    competition_id, season_id = _parse_competition_key(request.GET.get("competition"))
+    requested_players = request.GET.getlist("players")
+    season_metric_keys = _resolve_metric_selection(
+        request.GET.getlist("season_metrics"),
+        SEASON_METRIC_CATEGORIES,
+        DEFAULT_SEASON_METRICS,
+    )
+    match_metric_keys = _resolve_metric_selection(
+        request.GET.getlist("match_metrics"),
+        MATCH_METRIC_CATEGORIES,
+        DEFAULT_MATCH_METRICS,
+    )
+    window = _match_window(request.GET)
+    # Im Zeitfenster-Modus zeigen Season-Chart und Tabelle die Match-Metriken pro 90
+    season_chart_keys = match_metric_keys if window else season_metric_keys
+    team = request.GET.get("team") or ""
+    sort_metric = request.GET.get("sort") or ""
+    season_scale = request.GET.get("season_scale") or "raw"
+    match_mode = request.GET.get("match_mode") or "raw"
+    try:
+        match_window = min(max(int(request.GET.get("match_window") or DEFAULT_WINDOW), 2), MAX_WINDOW)
+    except ValueError:
+        match_window = DEFAULT_WINDOW
+    return {
+        "competition_id": competition_id,
+        "season_id": season_id,
+        "requested_players": requested_players,
+        "requested_ids": [int(pid) for pid in requested_players if pid.isdigit()],
+        "position": request.GET.get("position") or "",
+        "team_id": int(team) if team.isdigit() else None,
+        "sort_metric": sort_metric if sort_metric in season_chart_keys else season_chart_keys[0],
+        "page": request.GET.get("page"),
+        "percentile_by_position": request.GET.get("percentiles") == "position",
+        "season_scale": season_scale if season_scale in SCALES else "raw",
+        "match_mode": match_mode if match_mode in SERIES_MODES else "raw",
+        "match_window": match_window,
+        "window": window,
+        "season_metric_keys": season_metric_keys,
+        "season_chart_keys": season_chart_keys,
+        "match_metric_keys": match_metric_keys,
+    }
 
-    available_positions = fetch_positions(selected_competition_id, selected_season_id)
-    selected_position = request.GET.get("position") or ""
-    if selected_position and selected_position not in available_positions:
+
+def _dashboard_selection(params: dict[str, object], bundle: DashboardBundle):
+    """Positionsfilter anwenden und die ausgewählten Spieler bestimmen."""
+
+    selected_position = params["position"]
+    if selected_position and selected_position not in bundle.positions:
         selected_position = ""
 
-    players = fetch_players(
-        selected_competition_id,
-        selected_season_id,
-        None,
-    )
-    position_lookup = fetch_player_positions(
-        selected_competition_id,
-        selected_season_id,
-        [int(player["player_id"]) for player in players],
-    )
-    _annotate_player_positions(players, position_lookup)
+    players = bundle.players
+    _annotate_player_positions(players, bundle.player_positions)
     if selected_position:
         players = [
             player
@@ -85,212 +158,777 @@ def dashboard(request):
             if _player_matches_position(player, selected_position)
         ]
 
-    requested_players = request.GET.getlist("players")
     available_player_ids = [str(player["player_id"]) for player in players]
-    if not requested_players:
-        requested_players = available_player_ids[:2]
+    # Standardauswahl: im Batch aufgelöst (bundle.player_ids), sonst die ersten der Liste
+    requested_players = (
+        params["requested_players"]
+        or [str(pid) for pid in bundle.player_ids]
+        or available_player_ids[:DEFAULT_PLAYER_COUNT]
+    )
     selected_player_ids = [pid for pid in requested_players if pid in available_player_ids]
+    return players, selected_position, selected_player_ids
 
-    season_metric_options = _metric_category_payload(SEASON_METRIC_CATEGORIES)
-    match_metric_options = _metric_category_payload(MATCH_METRIC_CATEGORIES)
 
-    requested_season_metrics = request.GET.getlist("season_metrics")
-    requested_match_metrics = request.GET.getlist("match_metrics")
-    season_metric_keys = _resolve_metric_selection(
-        requested_season_metrics,
-        SEASON_METRIC_CATEGORIES,
-        DEFAULT_SEASON_METRICS,
-    )
-    match_metric_keys = _resolve_metric_selection(
-        requested_match_metrics,
-        MATCH_METRIC_CATEGORIES,
-        DEFAULT_MATCH_METRICS,
+def _bundle_stats(bundle: DashboardBundle, selected_ids: Sequence[int]):
+    """Season-/Match-Daten aus dem Bundle, falls es die Auswahl abdeckt."""
+
+    if not set(selected_ids) <= set(bundle.player_ids):
+        return None
+    selected_set = set(selected_ids)
+    season_stats = [row for row in bundle.season_rows if row.player_id in selected_set]
+    _apply_player_positions(season_stats, bundle.player_positions)
+    match_stats = (
+        bundle.match_columns.select_players(selected_ids)
+        if bundle.match_columns is not None
+        else []
     )
-    season_metrics = [_metric_tuple(metric) for metric in season_metric_keys]
+    return season_stats, match_stats
+
+
+def _chart_payloads(
+    params: dict[str, object],
+    season_stats,
+    match_stats,
+    percentiles: dict[int, dict[str, float | None]] | None = None,
+    normalized: dict[int, dict[str, float | None]] | None = None,
+) -> dict[str, object]:
+    metric_tuple = _window_metric_tuple if params["window"] else _metric_tuple
+    season_metrics = [metric_tuple(metric) for metric in params["season_chart_keys"]]
     match_metrics = [
-        (metric, metric_definition(metric)[0]) for metric in match_metric_keys
+        (metric, metric_definition(metric)[0]) for metric in params["match_metric_keys"]
     ]
+    return {
+        "season_metrics": season_metrics,
+        "match_metrics": match_metrics,
+        "season_chart": _build_season_chart_payload(
+            season_stats, season_metrics, percentiles, normalized, params["season_scale"]
+        ),
+        "match_chart": _build_match_chart_payload(
+            match_stats,
+            match_metrics,
+            params["match_mode"],
+            params["match_window"],
+            MATCH_CHART_PRECISION,
+        ),
+    }
+
+
+def _season_rankings(
+    competition_id: int,
+    season_id: int,
+    player_ids: Sequence[int],
+    params: dict[str, object],
+):
+    """Perzentile und (falls gewählt) normierte Werte aus derselben gecachten Verteilung.
+
+    Nach einem Vereinswechsel beziehen sich beide auf die Zeile mit den
+    meisten Minuten, auch wenn die Tabelle die Zeile des anderen Teams zeigt.
+    """
+
+    distributions = season_distributions(competition_id, season_id)
+    metrics = params["season_metric_keys"]
+    percentiles = distributions.percentiles(player_ids, metrics, params["percentile_by_position"])
+    normalized = (
+        distributions.normalized(player_ids, metrics, params["season_scale"])
+        if params["season_scale"] != "raw"
+        else None
+    )
+    return percentiles, normalized
+
+
+_aseason_rankings = in_db_pool(_season_rankings)
+
+
+def _squad_sort_key(metric: str):
+    def key(row: SeasonRow):
+        value = _chart_value(getattr(row, metric, None))
+        return (value is None, -(value or 0.0), row.player_name)
+
+    return key
+
+
+async def _load_squad(params: dict[str, object]) -> dict[str, object]:
+    """Kader-Modus: alle Spieler eines Teams in einer Abfrage, Charts nur für die Top N."""
+
+    competition_id = params["competition_id"]
+    season_id = params["season_id"]
+    # Auswahllisten und Kaderzeilen in einem Roundtrip
+    bundle = await afetch_dashboard_bundle(
+        competition_id,
+        season_id,
+        [],
+        _season_query_metrics(params["season_metric_keys"]),
+        [],
+        team_id=params["team_id"],
+    )
+    squad_rows = bundle.season_rows
+    if bundle.competition_key != f"{competition_id}:{season_id}":
+        squad_rows = []
+    players, selected_position, _ = _dashboard_selection(params, bundle)
+    _apply_player_positions(squad_rows, bundle.player_positions)
+    # Positionsfilter wie bei der Spielerliste
+    available = {str(player["player_id"]) for player in players}
+    squad = sorted(
+        (row for row in squad_rows if str(row.player_id) in available),
+        key=_squad_sort_key(params["sort_metric"]),
+    )[:SQUAD_MAX_PLAYERS]
+    chart_rows = squad[:SQUAD_CHART_PLAYERS]
+    chart_ids = [row.player_id for row in chart_rows]
 
-    season_stats = _load_season_stats(
-        selected_competition_id,
-        selected_season_id,
-        [int(pid) for pid in selected_player_ids],
-        season_metric_keys,
+    # Die Chart-Spieler stehen erst nach der Sortierung fest -> zweiter Roundtrip
+    # (Perzentile kommen parallel aus der gecachten Verteilung)
+    match_stats, (percentiles, normalized) = await asyncio.gather(
+        _aload_match_stats(
+            competition_id, season_id, chart_ids, params["match_metric_keys"]
+        ),
+        _aseason_rankings(
+            competition_id, season_id, [row.player_id for row in squad], params
+        ),
     )
-    match_stats = _load_match_stats(
-        selected_competition_id,
-        selected_season_id,
-        [int(pid) for pid in selected_player_ids],
+    return {
+        "bundle": bundle,
+        "players": players,
+        "selected_position": selected_position,
+        "selected_player_ids": [str(pid) for pid in chart_ids],
+        "season_stats": chart_rows,
+        "table_rows": squad,
+        "match_stats": match_stats,
+        "percentiles": percentiles,
+        "normalized": normalized,
+    }
+
+
+async def _load_window(params: dict[str, object]) -> dict[str, object]:
+    """Zeitfenster-Modus: Season-Zeilen aus Matchdaten des Fensters (pro 90, gecacht)."""
+
+    competition_id = params["competition_id"]
+    season_id = params["season_id"]
+    window = params["window"]
+    # Kaderzeilen (nur Spieler-IDs) kommen im Bundle mit, die Fensterwerte aus dem Cache
+    bundle, aggregates = await asyncio.gather(
+        afetch_dashboard_bundle(
+            competition_id, season_id, [], [], [], team_id=params["team_id"]
+        ),
+        awindow_aggregates(competition_id, season_id, window),
+    )
+    if bundle.competition_key != f"{competition_id}:{season_id}":
+        aggregates = await awindow_aggregates(bundle.competition_id, bundle.season_id, window)
+        bundle.season_rows = []
+    players, selected_position, selected_player_ids = _dashboard_selection(params, bundle)
+    if params["team_id"] is not None:
+        # Kader wie im Season-Modus, sortiert nach den Fensterwerten
+        team_rows = bundle.season_rows
+        available = {str(player["player_id"]) for player in players}
+        table_rows = sorted(
+            (
+                row
+                for row in aggregates.rows_for(row.player_id for row in team_rows)
+                if str(row.player_id) in available
+            ),
+            key=_squad_sort_key(params["sort_metric"]),
+        )[:SQUAD_MAX_PLAYERS]
+        chart_rows = table_rows[:SQUAD_CHART_PLAYERS]
+        selected_player_ids = [str(row.player_id) for row in chart_rows]
+    else:
+        chart_rows = table_rows = aggregates.rows_for(
+            int(pid) for pid in selected_player_ids
+        )
+    _apply_player_positions(table_rows, bundle.player_positions)
+
+    metrics = params["season_chart_keys"]
+    chart_ids = [row.player_id for row in chart_rows]
+    match_stats = await _aload_match_stats(
+        bundle.competition_id, bundle.season_id, chart_ids, params["match_metric_keys"]
+    )
+    return {
+        "bundle": bundle,
+        "players": players,
+        "selected_position": selected_position,
+        "selected_player_ids": selected_player_ids,
+        "season_stats": chart_rows,
+        "table_rows": table_rows,
+        "match_stats": match_stats,
+        "percentiles": aggregates.scaled(
+            [row.player_id for row in table_rows], metrics, "percentile"
+        ),
+        "normalized": (
+            aggregates.scaled(chart_ids, metrics, params["season_scale"])
+            if params["season_scale"] != "raw"
+            else None
+        ),
+    }
+
+
+async def _load_dashboard(params: dict[str, object]) -> dict[str, object]:
+    """Lädt Auswahllisten und Daten der ausgewählten Spieler (HTML + JSON)."""
+
+    competition_id = params["competition_id"]
+    season_id = params["season_id"]
+    if competition_id is not None and params["window"]:
+        return await _load_window(params)
+    if competition_id is not None and params["team_id"] is not None:
+        return await _load_squad(params)
+
+    requested_ids = params["requested_ids"]
+    match_metric_keys = params["match_metric_keys"]
+    # Ein einziger Roundtrip: Ligen, Positionen, Spieler und die Zeilen der
+    # angefragten Spieler (ohne Auswahl: der Standardauswahl, im Batch
+    # aufgelöst) kommen als ein Batch mit mehreren Result-Sets.
+    load_bundle = afetch_dashboard_bundle(
+        competition_id,
+        season_id,
+        requested_ids,
+        _season_query_metrics(params["season_metric_keys"]),
         match_metric_keys,
+        columnar_matches=True,
+        # mit Positionsfilter hängt die Standardauswahl von den aufgelösten Positionen ab
+        default_players=0 if params["position"] else DEFAULT_PLAYER_COUNT,
     )
+    rankings = None
+    if competition_id is not None and requested_ids:
+        # Perzentile kommen aus der gecachten Verteilung, parallel zum Batch
+        bundle, rankings = await asyncio.gather(
+            load_bundle,
+            _aseason_rankings(competition_id, season_id, requested_ids, params),
+        )
+        if bundle.competition_key != f"{competition_id}:{season_id}":
+            rankings = None
+    else:
+        bundle = await load_bundle
 
-    season_chart = _build_season_chart_payload(season_stats, season_metrics)
-    match_chart = _build_match_chart_payload(match_stats, match_metrics)
+    players, selected_position, selected_player_ids = _dashboard_selection(params, bundle)
+    selected_ids = [int(pid) for pid in selected_player_ids]
+    stats = _bundle_stats(bundle, selected_ids)
+    if stats is None:
+        # Auswahl nicht im Batch (z. B. Standardauswahl mit Positionsfilter) -> nachladen
+        stats = await asyncio.gather(
+            _aload_season_stats(
+                bundle.competition_id,
+                bundle.season_id,
+                selected_ids,
+                params["season_metric_keys"],
+                positions=bundle.player_positions,
+            ),
+            _aload_match_stats(
+                bundle.competition_id,
+                bundle.season_id,
+                selected_ids,
+                match_metric_keys,
+            ),
+        )
+    season_stats, match_stats = stats
+    if rankings is None:
+        rankings = (
+            await _aseason_rankings(
+                bundle.competition_id, bundle.season_id, selected_ids, params
+            )
+            if selected_ids and bundle.competition_id is not None
+            else ({}, None)
+        )
+    percentiles, normalized = rankings
+    return {
+        "bundle": bundle,
+        "players": players,
+        "selected_position": selected_position,
+        "selected_player_ids": selected_player_ids,
+        "season_stats": season_stats,
+        "table_rows": season_stats,
+        "match_stats": match_stats,
+        "percentiles": percentiles,
+        "normalized": normalized,
+    }
+
+
+@login_required
+async def dashboard(request):
+    """Zentrale Spieler-Ansicht: Filter + Vergleichsgrafiken."""
+
+    params = _dashboard_request(request)
+    state = await _load_dashboard(params)
+    bundle = state["bundle"]
+    players = state["players"]
+    season_stats = state["season_stats"]
+    charts = _chart_payloads(
+        params, season_stats, state["match_stats"], state["percentiles"], state["normalized"]
+    )
+    season_metric_keys = params["season_metric_keys"]
+    # Tabelle seitenweise; nur die Zeilen der aktuellen Seite werden aufbereitet
+    table_page = Paginator(state["table_rows"], SQUAD_PAGE_SIZE).get_page(params["page"])
+    page_query = request.GET.copy()
+    page_query.pop("page", None)
+    match_metric_keys = params["match_metric_keys"]
 
     positions = [
         {
             "value": pos,
             "label": POSITION_LABELS.get(pos, pos),
         }
-        for pos in available_positions
+        for pos in bundle.positions
     ]
     selected_player_meta = _selected_player_meta(
         players,
-        selected_player_ids,
+        state["selected_player_ids"],
         season_stats,
     )
 
     context = {
-        "competition_choices": competition_choices,
+        "competition_choices": bundle.competitions,
         "players": players,
         "positions": positions,
-        "selected_competition": selected_comp_key,
-        "selected_position": selected_position,
-        "selected_players": selected_player_ids,
+        "selected_competition": bundle.competition_key,
+        "selected_position": state["selected_position"],
+        "selected_players": state["selected_player_ids"],
+        "percentile_by_position": params["percentile_by_position"],
+        "season_scale": params["season_scale"],
+        "match_mode": params["match_mode"],
+        "match_window": params["match_window"],
+        "window": params["window"],
+        "window_mode": bool(params["window"]),
+        "season_percentiles": state["percentiles"],
         "season_stats": season_stats,
-        "season_metrics": season_metrics,
-        "match_metrics": match_metrics,
+        "season_table": _season_table(
+            table_page.object_list, charts["season_metrics"], state["percentiles"]
+        ),
+        "season_table_page": table_page,
+        "page_query": page_query.urlencode(),
+        # Teams der aufgelösten Liga kamen im selben Batch wie das Bundle
+        "teams": bundle.teams,
+        "selected_team": params["team_id"],
+        "squad_mode": params["team_id"] is not None,
+        "squad_size": len(state["table_rows"]),
+        "squad_chart_players": SQUAD_CHART_PLAYERS,
+        "sort_metric": params["sort_metric"],
+        "season_metrics": charts["season_metrics"],
+        "match_metrics": charts["match_metrics"],
         "season_category_sections": _selected_metric_sections(
             season_metric_keys, SEASON_METRIC_CATEGORIES
         ),
         "match_category_sections": _selected_metric_sections(
             match_metric_keys, MATCH_METRIC_CATEGORIES
         ),
-        "season_metric_options": season_metric_options,
-        "match_metric_options": match_metric_options,
+        "season_metric_options": _metric_category_payload(SEASON_METRIC_CATEGORIES),
+        "match_metric_options": _metric_category_payload(MATCH_METRIC_CATEGORIES),
         "selected_season_metrics": season_metric_keys,
         "selected_match_metrics": match_metric_keys,
         "player_info_fields": PLAYER_INFO_FIELDS,
         "selected_player_meta": selected_player_meta,
-        "season_chart_json": json.dumps(season_chart, cls=DjangoJSONEncoder),
-        "match_chart_json": json.dumps(match_chart, cls=DjangoJSONEncoder),
+        "season_chart_json": json.dumps(charts["season_chart"], cls=DjangoJSONEncoder),
+        "match_chart_json": json.dumps(charts["match_chart"], cls=DjangoJSONEncoder),
     }
     return render(request, "players/dashboard.html", context)
 
 
-def _load_season_stats(
+def _data_etag(params: dict[str, object], stamp: str) -> str:
+    key = json.dumps(
+        [
+            stamp,
+            params["competition_id"],
+            params["season_id"],
+            params["requested_players"],
+            params["position"],
+            params["team_id"],
+            params["sort_metric"],
+            params["percentile_by_position"],
+            params["season_scale"],
+            params["match_mode"],
+            params["match_window"],
+            str(params["window"]),
+            params["season_metric_keys"],
+            params["match_metric_keys"],
+        ]
+    )
+    return quote_etag(hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+
+@login_required
+async def dashboard_data(request):
+    """Nur Chart-Payloads + Spieler-Infos als JSON (AJAX), mit ETag/304."""
+
+    params = _dashboard_request(request)
+    if params["competition_id"] is None or params["season_id"] is None:
+        return HttpResponseBadRequest("competition=<id>:<season> erforderlich.")
+
+    # Datenstand prüfen, bevor irgendetwas geladen wird
+    stamp, last_modified = await adata_version(params["competition_id"], params["season_id"])
+    etag = _data_etag(params, stamp)
+    last_modified_ts = int(last_modified.timestamp())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified_ts
+    )
+    if response is None:
+        state = await _load_dashboard(params)
+        charts = _chart_payloads(
+            params,
+            state["season_stats"],
+            state["match_stats"],
+            state["percentiles"],
+            state["normalized"],
+        )
+        response = JsonResponse(
+            {
+                "competition": state["bundle"].competition_key,
+                "position": state["selected_position"],
+                "team": params["team_id"],
+                "players": state["selected_player_ids"],
+                "season_chart": charts["season_chart"],
+                "match_chart": charts["match_chart"],
+                "selected_player_meta": _selected_player_meta(
+                    state["players"],
+                    state["selected_player_ids"],
+                    state["season_stats"],
+                ),
+            }
+        )
+    response.headers.setdefault("ETag", etag)
+    response.headers.setdefault("Last-Modified", http_date(last_modified_ts))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+async def career(request, player_id: int):
+    """Karriere eines Spielers über alle Ligen/Saisons, je Metrik mit Sparkline."""
+
+    metric_keys = _resolve_metric_selection(
+        request.GET.getlist("metrics"),
+        SEASON_METRIC_CATEGORIES,
+        DEFAULT_SEASON_METRICS,
+    )
+    history = await aplayer_career(player_id)
+    if not len(history):
+        raise Http404("Keine Saisondaten für diesen Spieler.")
+
+    rows = []
+    for metric in metric_keys:
+        label, legend, _fmt = metric_definition(metric)
+        values = history.values.get(metric)
+        if values is None:
+            continue
+        rows.append(
+            {
+                "metric": metric,
+                "label": label,
+                "legend": legend,
+                "values": [_chart_value(value) for value in values.tolist()],
+                "sparkline": sparkline_points(values),
+            }
+        )
+
+    context = {
+        "career": history,
+        "seasons": list(zip(history.seasons, history.team_names)),
+        "metric_rows": rows,
+        "season_metric_options": _metric_category_payload(SEASON_METRIC_CATEGORIES),
+        "selected_season_metrics": metric_keys,
+    }
+    return render(request, "players/career.html", context)
+
+
+@login_required
+async def similar(request):
+    """Ähnlichste Spieler zu einem Spieler (JSON), ohne SQL pro Anfrage."""
+
+    competition_id, season_id = _parse_competition_key(request.GET.get("competition"))
+    player = request.GET.get("player") or ""
+    distance = request.GET.get("distance") or "euclidean"
+    if competition_id is None or season_id is None or not player.isdigit():
+        return HttpResponseBadRequest("competition=<id>:<season> und player=<id> erforderlich.")
+    if distance not in DISTANCES:
+        return HttpResponseBadRequest("distance=euclidean|cosine erwartet.")
+
+    metrics = _resolve_metric_selection(
+        request.GET.getlist("metrics"),
+        SEASON_METRIC_CATEGORIES,
+        DEFAULT_SEASON_METRICS,
+    )
+    scopes = [
+        scope
+        for scope in map(_parse_competition_key, request.GET.getlist("scope"))
+        if scope[0] is not None
+    ]
+    try:
+        k = min(max(int(request.GET.get("k") or 10), 1), 50)
+    except ValueError:
+        k = 10
+
+    matches = await asimilar_players(
+        competition_id,
+        season_id,
+        int(player),
+        metrics,
+        k=k,
+        distance=distance,
+        scopes=scopes or None,
+        same_group=request.GET.get("group") != "all",
+    )
+    return JsonResponse(
+        {
+            "player_id": int(player),
+            "metrics": metrics,
+            "distance": distance,
+            "results": [
+                {
+                    "player_id": match.player_id,
+                    "player_name": match.player_name,
+                    "team_name": match.team_name,
+                    "competition": f"{match.competition_id}:{match.season_id}",
+                    "position_group": match.position_group,
+                    "distance": match.distance,
+                }
+                for match in matches
+            ],
+        }
+    )
+
+
+@login_required
+async def search(request):
+    """Spielersuche über alle Ligen/Saisons (Autocomplete, JSON)."""
+
+    query = (request.GET.get("q") or "").strip()
+    try:
+        limit = min(max(int(request.GET.get("limit") or 20), 1), 100)
+    except ValueError:
+        limit = 20
+    hits = await asearch_players(query, limit) if query else []
+    dashboard_url = reverse("players:dashboard")
+    return JsonResponse(
+        {
+            "query": query,
+            "results": [
+                {
+                    "player_id": hit.player_id,
+                    "player_name": hit.player_name,
+                    "competition": f"{hit.competition_id}:{hit.season_id}",
+                    "competition_label": hit.competition_label,
+                    "team_name": hit.team_name,
+                    "url": f"{dashboard_url}?"
+                    + urlencode(
+                        {
+                            "competition": f"{hit.competition_id}:{hit.season_id}",
+                            "players": hit.player_id,
+                        }
+                    ),
+                }
+                for hit in hits
+            ],
+        }
+    )
+
+
+class _Echo:
+    """File-like sink for ``csv.writer`` that hands each line straight back."""
+
+    def write(self, value):
+        return value
+
+
+@login_required
+async def export_csv(request):
+    """Streamt Season- oder Match-Daten eines ganzen Wettbewerbs als CSV."""
+
+    competition_id, season_id = _parse_competition_key(request.GET.get("competition"))
+    kind = request.GET.get("kind") or "season"
+    if competition_id is None or season_id is None or kind not in {"season", "match"}:
+        return HttpResponseBadRequest("competition=<id>:<season> und kind=season|match erforderlich.")
+
+    categories = SEASON_METRIC_CATEGORIES if kind == "season" else MATCH_METRIC_CATEGORIES
+    allowed = list(dict.fromkeys(_all_metric_keys(categories)))
+    metrics = [metric for metric in request.GET.getlist("metrics") if metric in allowed]
+    export = iter_season_export if kind == "season" else iter_match_export
+    # Seiten werden im DB-Pool gelesen, der Event-Loop bleibt frei
+    batches = aiter_in_db_pool(partial(export, competition_id, season_id, metrics or allowed))
+
+    async def rows():
+        writer = csv.writer(_Echo())
+        header_sent = False
+        async for columns, batch in batches:
+            if not header_sent:
+                header_sent = True
+                yield writer.writerow(columns)
+            for row in batch:
+                yield writer.writerow(row)
+
+    response = StreamingHttpResponse(rows(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = (
+        f'attachment; filename="players_{kind}_{competition_id}_{season_id}.csv"'
+    )
+    return response
+
+
+def _season_query_metrics(metrics: Sequence[str]) -> list[str]:
+    metric_list = list(metrics)
+    info_metrics = [key for key in PLAYER_INFO_KEYS if key not in metric_list]
+    return metric_list + info_metrics
+
+
+def _apply_player_positions(
+    rows: Sequence[SeasonRow],
+    positions: dict[int, dict[str, str | None]],
+):
+    for row in rows:
+        lookup = positions.get(row.player_id)
+        if lookup:
+            row.primary_position = lookup.get("primary_position") or row.primary_position
+            row.secondary_position = lookup.get("secondary_position") or row.secondary_position
+
+
+async def _aload_season_stats(
     competition_id: int | None,
     season_id: int | None,
     player_ids: Iterable[int],
     metrics: Sequence[str],
+    positions: dict[int, dict[str, str | None]],
 ):
+    player_ids_list = list(player_ids)
     if (
         competition_id is None
         or season_id is None
-        or not player_ids
+        or not player_ids_list
         or not metrics
     ):
         return []
 
-    metric_list = list(metrics)
-    info_metrics = [key for key in PLAYER_INFO_KEYS if key not in metric_list]
-    query_metrics = metric_list + info_metrics
-    player_ids_list = list(player_ids)
-    rows = fetch_season_rows(
+    query_metrics = _season_query_metrics(metrics)
+    rows = await afetch_season_rows(
         competition_id=int(competition_id),
         season_id=int(season_id),
         player_ids=player_ids_list,
         metrics=query_metrics,
     )
-
-    positions = fetch_player_positions(
-        competition_id,
-        season_id,
-        player_ids_list,
-    )
-    for row in rows:
-        row.metrics = {metric: row.metrics.get(metric) for metric in query_metrics}
-        lookup = positions.get(row.player_id)
-        if lookup:
-            row.primary_position = lookup.get("primary_position") or row.primary_position
-            row.secondary_position = lookup.get("secondary_position") or row.secondary_position
+    _apply_player_positions(rows, positions)
     return rows
 
 
-def _load_match_stats(
+async def _aload_match_stats(
     competition_id: int | None,
     season_id: int | None,
     player_ids: Iterable[int],
     metrics: Sequence[str],
 ):
+    player_ids_list = list(player_ids)
     if (
         competition_id is None
         or season_id is None
-        or not player_ids
+        or not player_ids_list
         or not metrics
     ):
         return []
 
-    metric_list = list(metrics)
-    rows = fetch_match_rows(
+    return await afetch_match_columns(
         competition_id=int(competition_id),
         season_id=int(season_id),
-        player_ids=list(player_ids),
-        metrics=metric_list,
+        player_ids=player_ids_list,
+        metrics=list(metrics),
     )
+
+
+def _season_table(
+    rows: Sequence[SeasonRow],
+    season_metrics: Sequence[tuple[str, str, str]],
+    percentiles: dict[int, dict[str, float | None]],
+) -> list[dict[str, object]]:
+    """Tabellenzeilen vorab aufbereiten (statt ``attr``/``dict_get`` je Zelle im Template)."""
+
+    table = []
     for row in rows:
-        row.metrics = {metric: row.metrics.get(metric) for metric in metric_list}
-    return rows
+        ranks = percentiles.get(int(row.player_id), {})
+        table.append(
+            {
+                "player_id": row.player_id,
+                "player_name": row.player_name,
+                "team_name": row.team_name,
+                "position": _format_position(row.primary_position),
+                "cells": [
+                    (_chart_value(getattr(row, metric, None)), ranks.get(metric))
+                    for metric, _, _ in season_metrics
+                ],
+            }
+        )
+    return table
 
 
 def _build_season_chart_payload(
-    season_stats: Sequence[SeasonRow],
+    season_stats: Sequence[SeasonRow] | SeasonColumns,
     season_metrics: Sequence[tuple[str, str, str]],
+    percentiles: dict[int, dict[str, float | None]] | None = None,
+    normalized: dict[int, dict[str, float | None]] | None = None,
+    scale: str = "raw",
 ):
+    """Bei ``scale != "raw"`` enthält ``data`` die normierten Werte, ``raw`` die Originale."""
+
     labels = [label for _, label, _ in season_metrics]
     formats = [fmt for _, _, fmt in season_metrics]
+    percentiles = percentiles or {}
+    if normalized is None:
+        scale = "raw"
+
+    def ranks(player_id: int) -> list[float | None]:
+        player_ranks = percentiles.get(int(player_id), {})
+        return [player_ranks.get(metric) for metric, _, _ in season_metrics]
+
+    def dataset(label: str, player_id: int, data: list[float | None]) -> dict[str, object]:
+        if scale == "raw":
+            return {"label": label, "data": data, "percentiles": ranks(player_id)}
+        scaled = normalized.get(int(player_id), {})
+        return {
+            "label": label,
+            "data": [scaled.get(metric) for metric, _, _ in season_metrics],
+            "raw": data,
+            "percentiles": ranks(player_id),
+        }
+
+    if isinstance(season_stats, SeasonColumns):
+        columns = [season_stats.column(metric) for metric, _, _ in season_metrics]
+        datasets = [
+            dataset(
+                season_stats.player_name[index],
+                season_stats.player_id[index],
+                [_chart_value(column[index]) for column in columns],
+            )
+            for index in range(len(season_stats))
+        ]
+        return {"labels": labels, "datasets": datasets, "formats": formats, "scale": scale}
     datasets = []
     for stat in season_stats:
         datasets.append(
-            {
-                "label": stat.player_name or f"Player {stat.player_id}",
-                "data": [
-                    _chart_value(getattr(stat, metric))
+            dataset(
+                stat.player_name or f"Player {stat.player_id}",
+                stat.player_id,
+                [
+                    _chart_value(getattr(stat, metric, None))
                     for metric, _, _ in season_metrics
                 ],
-            }
+            )
         )
-    return {"labels": labels, "datasets": datasets, "formats": formats}
+    return {"labels": labels, "datasets": datasets, "formats": formats, "scale": scale}
 
 
 def _build_match_chart_payload(
-    match_stats: Sequence[MatchRow],
+    match_stats: Sequence[MatchRow] | MatchColumns,
     match_metrics: Sequence[tuple[str, str]],
+    mode: str = "raw",
+    window: int = DEFAULT_WINDOW,
+    precision: int | None = None,
 ):
-    if not match_stats:
-        return {"labels": [], "metrics": {}, "players": []}
+    """Kompaktes Format: Datumsachse und Spieler einmal, je Metrik ein Array pro Spieler."""
 
-    dates = sorted({stat.match_date for stat in match_stats if stat.match_date})
-    labels = [date.strftime("%Y-%m-%d") for date in dates]
-    metric_values: dict[str, dict[int, dict[str, float | None]]] = {
-        metric: defaultdict(dict) for metric, _ in match_metrics
-    }
-    player_names: dict[int, str] = {}
-
-    for stat in match_stats:
-        date = stat.match_date
-        if not date or date not in dates:
-            continue
-        player_names[stat.player_id] = stat.player_name or f"Player {stat.player_id}"
-        for metric, _ in match_metrics:
-            metric_values[metric][stat.player_id][date.strftime("%Y-%m-%d")] = _chart_value(
-                getattr(stat, metric)
-            )
+    payload = {"labels": [], "players": [], "metrics": {}, "mode": mode, "window": window}
+    if not len(match_stats):
+        return payload
+    metrics = [metric for metric, _ in match_metrics]
+    if not isinstance(match_stats, MatchColumns):
+        match_stats = match_columns_from_rows(match_stats, metrics)
 
-    metric_payload = {}
+    pivot = pivot_matches(match_stats, metrics, mode, window)
+    payload["labels"] = np.datetime_as_string(pivot.dates, unit="D").tolist()
+    payload["players"] = pivot.player_names
     for metric, label in match_metrics:
-        datasets = []
-        for player_id in sorted(player_names, key=lambda pid: player_names[pid]):
-            player_name = player_names[player_id]
-            player_data = metric_values[metric].get(player_id, {})
-            datasets.append(
-                {
-                    "label": player_name,
-                    "data": [player_data.get(date_label) for date_label in labels],
-                }
-            )
-        metric_payload[metric] = {"label": label, "datasets": datasets}
-    return {"labels": labels, "metrics": metric_payload, "players": list(player_names.values())}
+        entry = {"label": label, "data": _chart_rows(pivot.grids[metric], precision)}
+        if metric in pivot.smoothed:
+            entry["smoothed"] = _chart_rows(pivot.smoothed[metric], precision)
+        payload["metrics"][metric] = entry
+    return payload
 
 
 def _metric_category_payload(metric_categories: dict[str, Sequence[str]]):
@@ -412,6 +1050,7 @@ def _selected_player_meta(
             _player_info_value(season_row, fallback, "secondary_position")
         )
         info: dict[str, object | None] = {
+            "player_id": int(player_id),
             "player_name": player_name,
             "primary_position": primary,
             "secondary_position": secondary,
@@ -446,6 +1085,13 @@ def _chart_value(value):
     if value is None:
         return None
     try:
-        return float(value)
+        number = float(value)
     except (TypeError, ValueError):
         return None
+    return None if number != number else number
+
+
+def _chart_rows(grid: np.ndarray, precision: int | None = None) -> list[list[float | None]]:
+    if precision is not None:
+        grid = np.round(grid, precision)
+    return [[None if value != value else value for value in row] for row in grid.tolist()]
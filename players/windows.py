@@ -0,0 +1,134 @@
+"""Cached per-90 aggregates of ``player_match_data`` over date/matchweek windows."""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Sequence
+
+import numpy as np
+
+from .data_access import (
+    WINDOW_INFO_COLUMNS,
+    MatchWindow,
+    RowSet,
+    SeasonRow,
+    data_version,
+    fetch_window_rows,
+    in_db_pool,
+    numeric_match_metrics,
+)
+from .distributions import SortedDistribution
+from .labels import MATCH_METRIC_CATEGORIES
+
+
+def window_metrics() -> list[str]:
+    """Every numeric match metric; one window query aggregates all of them."""
+    return [
+        metric
+        for metric in numeric_match_metrics(
+            [metric for metrics in MATCH_METRIC_CATEGORIES.values() for metric in metrics]
+        )
+        if metric not in WINDOW_INFO_COLUMNS
+    ]
+
+
+@dataclass(slots=True)
+class WindowAggregates:
+    """All players of one competition/season aggregated over one window."""
+
+    stamp: str
+    rows: RowSet
+    player_index: dict[int, int]
+    distribution: SortedDistribution
+
+    def rows_for(self, player_ids: Iterable[int]) -> list[SeasonRow]:
+        """Rows of *player_ids* in the given order; players without minutes are skipped."""
+        return [
+            self.rows[self.player_index[pid]]
+            for pid in (int(pid) for pid in player_ids)
+            if pid in self.player_index
+        ]
+
+    def scaled(
+        self, player_ids: Sequence[int], metrics: Sequence[str], scale: str
+    ) -> dict[int, dict[str, float | None]]:
+        """Scale (see ``distributions.SCALES``) against every player of the window."""
+        known = [int(pid) for pid in player_ids if int(pid) in self.player_index]
+        result: dict[int, dict[str, float | None]] = {pid: {} for pid in known}
+        if not known:
+            return result
+        rows = np.array([self.player_index[pid] for pid in known], dtype=np.int64)
+        digits = 1 if scale == "percentile" else 2
+        for metric in metrics:
+            column = self.rows.schema.index.get(metric)
+            if column is None:
+                continue
+            scaled = self.distribution.scale(column, self.rows.values[rows, column], scale)
+            for pid, value in zip(known, scaled.tolist()):
+                result[pid][metric] = None if value != value else round(value, digits)
+        return result
+
+
+def _build(competition_id: int, season_id: int, window: MatchWindow, stamp: str) -> WindowAggregates:
+    rows = fetch_window_rows(competition_id, season_id, window, window_metrics())
+    return WindowAggregates(
+        stamp=stamp,
+        rows=rows,
+        player_index={row.player_id: index for index, row in enumerate(rows)},
+        distribution=SortedDistribution.build(rows.values),
+    )
+
+
+class _WindowCache:
+    """LRU of :class:`WindowAggregates` per competition/season/window and data stamp."""
+
+    def __init__(self, max_windows: int = 64) -> None:
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[int, int, MatchWindow], WindowAggregates] = OrderedDict()
+        self._max_windows = max_windows
+
+    def get(self, competition_id: int, season_id: int, window: MatchWindow) -> WindowAggregates:
+        key = (int(competition_id), int(season_id), window)
+        stamp, _ = data_version(key[0], key[1])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.stamp == stamp:
+                self._entries.move_to_end(key)
+                return entry
+        entry = _build(*key, stamp)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_windows:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_windows = _WindowCache()
+
+
+def _empty_aggregates() -> WindowAggregates:
+    rows = RowSet()
+    return WindowAggregates(
+        stamp="",
+        rows=rows,
+        player_index={},
+        distribution=SortedDistribution.build(rows.values),
+    )
+
+
+def window_aggregates(
+    competition_id: int | None, season_id: int | None, window: MatchWindow
+) -> WindowAggregates:
+    """Aggregates of the window; empty when no competition/season is resolved."""
+    if competition_id is None or season_id is None:
+        return _empty_aggregates()
+    return _windows.get(competition_id, season_id, window)
+
+
+awindow_aggregates = in_db_pool(window_aggregates)
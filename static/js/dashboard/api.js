@@ -2,7 +2,7 @@
 
     Brücke zwischen Backend-Payload (JSON), App-State und DOM.
     - Holt Daten vom Endpoint (fetch) basierend auf aktuellen Filterwerten
-    - Synchronisiert Select-Optionen (Teams) und UI-Texte
+    - Synchronisiert Select-Optionen (Saisons, Teams) und UI-Texte
     - Übergibt Chart-Daten/Meta an charts.js (createChart/updateChart/syncToggles)
     - Steuert Matchday-UI (Header/Kacheln/Sichtbarkeit) über matchday.js
     - Baut die Metrikliste (Kreuzerl-Buttons) dynamisch aus der Payload
@@ -12,6 +12,7 @@
     - selectedMetricValue()        : liest die aktuell gewählte Metrik (Radio)
     - formatValue(val, fmt)        : Anzeigeformat für Werte
     - rebuildTeamOptionsFromPayload(p): synchronisiert das Team-Select mit Payload
+    - rebuildSeasonOptionsFromPayload(p): synchronisiert das Saison-Select mit Payload
     - fetchAndUpdate(pushUrl, mdOverride): holt Payload und aktualisiert UI
     - renderMetricList(options, selectedKey): erstellt die Radio-Liste rechts
 
@@ -86,6 +87,26 @@ export function rebuildTeamOptionsFromPayload(p){
   return want;
 }
 
+// Baut die Saison-Options (value = season_id) der gewählten Liga neu auf
+export function rebuildSeasonOptionsFromPayload(p){
+  const seasonSel = document.getElementById('season');
+  if (!seasonSel) return;
+  const seasons = Array.isArray(p.seasons) ? p.seasons : [];
+
+  const needRebuild =
+    seasonSel.options.length !== seasons.length ||
+    seasons.some((s,i)=> seasonSel.options[i]?.value !== String(s.id));
+
+  if (needRebuild){
+    seasonSel.innerHTML = "";
+    for (const s of seasons){
+      const o = document.createElement('option'); o.value=String(s.id); o.textContent=s.label;
+      seasonSel.appendChild(o);
+    }
+  }
+  if (p.selected_season != null) seasonSel.value = String(p.selected_season);
+}
+
 // Erzeugt die Query-String-Repräsentation der aktuellen Filterwerte
 function collectQueryString(){
   const fd = new FormData(document.getElementById('filtersForm'));
@@ -127,7 +148,8 @@ export async function fetchAndUpdate(pushUrl=true, mdOverride=null){
     document.getElementById('errorBox').innerHTML =
       p.error && !(Array.isArray(p.tiles) && p.tiles.length) ? `<div class="alert alert-warning">${p.error}</div>` : "";
 
-    // Teamliste im Select synchronisieren (und state updaten)
+    // Saison- und Teamliste im Select synchronisieren (und state updaten)
+    rebuildSeasonOptionsFromPayload(p);
     const newTeamValue = rebuildTeamOptionsFromPayload(p);
     state.lastLeague = p.selected;
     state.lastSelectedTeam = newTeamValue || state.lastSelectedTeam;
@@ -135,7 +157,6 @@ export async function fetchAndUpdate(pushUrl=true, mdOverride=null){
 
     // --- Matchday / Hinweis-Logik ---
     const teamVal   = (document.getElementById('team')?.value || 'Alle');
-    const leagueVal = (document.getElementById('league')?.value || '');
     const mdSelected = (p.selected_categories || []).includes(MATCHDAY_KEY);
 
     // Hinweiszeile (unter den Kategorien) setzen
@@ -182,6 +203,7 @@ export async function fetchAndUpdate(pushUrl=true, mdOverride=null){
       metric_format: p.metric_format || state.currentMetricFormat,
       quantiles: p.quantiles || null,
       bench: p.bench || null,
+      is_bundesliga: !!p.is_bundesliga,
     };
 
     // Team + Liga an charts.js melden (z.b. für Sichtbarkeit der Switches)
@@ -197,7 +219,7 @@ export async function fetchAndUpdate(pushUrl=true, mdOverride=null){
     }
 
     // Switches (TOP-6/Lollipop) an UI/Meta ausrichten
-    syncToggles(meta, teamVal, leagueVal);
+    syncToggles(meta, teamVal);
 
     // Query-Params in URL spiegeln (kein Reload), für Share/Refresh nützlich
     if (pushUrl) history.replaceState(null, "", location.pathname + "?" + qs);
@@ -23,7 +23,7 @@
   Exportierte Funktionen:
     - isAlle(selTeam)                 : Hilfsfunktion (Team == 'Alle'?)
     - benchAvailable(meta)            : Prüft, ob CSV-Referenzwert in Meta vorhanden ist
-    - syncToggles(meta, selTeam, leagueVal) : Sichtbarkeit & Bindings der UI-Switches
+    - syncToggles(meta, selTeam)      : Sichtbarkeit & Bindings der UI-Switches
     - createChart(chartData, meta)    : Zeichnet den Chart gemäß Daten & Meta
     - updateChart(chartData, meta)    : Einfacher Wrapper → ruft createChart
     - setLastSelectedTeam(v)          : merkt sich das zuletzt gewählte Team
@@ -31,7 +31,7 @@
 
   Wichtige Meta-Felder (vom Backend):
     meta = {
-      league_mean, team_mean, scale_hints, metric_format, quantiles, bench
+      league_mean, team_mean, scale_hints, metric_format, quantiles, bench, is_bundesliga
     }
 */
 
@@ -552,14 +552,14 @@ function attachPointClickHandler() {
 }
 
 // ---------- Toggles (UI) ----------
-export function syncToggles(meta, selTeam, leagueVal = '') {
+export function syncToggles(meta, selTeam) {
   const benchWrap  = document.getElementById('benchSwitchWrap');
   const benchInput = document.getElementById('benchSwitch');
 
   if (benchWrap) {
     const available     = benchAvailable(meta);
-    const currentLeague = leagueVal || (document.getElementById('league')?.value || '');
-    const isBundesliga  = currentLeague === 'Bundesliga';
+    // Liga-Select liefert die competition_id -> Flag kommt vom Backend (Wettbewerbsname)
+    const isBundesliga  = !!meta?.is_bundesliga;
 
     // In Bundesliga immer sichtbar; sonst nur, wenn CSV vorhanden
     benchWrap.style.display = (available || isBundesliga) ? '' : 'none';
@@ -7,7 +7,7 @@
 
   Abhängigkeiten (ES-Module, ... imports unten):
     - ./api.js        : fetchAndUpdate(payloadPush, mdOverride?) holt JSON-Payload und aktualisiert UI
-    - ./charts.js     : createChart(data, meta), syncToggles(meta, selectedTeam, league)
+    - ./charts.js     : createChart(data, meta), syncToggles(meta, selectedTeam)
     - ./matchday.js   : showMatchdayUI(visibleOrPayload) für Sichtbarkeit/Rendering der Spieltagskacheln
 
   Bootstrapping:
@@ -50,8 +50,7 @@ if (boot.initialData) {
   // Server hat bereits initiale Chartdaten gerendert -> direkt anzeigen
   createChart(boot.initialData, boot.initialMeta || {});
   // Schalter (Benchmark/Lollipop) passend zu Meta/Team/Liga setzen
-  const leagueVal = document.getElementById('league')?.value || '';
-  syncToggles(boot.initialMeta || {}, boot.selectedTeam || 'Alle', leagueVal);
+  syncToggles(boot.initialMeta || {}, boot.selectedTeam || 'Alle');
 } else {
   // Falls nichts vorgerendert wurde: Initiale Daten einmalig vom Endpoint holen
   fetchAndUpdate(false);
@@ -73,6 +72,15 @@ document.getElementById('applyBtn')?.addEventListener('click', () => {
 document.getElementById('league')?.addEventListener('change', () => {
   const teamSel = document.getElementById('team');
   if (teamSel) teamSel.value = 'Alle';
+  // Saison leeren -> Backend wählt die neueste Saison der neuen Liga
+  const seasonSel = document.getElementById('season');
+  if (seasonSel) seasonSel.innerHTML = '';
+  updateCategoryHint();
+  fetchAndUpdate(true);
+});
+
+// Saisonwechsel: neu laden (Team bleibt, falls es in der Saison vorkommt)
+document.getElementById('season')?.addEventListener('change', () => {
   updateCategoryHint();
   fetchAndUpdate(true);
 });
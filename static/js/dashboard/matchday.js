@@ -302,7 +302,7 @@ export function fillMatchdayHeader(p){
   const info = document.getElementById('mdInfo');
 
   // Titel: Team + Liga
-  if (t) t.textContent = `Spieltag – Übersicht (${p.selected_team} · ${p.selected})`;
+  if (t) t.textContent = `Spieltag – Übersicht (${p.selected_team} · ${p.selected_label || p.selected})`;
 
   // Untertitel: Datum + Heim/Auswärts + Gegner
   if (s && p.fixture){
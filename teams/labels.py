@@ -2,6 +2,8 @@
 
 import re
 
+from core.expressions import compile_derived_metrics
+
 def norm_comp_key(s: str | None) -> str:
     if not s:
         return ""
@@ -496,6 +498,24 @@ METRIC_NICHT = {
     
 }
 
+# abgeleitete Metriken: Schlüssel -> (Ausdruck, Name, Legende, Format)
+# Ausdrücke nur über Spalten aus COLUMN_LABELS / METRIC_NICHT, werden beim Import
+# einmal geparst und geprüft; im View werden die Basisspalten geladen und vektorisiert verrechnet
+DERIVED_METRIC_DEFINITIONS = {
+    "op_xg_per_op_shot": ("op_xg / op_shots", "xG pro Schuss Sp", "xG aus dem Spiel / Schüsse aus dem Spiel", "float"),
+    "opponent_op_xg_per_op_shot": ("opponent_op_xg / opponent_op_shots", "xG pro Schuss Gegner Sp", "xG des Gegners aus dem Spiel / Schüsse des Gegners aus dem Spiel", "float"),
+    "xg_total": ("op_xg + sp_xg", "xG gesamt", "xG aus dem Spiel + xG nach Standards", "float"),
+    "xg_total_diff": ("op_xg + sp_xg - opponent_op_xg - opponent_sp_xg", "xG Differenz gesamt", "xG gesamt minus xG gesamt des Gegners", "float"),
+    "pass_completion": ("successful_passes / passes", "Passquote (berechnet)", "Erfolgreiche Pässe / versuchte Pässe", "percent"),
+}
+
+DERIVED_METRICS, DERIVED_COLUMN_LABELS = compile_derived_metrics(
+    DERIVED_METRIC_DEFINITIONS, {**COLUMN_LABELS, **METRIC_NICHT}
+)
+COLUMN_LABELS.update(DERIVED_COLUMN_LABELS)
+METRIC_CATEGORIES["Abgeleitet"] = list(DERIVED_METRICS)
+CATEGORY_LABELS["Abgeleitet"] = "Abgeleitete Kennzahlen"
+
 COMPETITION_LABELS = {
     "Eredivisie": "Eredivisie, NLD 1",
     "Ligue 2": "Ligue 2, FR 2",
@@ -0,0 +1,41 @@
+"""Write the memory-mapped per-competition/season matrices of ``team_event_data``.
+
+Without arguments every (competition_id, season_id) is rewritten; the
+dashboard falls back to the database for keys without a matrix.
+"""
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from teams.services.matrix import matrix_competitions, matrix_dir, write_competition_matrix
+
+
+def _parse_key(value: str) -> tuple[int, int]:
+    try:
+        competition_id, season_id = value.split(":")
+        return int(competition_id), int(season_id)
+    except ValueError:
+        raise CommandError(f"Ungültiger Schlüssel {value!r}, erwartet <competition_id>:<season_id>.")
+
+
+class Command(BaseCommand):
+    help = "Schreibt die Spiele × Metriken-Matrizen der Team-Daten je Liga/Saison (memory-mapped)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "competitions",
+            nargs="*",
+            help="Nur diese Liga/Saison-Paare (<competition_id>:<season_id>); Standard: alle.",
+        )
+
+    def handle(self, *args, **options):
+        keys = [_parse_key(v) for v in options["competitions"]] or matrix_competitions()
+        if not keys:
+            self.stdout.write("Keine Ligen in team_event_data.")
+            return
+        for key in keys:
+            rows = write_competition_matrix(key)
+            self.stdout.write(f"{key[0]}:{key[1]} – {rows} Spiele")
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(keys)} Liga/Saison-Matrizen nach {matrix_dir()} geschrieben.")
+        )
@@ -0,0 +1,155 @@
+"""
+
+    Wettbewerbs-Registry (im Speicher) für das Teams-Dashboard:
+      - competition_registry.entries()                  : alle (competition_id, season_id) mit Namen/Label
+      - competition_registry.competitions()             : [(competition_id, Label)] fürs Liga-Select
+      - competition_registry.seasons(competition_id)    : Saisons einer Liga, neueste zuerst
+      - competition_registry.resolve(league, season)    : Eintrag zu Request-Parametern
+      - competition_label(name)                         : harmonisiertes Label eines Liganamens
+
+
+    Geladen mit EINER Abfrage (distinct competition_id, season_id, Namen) und
+    höchstens alle settings.TEAMS_DATA_VERSION_TTL Sekunden neu gelesen.
+    Namen werden nur hier (einmal je Laden) normalisiert; alle Datenabfragen
+    filtern danach über die Integer-Spalten competition_id/season_id.
+
+
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from ..labels import COMPETITION_LABELS, norm_comp_key
+from ..models import TeamEventData
+
+# vorberechnete Map der normalisierten Competition-Keys -> Label
+_COMP_LBL_NORM = { norm_comp_key(k): v for k, v in COMPETITION_LABELS.items() }
+
+
+def competition_label(name: str | None) -> str | None:
+    ''' Gibt ein konsistentes Label für einen Wettbewerbsnamen zurück:
+
+    - Exakte treffer gegen COMPETION_LABELS
+    - Fallback frü normalosierten Key (z. B. LIGAT HA''AL -> ligat ha'al)
+    - Sonst Original zurückgeben
+
+    '''
+    if not name:
+        return name
+    # exakter Treffer (bestehende gemischte Keys)
+    if name in COMPETITION_LABELS:
+        return COMPETITION_LABELS[name]
+    # normalisierter Fallback (z.B. LIGAT HA''AL -> ligat ha'al)
+    return _COMP_LBL_NORM.get(norm_comp_key(name), name)
+
+
+@dataclass(frozen=True)
+class CompetitionEntry:
+    competition_id: int
+    season_id: int
+    competition_name: str
+    season_name: str
+    label: str              # harmonisiertes Liga-Label (ohne Saison)
+
+    @property
+    def key(self) -> tuple[int, int]:
+        return (self.competition_id, self.season_id)
+
+
+def _to_int(value) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class _CompetitionRegistry:
+    """Alle Wettbewerbe/Saisons aus team_event_data, TTL-gecacht."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: dict[tuple[int, int], CompetitionEntry] | None = None
+        self._loaded_at = 0.0
+
+    def _load(self) -> dict[tuple[int, int], CompetitionEntry]:
+        ttl = float(getattr(settings, "TEAMS_DATA_VERSION_TTL", 60))
+        entries = self._entries
+        if entries is not None and time.monotonic() - self._loaded_at < ttl:
+            return entries
+        rows = (
+            TeamEventData.objects.exclude(competition_id=None).exclude(season_id=None)
+            .values_list("competition_id", "season_id", "competition_name", "season_name")
+            .distinct()
+        )
+        entries = {}
+        for competition_id, season_id, competition_name, season_name in rows:
+            key = (int(competition_id), int(season_id))
+            if key in entries:
+                continue
+            name = competition_name or f"Wettbewerb {competition_id}"
+            entries[key] = CompetitionEntry(
+                competition_id=key[0],
+                season_id=key[1],
+                competition_name=name,
+                season_name=season_name or str(season_id),
+                label=competition_label(name),
+            )
+        with self._lock:
+            self._entries = entries
+            self._loaded_at = time.monotonic()
+        return entries
+
+    def entries(self) -> list[CompetitionEntry]:
+        return list(self._load().values())
+
+    def get(self, competition_id, season_id) -> CompetitionEntry | None:
+        return self._load().get((_to_int(competition_id), _to_int(season_id)))
+
+    def competitions(self) -> list[tuple[int, str]]:
+        """(competition_id, Label) je Liga, nach Label sortiert."""
+        labels = {}
+        for entry in self.entries():
+            labels.setdefault(entry.competition_id, entry.label)
+        return sorted(labels.items(), key=lambda kv: (kv[1].casefold(), kv[0]))
+
+    def seasons(self, competition_id) -> list[CompetitionEntry]:
+        """Saisons einer Liga, neueste (Saisonname, dann season_id) zuerst."""
+        competition_id = _to_int(competition_id)
+        return sorted(
+            (e for e in self.entries() if e.competition_id == competition_id),
+            key=lambda e: (e.season_name, e.season_id),
+            reverse=True,
+        )
+
+    def resolve(self, league, season=None) -> CompetitionEntry | None:
+        """Eintrag zu ?league=<competition_id>&season=<season_id>.
+
+        `league` darf (für alte Links) auch ein Liganame sein; ohne gültige
+        Saison gilt die neueste der Liga, ohne gültige Liga die erste.
+        """
+        competition_id = _to_int(league)
+        if competition_id is None and league:
+            wanted = norm_comp_key(league)
+            competition_id = next(
+                (e.competition_id for e in self.entries() if norm_comp_key(e.competition_name) == wanted),
+                None,
+            )
+        seasons = self.seasons(competition_id) if competition_id is not None else []
+        if not seasons:
+            competitions = self.competitions()
+            if not competitions:
+                return None
+            seasons = self.seasons(competitions[0][0])
+        season_id = _to_int(season)
+        return next((e for e in seasons if e.season_id == season_id), seasons[0])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = None
+
+
+competition_registry = _CompetitionRegistry()
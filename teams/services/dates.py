@@ -0,0 +1,48 @@
+"""
+
+    Typisierte Spieldaten für team_event_data (Datum/Spieltag aus matches):
+      - with_match_dates(qs)   : annotiert played_on (Datum) und match_week aus matches
+      - chronological(qs)      : sortiert in der Datenbank nach Spieldatum, match_id
+      - in_window(qs, window)  : filtert das Fenster in der Datenbank
+      - format_date(d)         : Anzeige "dd.mm.YYYY" ("" ohne Datum)
+
+
+    team_event_data.match_date ist ein Textfeld (Sortierung nach String,
+    Parsen je Zeile in Python). matches.match_date ist ein echtes DATE und
+    über den Join auf match_id (Primärschlüssel) erreichbar; Sortierung und
+    Fensterfilter laufen damit in der Datenbank und können dort über einen
+    Index auf matches(match_date) / matches(match_week) bedient werden.
+
+
+"""
+from __future__ import annotations
+
+from django.db.models import F
+
+from core.windows import MatchWindow
+
+
+def with_match_dates(qs):
+    """`played_on` (DateField) und `match_week` aus dem gejointen Spiel."""
+    return qs.annotate(played_on=F("match__match_date"), match_week=F("match__match_week"))
+
+
+def chronological(qs):
+    return qs.order_by("match__match_date", "match_id")
+
+
+def in_window(qs, window: MatchWindow):
+    """Grenzen inklusive; ohne Fenster bleibt `qs` unverändert."""
+    if window.date_from is not None:
+        qs = qs.filter(match__match_date__gte=window.date_from)
+    if window.date_to is not None:
+        qs = qs.filter(match__match_date__lte=window.date_to)
+    if window.week_from is not None:
+        qs = qs.filter(match__match_week__gte=window.week_from)
+    if window.week_to is not None:
+        qs = qs.filter(match__match_week__lte=window.week_to)
+    return qs
+
+
+def format_date(d) -> str:
+    return d.strftime("%d.%m.%Y") if d else ""
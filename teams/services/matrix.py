@@ -0,0 +1,297 @@
+"""
+
+    Spaltencache je Liga/Saison auf der Platte (memory-mapped, von allen Workern geteilt):
+      - write_competition_matrix(key): Matrix + Index-Arrays einer Liga/Saison schreiben
+      - team_matrix(key)             : TeamMatrix lesen (None, falls nicht gebaut)
+      - matrix_competitions()        : alle (competition_id, season_id) in team_event_data
+
+
+    key = (competition_id, season_id). Pro Schlüssel ein Verzeichnis
+    "<competition_id>_<season_id>" unter settings.TEAMS_MATRIX_DIR mit je
+    einem Unterverzeichnis pro geschriebener Version und der Zeigerdatei
+    "current" (Name der gültigen Version). Eine Version enthält:
+      values.npy    float32, Spiele × Metriken (NaN = kein Wert)
+      team.npy      int32, Index in meta["names"]
+      opponent.npy  int32, Index in meta["names"] (-1 = unbekannt)
+      date.npy      datetime64[D] (NaT = unbekannt)
+      match_id.npy  int64
+      meta.json     Spalten, Namen, Zeilenbereiche je Team, Datenstand, Erstellzeit
+
+    Zeilen sind nach Team, Datum, match_id sortiert; die Spiele eines Teams
+    sind also ein zusammenhängender Slice. Die .npy-Dateien werden mit
+    mmap_mode="r" geöffnet: alle Prozesse teilen sich dieselben Seiten aus
+    dem Page-Cache, ohne Kopie. Geschrieben wird in ein neues
+    Versionsverzeichnis; erst danach wird "current" per os.replace (atomar)
+    umgestellt, Leser sehen also immer eine vollständige Version. Die
+    vorherige Version bleibt für laufende Requests liegen, ältere werden
+    beim nächsten Schreiben entfernt. Aktualisiert wird über
+    `manage.py build_team_matrices` (z. B. nach jedem Datenimport).
+    meta["stamp"] ist der Datenstand (quantiles.data_stamp) beim Schreiben;
+    weicht league_stamp() davon ab, ignoriert die View die Matrix.
+
+
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Case, CharField, F, When
+
+from ..labels import DERIVED_METRICS
+from ..models import TeamEventData
+from .quantiles import data_stamp, quantile_summary
+from .snapshot import snapshot_columns
+
+_ARRAYS = ("values", "team", "opponent", "date", "match_id")
+_POINTER = "current"
+
+
+def matrix_dir() -> Path:
+    return Path(
+        getattr(settings, "TEAMS_MATRIX_DIR", None)
+        or Path(settings.BASE_DIR) / "data" / "team_matrices"
+    )
+
+
+def _slug(key) -> str:
+    """Verzeichnisname für (competition_id, season_id), z. B. (7, 317) -> "7_317"."""
+    competition_id, season_id = key
+    return f"{int(competition_id)}_{int(season_id)}"
+
+
+def _current_version(base: Path) -> str | None:
+    try:
+        return (base / _POINTER).read_text(encoding="utf-8").strip() or None
+    except OSError:
+        return None
+
+
+def _prune(base: Path, keep: set[str]) -> None:
+    """Entfernt alles außer Zeiger und den Versionen in `keep` (auch alte Layouts ohne Zeiger)."""
+    for child in base.iterdir():
+        if child.name == _POINTER or child.name in keep:
+            continue
+        if child.is_dir():
+            shutil.rmtree(child, ignore_errors=True)
+        else:
+            child.unlink(missing_ok=True)
+
+
+def write_competition_matrix(key) -> int:
+    """Schreibt die Matrix einer Liga/Saison neu und gibt die Anzahl Zeilen zurück."""
+    competition_id, season_id = key
+    columns = snapshot_columns()
+    league_qs = TeamEventData.objects.filter(competition_id=competition_id, season_id=season_id)
+    stamp = data_stamp(league_qs)
+    rows = list(
+        league_qs
+        .annotate(
+            opponent_name=Case(
+                When(team_name=F("match__home_team_name"), then=F("match__away_team_name")),
+                default=F("match__home_team_name"),
+                output_field=CharField(),
+            )
+        )
+        .order_by("team_name", "match__match_date", "match_id")
+        .values_list("team_name", "opponent_name", "match__match_date", "match_id", *columns)
+    )
+
+    names: dict[str, int] = {}
+    team_codes, opponent_codes = [], []
+    for row in rows:
+        team_codes.append(names.setdefault(row[0], len(names)))
+        opponent_codes.append(-1 if row[1] is None else names.setdefault(row[1], len(names)))
+    team = np.asarray(team_codes, dtype=np.int32)
+    values = np.array(
+        [[np.nan if v is None else v for v in row[4:]] for row in rows], dtype=np.float32
+    ).reshape(len(rows), len(columns))
+
+    # Zeilenbereich je Team (Zeilen sind nach Team sortiert)
+    team_rows = {}
+    for code in dict.fromkeys(team_codes):
+        hits = np.flatnonzero(team == code)
+        team_rows[str(code)] = [int(hits[0]), int(hits[-1]) + 1]
+
+    arrays = {
+        "values": values,
+        "team": team,
+        "opponent": np.asarray(opponent_codes, dtype=np.int32),
+        # Datum aus matches (DateField); None -> NaT
+        "date": np.array([r[2] for r in rows], dtype="datetime64[D]"),
+        "match_id": np.array([r[3] or 0 for r in rows], dtype=np.int64),
+    }
+    meta = {
+        "competition_id": int(competition_id),
+        "season_id": int(season_id),
+        "columns": columns,
+        "names": list(names),
+        "team_rows": team_rows,
+        "stamp": list(stamp),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+    base = matrix_dir() / _slug(key)
+    previous = _current_version(base)
+    version = f"{time.time_ns():x}"
+    target = base / version
+    target.mkdir(parents=True)
+    for name, array in arrays.items():
+        np.save(target / f"{name}.npy", array)
+    with open(target / "meta.json", "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, ensure_ascii=False)
+
+    # Zeiger atomar umstellen; bis dahin lesen alle Prozesse die vorherige Version
+    pointer_tmp = base / f"{_POINTER}.{os.getpid()}.tmp"
+    pointer_tmp.write_text(version, encoding="utf-8")
+    os.replace(pointer_tmp, base / _POINTER)
+    _prune(base, {version, previous})
+    return len(rows)
+
+
+class TeamMatrix:
+    """Lesezugriff auf die gemappte Matrix einer Liga/Saison (unveränderlich je Dateistand)."""
+
+    def __init__(self, path: Path, meta: dict):
+        self.path = path
+        self.version = path.name
+        self.columns: list[str] = meta["columns"]
+        self.column_index = {c: i for i, c in enumerate(self.columns)}
+        self.names: list[str] = meta["names"]
+        self.created = meta.get("created")
+        # Datenstand beim Schreiben (ältere Matrizen ohne Stamp gelten als veraltet)
+        self.stamp = tuple(meta["stamp"]) if meta.get("stamp") is not None else None
+        # Zeilen ohne team_name zählen für Liga-Mittel und Quantile, sind aber kein Team
+        self.team_slices = {
+            self.names[int(code)]: slice(start, end)
+            for code, (start, end) in meta["team_rows"].items()
+            if self.names[int(code)] is not None
+        }
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in _ARRAYS}
+        self.values = arrays["values"]
+        self.team = arrays["team"]
+        self.opponent = arrays["opponent"]
+        self.date = arrays["date"]
+        self.match_id = arrays["match_id"]
+        self._quantiles: dict[str, dict[str, float] | None] = {}
+
+    @property
+    def teams(self) -> list[str]:
+        return sorted(self.team_slices)
+
+    def has_metric(self, metric: str) -> bool:
+        return all(c in self.column_index for c in self._base_columns(metric))
+
+    def _base_columns(self, metric: str) -> tuple[str, ...]:
+        derived = DERIVED_METRICS.get(metric)
+        return derived.columns if derived is not None else (metric,)
+
+    def _means(self, metric: str, rows) -> float:
+        """Mittel über `rows`; abgeleitete Metriken über die Mittel der Basisspalten."""
+        means = {}
+        for c in self._base_columns(metric):
+            column = np.asarray(self.values[rows, self.column_index[c]], dtype=np.float64)
+            means[c] = np.nanmean(column) if np.any(~np.isnan(column)) else np.nan
+        derived = DERIVED_METRICS.get(metric)
+        if derived is None:
+            return float(means[metric])
+        return float(derived.evaluate({c: [v] for c, v in means.items()})[0])
+
+    def metric_values(self, metric: str, rows=slice(None)) -> np.ndarray:
+        """Einzelwerte je Spiel (float64, NaN = kein Wert)."""
+        derived = DERIVED_METRICS.get(metric)
+        if derived is None:
+            return np.asarray(self.values[rows, self.column_index[metric]], dtype=np.float64)
+        return derived.evaluate(
+            {c: self.values[rows, self.column_index[c]] for c in derived.columns}
+        )
+
+    def team_averages(self, metric: str) -> list[tuple[str, float]]:
+        """Teammittel der Metrik, absteigend sortiert, ohne Teams ohne Wert."""
+        items = [(t, self._means(metric, rows)) for t, rows in self.team_slices.items()]
+        return sorted([(t, v) for t, v in items if v == v], key=lambda kv: -kv[1])
+
+    def league_average(self, metric: str) -> float | None:
+        value = self._means(metric, slice(None))
+        return None if value != value else value
+
+    def quantiles(self, metric: str) -> dict[str, float] | None:
+        """p10/p25/p75/p90 über alle Spiele der Liga (je Metrik einmal berechnet)."""
+        if metric not in self._quantiles:
+            self._quantiles[metric] = quantile_summary(self.metric_values(metric).tolist())
+        return self._quantiles[metric]
+
+    def team_rows(self, team: str, metrics) -> list[dict]:
+        """Spiele eines Teams chronologisch, im Format von `values("played_on", "opponent_name", ...)`."""
+        rows = self.team_slices.get(team)
+        if rows is None:
+            return []
+        dates = self.date[rows].tolist()
+        opponents = [self.names[code] if code >= 0 else None for code in self.opponent[rows].tolist()]
+        columns = {m: self.metric_values(m, rows).tolist() for m in metrics}
+        return [
+            {
+                "played_on": d,
+                "opponent_name": opp,
+                **{m: (None if columns[m][i] != columns[m][i] else columns[m][i]) for m in metrics},
+            }
+            for i, (d, opp) in enumerate(zip(dates, opponents))
+        ]
+
+
+class _MatrixCache:
+    """Geöffnete Matrizen je Liga/Saison; neu geöffnet, sobald "current" auf eine neue Version zeigt."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: dict[str, TeamMatrix] = {}
+
+    def get(self, key) -> TeamMatrix | None:
+        base = matrix_dir() / _slug(key)
+        version = _current_version(base)
+        if version is None:
+            return None
+        entry = self._entries.get(base.name)
+        if entry is not None and entry.version == version:
+            return entry
+        path = base / version
+        try:
+            with open(path / "meta.json", encoding="utf-8") as fh:
+                meta = json.load(fh)
+            entry = TeamMatrix(path, meta)
+        except (OSError, ValueError, KeyError):
+            # Version inzwischen entfernt oder unvollständig -> ORM-Pfad
+            return None
+        with self._lock:
+            self._entries[base.name] = entry
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_matrices = _MatrixCache()
+
+
+def team_matrix(key) -> TeamMatrix | None:
+    """Gemappte Matrix der Liga/Saison, None, wenn (noch) keine geschrieben wurde."""
+    if not key:
+        return None
+    return _matrices.get(key)
+
+
+def matrix_competitions() -> list[tuple[int, int]]:
+    """Alle (competition_id, season_id) mit Daten in team_event_data (Ziel für das Schreiben)."""
+    return list(
+        TeamEventData.objects.exclude(competition_id=None).exclude(season_id=None)
+        .values_list("competition_id", "season_id")
+        .distinct().order_by("competition_id", "season_id")
+    )
@@ -0,0 +1,128 @@
+"""
+
+    Liga-Quantile (p10/p25/p75/p90) je (Liga/Saison, Metrik), vorberechnet:
+      - league_quantiles(competition, qs, metric, load_values): Quantile aus dem Cache
+      - quantile_summary(values)                              : Quantile einer Werteliste
+      - data_stamp(qs)                                         : billiger Datenstand einer Liga
+      - league_stamp(competition, qs)                          : Datenstand, TTL-gecacht
+
+
+    Beim ersten Zugriff auf eine Metrik werden die Einzelwerte der Liga einmal
+    geladen und nur die vier Quantile gespeichert; jede weitere Anfrage ist ein
+    Dict-Lookup. Der Datenstand (Zeilen, Spiele, letzte match_id) wird höchstens
+    alle settings.TEAMS_DATA_VERSION_TTL Sekunden geprüft; ändert er sich, wird
+    der Cache der Liga verworfen. `competition` ist der Cache-Schlüssel
+    (competition_id, season_id) der bereits gefilterten `qs`.
+
+
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+
+QUANTILES = (("p10", 0.10), ("p25", 0.25), ("p75", 0.75), ("p90", 0.90))
+
+
+def quantile_summary(values) -> dict[str, float] | None:
+    """p10/p25/p75/p90 mit linearer Interpolation (wie percentile()), None ohne Werte."""
+    vals = np.asarray([v for v in values if v is not None], dtype=float)
+    vals = vals[~np.isnan(vals)]
+    if not len(vals):
+        return None
+    qs = np.quantile(vals, [p for _, p in QUANTILES])
+    return {key: float(v) for (key, _), v in zip(QUANTILES, qs.tolist())}
+
+
+def data_stamp(qs) -> tuple:
+    """Ein Aggregat über die (bereits gefilterte) Liga; ändert sich bei neuen/entfernten Spielen."""
+    row = qs.aggregate(rows=Count("pk"), matches=Count("match_id", distinct=True), last=Max("match_id"))
+    return (row["rows"], row["matches"], row["last"])
+
+
+# Obergrenze je Cache (LRU): die Schlüssel kommen aus dem Querystring
+MAX_CACHED_KEYS = 256
+
+
+class _LeagueStamps:
+    """Datenstand je Liga; höchstens alle TEAMS_DATA_VERSION_TTL Sekunden neu gelesen (LRU)."""
+
+    def __init__(self, max_keys: int = MAX_CACHED_KEYS):
+        self._lock = threading.Lock()
+        self._stamps: OrderedDict[object, tuple[tuple, float]] = OrderedDict()
+        self._max_keys = max_keys
+
+    def get(self, competition, qs) -> tuple:
+        ttl = float(getattr(settings, "TEAMS_DATA_VERSION_TTL", 60))
+        with self._lock:
+            cached = self._stamps.get(competition)
+            if cached is not None and time.monotonic() - cached[1] < ttl:
+                self._stamps.move_to_end(competition)
+                return cached[0]
+        stamp = data_stamp(qs)
+        with self._lock:
+            self._stamps[competition] = (stamp, time.monotonic())
+            self._stamps.move_to_end(competition)
+            while len(self._stamps) > self._max_keys:
+                self._stamps.popitem(last=False)
+        return stamp
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stamps.clear()
+
+
+_league_stamps = _LeagueStamps()
+
+
+def league_stamp(competition, qs) -> tuple:
+    return _league_stamps.get(competition, qs)
+
+
+class _LeagueQuantiles:
+    """Quantile je Liga und Metrik, gültig solange der Datenstand der Liga gleich bleibt (LRU)."""
+
+    def __init__(self, max_keys: int = MAX_CACHED_KEYS):
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[object, tuple[tuple, dict[str, dict[str, float] | None]]] = OrderedDict()
+        self._max_keys = max_keys
+
+    def get(self, competition, qs, metric: str, load_values):
+        stamp = league_stamp(competition, qs)
+        with self._lock:
+            entry = self._entries.get(competition)
+            if entry is not None and entry[0] == stamp and metric in entry[1]:
+                self._entries.move_to_end(competition)
+                return entry[1][metric]
+        summary = quantile_summary(load_values())
+        with self._lock:
+            entry = self._entries.get(competition)
+            if entry is None or entry[0] != stamp:
+                entry = (stamp, {})
+                self._entries[competition] = entry
+            entry[1][metric] = summary
+            self._entries.move_to_end(competition)
+            while len(self._entries) > self._max_keys:
+                self._entries.popitem(last=False)
+        return summary
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_league_quantiles = _LeagueQuantiles()
+
+
+def league_quantiles(competition, qs, metric: str, load_values):
+    """Quantile der Metrik über alle Spiele der Liga.
+
+    `qs` ist das nach Liga gefilterte QuerySet (nur für den Datenstand),
+    `load_values()` liefert bei Cache-Miss die Einzelwerte.
+    """
+    return _league_quantiles.get(competition, qs, metric, load_values)
@@ -0,0 +1,149 @@
+"""
+
+    Liga-Snapshot: Teams × Metriken in EINER Abfrage, je Liga gecacht:
+      - league_snapshot(competition, qs): Snapshot aus dem Cache (oder neu gebaut)
+      - LeagueSnapshot.team_averages(metric)  : [(Team, Mittel)], absteigend
+      - LeagueSnapshot.league_average(metric) : Mittel über alle Spiele der Liga
+
+
+    Eine `GROUP BY team_name`-Abfrage liefert je numerischer Spalte SUM und
+    COUNT (NULL zählt nicht). Daraus ergeben sich Teammittel und das
+    Ligamittel über alle Spiele, ohne weitere Abfragen beim Metrikwechsel.
+    Abgeleitete Metriken werden über die Mittel ihrer Basisspalten ausgewertet.
+    Gültig, solange der Datenstand der Liga (league_stamp) gleich bleibt.
+
+
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+from django.db import models
+from django.db.models import Count, Sum
+
+from ..labels import COLUMN_LABELS, DERIVED_METRICS, METRIC_NICHT
+from ..models import TeamEventData
+from .quantiles import MAX_CACHED_KEYS, league_stamp
+
+_NUMERIC_FIELDS = (models.IntegerField, models.FloatField, models.DecimalField)
+
+
+def snapshot_columns() -> list[str]:
+    """Numerische Spalten von TeamEventData, die als (Basis-)Metrik gelabelt sind."""
+    return [
+        f.attname
+        for f in TeamEventData._meta.concrete_fields
+        if isinstance(f, _NUMERIC_FIELDS)
+        and not f.primary_key
+        and (f.attname in COLUMN_LABELS or f.attname in METRIC_NICHT)
+    ]
+
+
+@dataclass
+class LeagueSnapshot:
+    stamp: tuple
+    teams: list[str]
+    column_index: dict[str, int]
+    sums: np.ndarray        # Teams × Spalten, Summe der Spielwerte
+    counts: np.ndarray      # Teams × Spalten, Anzahl Spiele mit Wert
+
+    def _columns(self, metric: str) -> tuple[str, ...] | None:
+        derived = DERIVED_METRICS.get(metric)
+        columns = derived.columns if derived is not None else (metric,)
+        return columns if all(c in self.column_index for c in columns) else None
+
+    def _evaluate(self, metric: str, sums: np.ndarray, counts: np.ndarray) -> np.ndarray | None:
+        columns = self._columns(metric)
+        if columns is None:
+            return None
+        with np.errstate(invalid="ignore", divide="ignore"):
+            averages = {c: sums[..., self.column_index[c]] / counts[..., self.column_index[c]] for c in columns}
+        derived = DERIVED_METRICS.get(metric)
+        if derived is None:
+            return np.atleast_1d(averages[metric])
+        return derived.evaluate({c: np.atleast_1d(v) for c, v in averages.items()})
+
+    def team_averages(self, metric: str) -> list[tuple[str, float]]:
+        """Teammittel der Metrik, absteigend sortiert, ohne Teams ohne Wert."""
+        values = self._evaluate(metric, self.sums, self.counts)
+        if values is None:
+            return []
+        items = [(t, v) for t, v in zip(self.teams, values.tolist()) if v == v]
+        return sorted(items, key=lambda kv: -kv[1])
+
+    def league_average(self, metric: str) -> float | None:
+        """Mittel über alle Spiele der Liga (nicht Mittel der Teammittel)."""
+        values = self._evaluate(metric, self.sums.sum(axis=0), self.counts.sum(axis=0))
+        if values is None:
+            return None
+        value = float(values[0])
+        return None if value != value else value
+
+
+def _build(qs, stamp: tuple) -> LeagueSnapshot:
+    columns = snapshot_columns()
+    aggregates = {}
+    for c in columns:
+        aggregates[f"sum_{c}"] = Sum(c)
+        aggregates[f"n_{c}"] = Count(c)
+    rows = list(qs.order_by().values("team_name").annotate(**aggregates).order_by("team_name"))
+    sums = np.array(
+        [[np.nan if r[f"sum_{c}"] is None else float(r[f"sum_{c}"]) for c in columns] for r in rows],
+        dtype=float,
+    ).reshape(len(rows), len(columns))
+    counts = np.array([[r[f"n_{c}"] for c in columns] for r in rows], dtype=float).reshape(
+        len(rows), len(columns)
+    )
+    # Teams ohne Wert: Summe 0 statt NaN, damit das Ligamittel nicht kippt
+    sums[counts == 0] = 0.0
+    return LeagueSnapshot(
+        stamp=stamp,
+        teams=[r["team_name"] for r in rows],
+        column_index={c: i for i, c in enumerate(columns)},
+        sums=sums,
+        counts=counts,
+    )
+
+
+class _SnapshotCache:
+    """Ein LeagueSnapshot je Liga und Datenstand (LRU, höchstens `max_keys` Schlüssel).
+
+    Gebaut wird außerhalb des Locks (wie in quantiles.py); der Lock schützt
+    nur das Nachschlagen und Eintragen, andere Ligen warten nie auf einen Build.
+    """
+
+    def __init__(self, max_keys: int = MAX_CACHED_KEYS):
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[object, LeagueSnapshot] = OrderedDict()
+        self._max_keys = max_keys
+
+    def get(self, competition, qs) -> LeagueSnapshot:
+        stamp = league_stamp(competition, qs)
+        with self._lock:
+            entry = self._entries.get(competition)
+            if entry is not None and entry.stamp == stamp:
+                self._entries.move_to_end(competition)
+                return entry
+        entry = _build(qs, stamp)
+        with self._lock:
+            self._entries[competition] = entry
+            self._entries.move_to_end(competition)
+            while len(self._entries) > self._max_keys:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_snapshots = _SnapshotCache()
+
+
+def league_snapshot(competition, qs) -> LeagueSnapshot:
+    """Snapshot der (bereits nach Liga/Saison gefilterten) `qs`, gecacht unter
+    `competition` = (competition_id, season_id)."""
+    return _snapshots.get(competition, qs)
@@ -1,3 +1,262 @@
-from django.test import TestCase
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.http import QueryDict
+from django.test import SimpleTestCase, override_settings
+
+from core.windows import MatchWindow
+
+from . import views
+from .services import matrix, quantiles, snapshot
+from .services.competitions import CompetitionEntry, _CompetitionRegistry, competition_label
+
+
+class QuantileSummaryTests(SimpleTestCase):
+    def test_linear_quantiles_without_missing_values(self):
+        summary = quantiles.quantile_summary([1, None, 2, 3, 4, 5, float("nan")])
+        self.assertEqual(summary, {"p10": 1.4, "p25": 2.0, "p75": 4.0, "p90": 4.6})
+        self.assertIsNone(quantiles.quantile_summary([None]))
+
+
+@override_settings(TEAMS_DATA_VERSION_TTL=60)
+class LeagueQuantileCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.stamp = (10, 2, 99)
+        patcher = mock.patch.object(quantiles, "data_stamp", lambda qs: self.stamp)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.stamps = quantiles._LeagueStamps(max_keys=2)
+        patcher = mock.patch.object(quantiles, "_league_stamps", self.stamps)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = quantiles._LeagueQuantiles(max_keys=2)
+        self.loads = []
+
+    def _get(self, competition, metric="xg"):
+        def load_values():
+            self.loads.append((competition, metric))
+            return [1.0, 2.0, 3.0]
+
+        return self.cache.get(competition, None, metric, load_values)
+
+    def test_values_are_loaded_once_per_league_and_metric(self):
+        self._get((1, 1))
+        self._get((1, 1))
+        self._get((1, 1), "shots")
+        self.assertEqual(self.loads, [((1, 1), "xg"), ((1, 1), "shots")])
+
+    def test_a_new_data_stamp_drops_the_league(self):
+        self._get((1, 1))
+        self.stamp = (11, 3, 100)
+        self.stamps.clear()
+        self._get((1, 1))
+        self.assertEqual(len(self.loads), 2)
+
+    def test_caches_keep_the_most_recent_keys(self):
+        self._get((1, 1))
+        self._get((1, 2))
+        self._get((1, 1))
+        self._get((1, 3))
+        self.assertEqual(list(self.cache._entries), [(1, 1), (1, 3)])
+        self.assertEqual(list(self.stamps._stamps), [(1, 1), (1, 3)])
+        self._get((1, 2))
+        self.assertEqual(self.loads[-1], ((1, 2), "xg"))
+
+
+class LeagueSnapshotTests(SimpleTestCase):
+    def setUp(self):
+        # zwei Teams, Spalten xg und shots; Team B ohne shots-Wert
+        self.snapshot = snapshot.LeagueSnapshot(
+            stamp=(1,),
+            teams=["A", "B"],
+            column_index={"xg": 0, "shots": 1},
+            sums=np.array([[3.0, 20.0], [1.0, 0.0]]),
+            counts=np.array([[2.0, 2.0], [2.0, 0.0]]),
+        )
+
+    def test_team_and_league_averages(self):
+        self.assertEqual(self.snapshot.team_averages("xg"), [("A", 1.5), ("B", 0.5)])
+        self.assertEqual(self.snapshot.team_averages("shots"), [("A", 10.0)])
+        self.assertEqual(self.snapshot.league_average("xg"), 1.0)
+        self.assertEqual(self.snapshot.team_averages("unknown"), [])
+        self.assertIsNone(self.snapshot.league_average("unknown"))
+
+
+class SnapshotCacheTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(snapshot, "league_stamp", lambda competition, qs: (1,))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_builds_do_not_block_other_leagues(self):
+        started, release = threading.Event(), threading.Event()
+
+        def build(qs, stamp):
+            if qs == "slow":
+                started.set()
+                release.wait(5)
+            return mock.Mock(stamp=stamp)
+
+        cache = snapshot._SnapshotCache()
+        with mock.patch.object(snapshot, "_build", build):
+            slow = threading.Thread(target=cache.get, args=((1, 1), "slow"))
+            slow.start()
+            self.assertTrue(started.wait(5))
+            try:
+                # eine andere Liga wartet nicht auf den laufenden Build
+                self.assertEqual(cache.get((2, 2), "fast").stamp, (1,))
+            finally:
+                release.set()
+                slow.join(5)
+        self.assertEqual(set(cache._entries), {(1, 1), (2, 2)})
+
+    def test_cache_is_bounded_and_reused(self):
+        cache = snapshot._SnapshotCache(max_keys=1)
+        with mock.patch.object(snapshot, "_build", side_effect=lambda qs, stamp: mock.Mock(stamp=stamp)) as build:
+            first = cache.get((1, 1), None)
+            self.assertIs(cache.get((1, 1), None), first)
+            cache.get((1, 2), None)
+            cache.get((1, 1), None)
+        self.assertEqual(build.call_count, 3)
+        self.assertEqual(list(cache._entries), [(1, 1)])
+
+
+class TeamMatrixTests(SimpleTestCase):
+    def _matrix(self, names, team_rows, values):
+        path = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        n = len(values)
+        np.save(path / "values.npy", np.asarray(values, dtype=np.float32).reshape(n, 1))
+        np.save(path / "team.npy", np.zeros(n, dtype=np.int32))
+        np.save(path / "opponent.npy", np.full(n, -1, dtype=np.int32))
+        np.save(path / "date.npy", np.array([None] * n, dtype="datetime64[D]"))
+        np.save(path / "match_id.npy", np.arange(n, dtype=np.int64))
+        meta = {"columns": ["xg"], "names": names, "team_rows": team_rows, "stamp": [1]}
+        return matrix.TeamMatrix(path, meta)
+
+    def test_rows_without_team_name_are_not_a_team(self):
+        team_matrix = self._matrix(
+            [None, "B", "A"], {"0": [0, 1], "1": [1, 2], "2": [2, 4]}, [9.0, 1.0, 2.0, 4.0]
+        )
+        self.assertEqual(team_matrix.teams, ["A", "B"])
+        self.assertEqual(team_matrix.team_averages("xg"), [("A", 3.0), ("B", 1.0)])
+        # das Ligamittel enthält weiterhin alle Spiele
+        self.assertEqual(team_matrix.league_average("xg"), 4.0)
+
+
+def _entry(competition_id, season_id, competition_name, season_name):
+    return CompetitionEntry(
+        competition_id=competition_id,
+        season_id=season_id,
+        competition_name=competition_name,
+        season_name=season_name,
+        label=competition_label(competition_name),
+    )
+
+
+ENTRIES = {
+    entry.key: entry
+    for entry in (
+        _entry(1, 10, "Bundesliga", "2024/2025"),
+        _entry(1, 20, "Bundesliga", "2023/2024"),
+        _entry(3, 30, "2. Liga", "2024/2025"),
+    )
+}
+
+
+def _registry():
+    registry = _CompetitionRegistry()
+    registry._load = lambda: ENTRIES
+    return registry
+
+
+class CompetitionRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = _registry()
+
+    def test_resolve_by_ids(self):
+        self.assertEqual(self.registry.resolve("1", "20").key, (1, 20))
+        self.assertEqual(self.registry.resolve(3, 30).key, (3, 30))
+
+    def test_newest_season_without_a_valid_season(self):
+        self.assertEqual(self.registry.resolve("1").key, (1, 10))
+        self.assertEqual(self.registry.resolve("1", "30").key, (1, 10))
+        self.assertEqual(self.registry.resolve("1", "abc").key, (1, 10))
+
+    def test_legacy_league_names(self):
+        self.assertEqual(self.registry.resolve("Bundesliga").key, (1, 10))
+        self.assertEqual(self.registry.resolve("BUNDESLIGA", "20").key, (1, 20))
+
+    def test_unknown_league_falls_back_to_the_first_label(self):
+        first_id = self.registry.competitions()[0][0]
+        self.assertEqual(self.registry.resolve("999").competition_id, first_id)
+        self.assertEqual(self.registry.resolve(None).competition_id, first_id)
+
+    def test_competitions_and_seasons(self):
+        self.assertEqual(
+            sorted(self.registry.competitions()),
+            [(1, competition_label("Bundesliga")), (3, competition_label("2. Liga"))],
+        )
+        self.assertEqual([e.season_id for e in self.registry.seasons("1")], [10, 20])
+
+    def test_matrix_directory_per_key(self):
+        self.assertEqual(matrix._slug((7, 317)), "7_317")
+
+
+class _League:
+    teams = ["Rapid", "Viola"]
+
+    def team_averages(self, metric):
+        return [("Viola", 2.0), ("Rapid", 1.0)]
+
+
+class ComputePayloadKeyTests(SimpleTestCase):
+    """Die View schlüsselt Caches und Matrix über (competition_id, season_id)."""
+
+    def setUp(self):
+        self.snapshot = mock.Mock(return_value=_League())
+        self.matrix = mock.Mock(return_value=None)
+        patcher = mock.patch.multiple(
+            views,
+            competition_registry=_registry(),
+            league_snapshot=self.snapshot,
+            team_matrix=self.matrix,
+            _load_bundesliga_benchmark=mock.Mock(return_value={}),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _payload(self, query):
+        return views._compute_payload(QueryDict(query))
+
+    def test_ids_select_competition_and_season(self):
+        payload = self._payload("league=3&season=30")
+        self.matrix.assert_called_once_with((3, 30))
+        self.assertEqual(self.snapshot.call_args.args[0], (3, 30))
+        self.assertEqual(payload["selected"], 3)
+        self.assertEqual(payload["selected_season"], 30)
+        self.assertEqual(payload["seasons"], [{"id": 30, "label": "2024/2025"}])
+        self.assertEqual(payload["selected_label"], f"{competition_label('2. Liga')} 2024/2025")
+        self.assertFalse(payload["is_bundesliga"])
+        self.assertEqual(payload["teams"], ["Rapid", "Viola"])
+        self.assertEqual(payload["chart_data"]["labels"], ["Viola", "Rapid"])
+
+    def test_legacy_league_name_and_bundesliga_flag(self):
+        payload = self._payload("league=Bundesliga")
+        self.assertEqual(self.snapshot.call_args.args[0], (1, 10))
+        self.assertEqual(payload["selected"], 1)
+        self.assertEqual(payload["selected_season"], 10)
+        self.assertTrue(payload["is_bundesliga"])
+
+    def test_window_extends_the_key_and_skips_the_matrix(self):
+        payload = self._payload("league=1&season=20&week_to=3")
+        self.matrix.assert_not_called()
+        self.assertEqual(self.snapshot.call_args.args[0], (1, 20, MatchWindow(week_to=3)))
+        self.assertEqual(payload["window"]["week_to"], 3)
+
+    def test_unknown_team_falls_back_to_all(self):
+        payload = self._payload("league=1&team=Sturm")
+        self.assertEqual(payload["selected_team"], "Alle")
@@ -24,13 +24,12 @@ Wichtige Endpunkte:
 import json
 import os, csv
 from pathlib import Path
-from datetime import datetime
 from math import floor, ceil
 
 # ------ Django Imports ---------------------------------------------------------------
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.db.models import Avg, Case, When, F, CharField
+from django.db.models import Case, When, F, CharField
 from django.http import JsonResponse
 from django.shortcuts import render
 
@@ -40,56 +39,25 @@ from .labels import (
     METRIC_CATEGORIES,          # Mapping: Kategorie -> [metric Key]
     METRIC_NICHT,               # Set/Mapping nicht anzuzeigender Metriken , werden aber geladen, falls irgendwann benötigt
     CATEGORY_LABELS,            # Mapping: Kategoriename -> schönere Anzeigename
-    COMPETITION_LABELS          # Mapping: Ligabezeichnung -> Labels
+    DERIVED_METRICS,            # Mapping: abgeleitete Metrik -> kompilierter Ausdruck über Basisspalten
 )
 
 # ------ Data-Models ---------------------------------------------------------------
 from .models import TeamEventData
 
+# ------ Vorberechnete Liga-Kennzahlen (Quantile, Teams × Metriken) -----------------
+from .services.quantiles import league_quantiles, league_stamp
+from .services.snapshot import league_snapshot
+from .services.matrix import team_matrix
 
-import re
+# ------ Wettbewerbe/Saisons (IDs -> Namen/Labels, im Speicher) ---------------------
+from .services.competitions import competition_registry
 
-# Regex für unterschiedliche Apostroph Varianten, ggf. mehrfach hintereinander, ("LIGAT HA’’AL" -> "LIGAT HA'AL")
-_APOS_MULTI = re.compile(r"[\u2019\u2018`´']+")
+# ------ Spieldatum/Spieltag aus matches (DATE, Sortierung/Filter in der Datenbank) ---
+from .services.dates import chronological, format_date, in_window, with_match_dates
 
-def _norm_comp_key(s: str | None) -> str:
-    ''' Normalisiert einen Wettbewerbs-/Ligabezeichner für robuste Vergleiche
-
-    - Trimmt Whitespace
-    - Vereinheitlicht verschiedenartige Apostrophe zu '\"
-    - Entfernt überflüssige Leerzeichen um Apostrophe
-    - Reduziert Mehrfach Leerzeichen
-    - casefold() für Sprachunabhängige Klein-/Großschhreibung 
-    
-    '''
-    if not s:
-        return ""
-    s = s.strip()
-    s = _APOS_MULTI.sub("'", s)          # alle Varianten + Mehrfach-’ -> '
-    s = re.sub(r"\s*'\s*", "'", s)       # Leerzeichen um Apostroph entfernen
-    s = re.sub(r"\s+", " ", s)           # Mehrfachspaces
-    return s.casefold()
-
-
-# vorberechnete Map der normalisierten Competition-Keys -> Label
-_COMP_LBL_NORM = { _norm_comp_key(k): v for k, v in COMPETITION_LABELS.items() }
-
-
-def _comp_label(name: str | None) -> str | None:
-    ''' Gibt ein konsistentes Label für einen Wettbewerbsnamen zurück:
-
-    - Exakte treffer gegen COMPETION_LABELS
-    - Fallback frü normalosierten Key (z. B. LIGAT HA''AL -> ligat ha'al)
-    - Sonst Original zurückgeben
-
-    '''
-    if not name:
-        return name
-    # exakter Treffer (bestehende gemischte Keys)
-    if name in COMPETITION_LABELS:
-        return COMPETITION_LABELS[name]
-    # normalisierter Fallback (z.B. LIGAT HA''AL -> ligat ha'al)
-    return _COMP_LBL_NORM.get(_norm_comp_key(name), name)
+# ------ Zeitfenster (?window_from/…/week_to), geteilt mit dem Players-Dashboard -----
+from core.windows import match_window
 
 
 # --- Defaults -----------------------------------------------------------------
@@ -231,19 +199,47 @@ def _scale_hints(values, metric_format: str):
         "suggestedMax": float(smax),
     }
 
+# --- Abgeleitete Metriken -----------------------------------------------------
+# Abgeleitete Metriken sind keine DB-Spalten: geladen werden ihre Basisspalten,
+# der Ausdruck wird danach vektorisiert ausgewertet (Mittelwerte: Ausdruck über
+# die Mittel der Basisspalten, z. B. xG/Schuss = Summe xG / Summe Schüsse).
+def _metric_columns(metric: str) -> tuple[str, ...]:
+    derived = DERIVED_METRICS.get(metric)
+    return derived.columns if derived is not None else (metric,)
+
+
+def _add_derived_values(rows: list[dict], metric: str) -> list[dict]:
+    """Ergänzt row[metric] für abgeleitete Metriken (eine Auswertung für alle Zeilen)."""
+    derived = DERIVED_METRICS.get(metric)
+    if derived is not None and rows:
+        values = derived.evaluate({c: [r.get(c) for r in rows] for c in derived.columns})
+        for row, value in zip(rows, values.tolist()):
+            row[metric] = None if value != value else value
+    return rows
+
+
+def _metric_values(qs, metric: str) -> list[float]:
+    """Alle Einzelwerte (pro Spiel) der Metrik in der Liga, ohne None."""
+    derived = DERIVED_METRICS.get(metric)
+    if derived is None:
+        return [float(v) for v in qs.values_list(metric, flat=True) if v is not None]
+    rows = list(qs.values_list(*derived.columns))
+    values = derived.evaluate({c: [r[i] for r in rows] for i, c in enumerate(derived.columns)})
+    return [v for v in values.tolist() if v == v]
+
+
 # --- Matchday Payload ---------------------------------------------------------
 def _build_matchday_overview(qs, selected_team: str, params):
     """
     Baut die Kachel-Übersicht für EIN Spiel (Donut + Mini-Bars) für das ausgewählte Team.
 
-    Erwartet: `qs` ist bereits nach Liga gefiltert (competition_name).
+    Erwartet: `qs` ist bereits nach Liga und Saison (und ggf. Zeitfenster) gefiltert.
     Auswahl des Spieltags:
     - Wenn ?md=<match_id> im Querystring vorhanden: dieses Spiel
     - Sonst: das jüngste Spiel.
     """
     team_qs = (
-        qs.filter(team_name=selected_team)
-        .order_by("match_date", "match_id")
+        chronological(with_match_dates(qs.filter(team_name=selected_team)))
         .select_related("match")
         .annotate(
             # Gegnername in Abhängigkeit von Heim/Auswärts
@@ -257,7 +253,7 @@ def _build_matchday_overview(qs, selected_team: str, params):
     # Holen nur die Felder, die wir für die Kacheln wollen, jederzeit änderbar
     rows = list(
         team_qs.values(
-            "match_id", "match_date", "opponent_name",
+            "match_id", "played_on", "match_week", "opponent_name",
             "goals", "opponent_goals",
             "possession", "opponent_possession",
             "successful_passes", "opponent_successful_passes",
@@ -283,14 +279,11 @@ def _build_matchday_overview(qs, selected_team: str, params):
     # # Liste aller Spieltage (Label für Dropdown/Select)
     md_list = []
     for i, r in enumerate(rows, start=1):
-        d = r.get("match_date")
-        try:
-            d_str = d.strftime("%d.%m.%Y")
-        except Exception:
-            d_str = str(d) if d else ""
+        d_str = format_date(r["played_on"])
+        md = r["match_week"] or i                               # Spieltag aus matches, sonst laufende Nummer
         home_team = r["match__home_team_name"]
         ha = "H" if (home_team == selected_team) else "A"      # Heim/Auswärts-Kürzel
-        md_list.append({"id": str(r["match_id"]), "label": f"MD{i:02d} – {ha} – {r.get('opponent_name') or '?'} – {d_str}"})
+        md_list.append({"id": str(r["match_id"]), "label": f"MD{md:02d} – {ha} – {r.get('opponent_name') or '?'} – {d_str}"})
 
     # Ausgewähltes Spiel bestimmen
     md_param = params.get("md")
@@ -306,10 +299,7 @@ def _build_matchday_overview(qs, selected_team: str, params):
     row = rows[idx]
 
     # Header-Infos (Datum, Heim/Auswärts, Tore, xG), kann man noch schöner machen
-    try:
-        date_pretty = row["match_date"].strftime("%d.%m.%Y") if row.get("match_date") else ""
-    except Exception:
-        date_pretty = str(row.get("match_date") or "")
+    date_pretty = format_date(row["played_on"])
     home_team = row["match__home_team_name"]
     home_away = "H" if (home_team == selected_team) else "A"
 
@@ -359,26 +349,48 @@ def _compute_payload(params):
 
 
     Erwartete Parameter (GET):
-    - league: Wettbewerbs-/Liga-Name
+    - league: competition_id (alte Links mit Liga-Namen werden aufgelöst)
+    - season: season_id (Default: neueste Saison der Liga)
     - team: Teamname (oder "Alle" für Ligavergleich)
     - categories: Liste von Kategorien (z. B. Core_ALLE, Spieltag_Übersicht, ...)
     - metric: ausgewählter metrischer Key
     - md: (optional) match_id für die Matchday-Ansicht
+    - window_from/window_to, week_from/week_to: (optional) Zeitfenster über
+      matches.match_date bzw. matches.match_week
     """
-    # --- verfügbare Ligen laden ---
-    competitions = list(
-        TeamEventData.objects.values_list("competition_name", flat=True)
-        .distinct().order_by("competition_name")
-    )
-    selected = params.get("league") or (competitions[0] if competitions else None)
+    # --- Liga/Saison über die Registry auflösen (keine Abfrage je Request) ---
+    entry = competition_registry.resolve(params.get("league"), params.get("season"))
+    selected = entry.competition_id if entry else None
+    key = entry.key if entry else None
 
-    # Basis-QuerySet ggf. nach Liga filtern
+    # Basis-QuerySet nach Liga UND Saison filtern (Integer-Prädikate)
     qs = TeamEventData.objects.all()
-    if selected:
-        qs = qs.filter(competition_name=selected)
-
-    # Teams der Liga (für Auswahl-UI)
-    teams_in_league = list(qs.values_list("team_name", flat=True).distinct().order_by("team_name"))
+    if entry:
+        qs = qs.filter(competition_id=entry.competition_id, season_id=entry.season_id)
+    else:
+        qs = qs.none()
+
+    # optionales Zeitfenster (Datum/Spieltag) in der Datenbank filtern;
+    # Snapshot/Quantile werden dann je Fenster gecacht, die Matrix deckt nur die ganze Saison ab
+    window = match_window(params)
+    if window:
+        qs = in_window(qs, window)
+        if key:
+            key = (*key, window)
+
+    # Memory-mapped Matrix der Liga/Saison (manage.py build_team_matrices), sonst Datenbank
+    # (nur solange ihr Datenstand dem der Liga entspricht, sonst z. B. nach einem Import veraltet)
+    matrix = None if window else team_matrix(key)
+    if matrix is not None and matrix.stamp != league_stamp(key, qs):
+        matrix = None
+
+    # Teams der Liga (für Auswahl-UI), aus Matrix bzw. Liga-Snapshot
+    if matrix is not None:
+        teams_in_league = matrix.teams
+    elif key:
+        teams_in_league = league_snapshot(key, qs).teams
+    else:
+        teams_in_league = []
 
     # Team-Auswahl validieren
     selected_team = params.get("team") or "Alle"
@@ -435,10 +447,14 @@ def _compute_payload(params):
         if not selected:
             error = "Keine Liga ausgewählt."
         else:
+            # Matrix nur nutzen, wenn sie die Metrik enthält (z. B. nach Schemaänderung)
+            if matrix is not None and not matrix.has_metric(metric):
+                matrix = None
+            # Teammittel/Ligamittel: Matrix-Slices oder Liga-Snapshot (gleiche Schnittstelle)
+            league = matrix if matrix is not None else league_snapshot(key, qs)
             if selected_team == "Alle":
-                # Ligenvergleich: Teamdurchschnitt der Metrik
-                team_avgs_qs = qs.values("team_name").annotate(val=Avg(metric)).order_by("-val")
-                items = [(r["team_name"], r["val"]) for r in team_avgs_qs if r["val"] is not None]
+                # Ligenvergleich: Teamdurchschnitt der Metrik (beim Metrikwechsel keine Abfrage)
+                items = league.team_averages(metric)
                 if items:
                     labels = [t for t, _ in items]
                     values = [round(float(v), 6) for _, v in items]
@@ -460,11 +476,10 @@ def _compute_payload(params):
                     error = "Keine Daten für Plot gefunden."
             else:
                 # Zeitreihe für EIN Team: Werte je Spieltag
-                league_mean = qs.aggregate(val=Avg(metric))["val"]
+                league_mean = league.league_average(metric)
 
                 team_qs = (
-                    qs.filter(team_name=selected_team)
-                    .order_by("match_date")
+                    chronological(with_match_dates(qs.filter(team_name=selected_team)))
                     .select_related("match")
                     .annotate(
                         opponent_name=Case(
@@ -480,20 +495,19 @@ def _compute_payload(params):
                 if include_opponent_pressures:
                     extra_fields.append("opponent_pressures")
 
-                value_rows = list(
-                    team_qs.values("match_date", "opponent_name", metric, *extra_fields)
-                )
+                if matrix is not None:
+                    value_rows = matrix.team_rows(selected_team, [metric, *extra_fields])
+                else:
+                    value_rows = _add_derived_values(
+                        list(team_qs.values("played_on", "opponent_name", *_metric_columns(metric), *extra_fields)),
+                        metric,
+                    )
 
                 labels, values = [], []
                 overlay_values = [] if include_opponent_pressures else None
                 for row in value_rows:
                     opp = row.get("opponent_name") or "?"
-                    d = row.get("match_date")
-                    try:
-                        date_pretty = d.strftime("%d.%m.%Y") if isinstance(d, datetime) else (d or "")
-                    except Exception:
-                        date_pretty = str(d) if d is not None else ""
-                    labels.append(f"{opp} – {date_pretty}")
+                    labels.append(f"{opp} – {format_date(row['played_on'])}")
                     val = row.get(metric)
                     values.append(None if val is None else round(float(val), 6))
                     if overlay_values is not None:
@@ -536,16 +550,12 @@ def _compute_payload(params):
                 else:
                     error = "Keine Daten für diese Mannschaft / Metrik gefunden."
 
-                # Quantile über ALLE Spiele der Liga (nicht nur das Team)
-                vals = [float(v) for v in qs.values_list(metric, flat=True) if v is not None]
-                if vals:
-                    vals.sort()
-                    quantiles = {
-                        "p10": _percentile(vals, 0.10),
-                        "p25": _percentile(vals, 0.25),
-                        "p75": _percentile(vals, 0.75),
-                        "p90": _percentile(vals, 0.90),
-                    }
+                # Quantile über ALLE Spiele der Liga (nicht nur das Team);
+                # einmal je Liga/Metrik berechnet, danach aus dem Cache
+                if matrix is not None:
+                    quantiles = matrix.quantiles(metric)
+                else:
+                    quantiles = league_quantiles(key, qs, metric, lambda: _metric_values(qs, metric))
     # Skalenhinweise für das Frontend (Chart.js) berechnen
     scale_hints = None
     if chart_data and chart_data.get("datasets"):
@@ -556,7 +566,8 @@ def _compute_payload(params):
 
     # CSV-Referenz (nur für Bundesliga AUT sichtbar)
     bench = None
-    if selected == "Bundesliga" and metric:
+    is_bundesliga = bool(entry and entry.competition_name == "Bundesliga")
+    if is_bundesliga and metric:
         bench_map = _load_bundesliga_benchmark() or {}
         if metric in bench_map:
             bench = {"label": "CSV-Referenz", "value": float(bench_map[metric])}
@@ -564,6 +575,9 @@ def _compute_payload(params):
     # --- Basis-Payload (Charts + Metrikliste) ---
     payload = {
         "selected": selected,
+        "selected_season": entry.season_id if entry else None,
+        "window": window.as_dict(),
+        "seasons": [{"id": e.season_id, "label": e.season_name} for e in competition_registry.seasons(selected)],
         "selected_team": selected_team,
         "selected_categories": selected_categories,
         "metrics_options": [{"key": k, "label": lbl} for k, lbl in metrics_options],
@@ -579,9 +593,10 @@ def _compute_payload(params):
         "error": error,
         "teams": teams_in_league,
         "bench": bench,
+        "is_bundesliga": is_bundesliga,
     }
-    # zusätzlich: hübsches Label für die ausgewählte Liga
-    payload["selected_label"] = _comp_label(selected)
+    # zusätzlich: hübsches Label für die ausgewählte Liga (inkl. Saison)
+    payload["selected_label"] = f"{entry.label} {entry.season_name}" if entry else None
 
     # --- Matchday-Felder anfügen (nur wenn gewünscht & Team != "Alle") ---
     if want_matchday and selected and selected_team != "Alle":
@@ -626,40 +641,31 @@ def league_dashboard(request):
         ("Standards – Ecken", ["Ecken_Off", "ecken_def"]),
         ("Standards – Einwürfe", ["standards_einwürfe_off", "standards_einwürfe_def"]),
         ("Torwart", ["GK_Off", "GK_def"]),
+        ("Abgeleitet", ["Abgeleitet"]),
     ]
     # (Gruppe, [(KategorieKey, Anzeigmamne)])
     grouped_categories = [
         (group, [(cat, CATEGORY_LABELS.get(cat, cat)) for cat in cats]) for group, cats in category_groups
     ]
 
-    # Ligen und Teams erneut für die Selects laden (könnte man aus payload nehmen.... 
-    # hier wird es direkt aus dem Modell ermittelt, ist aber logisch äquivalent, muss man nicht ändern)
-    competitions = list(
-        TeamEventData.objects.values_list("competition_name", flat=True)
-        .distinct().order_by("competition_name")
-    )
-    qs = TeamEventData.objects.all()
-    if payload["selected"]:
-        qs = qs.filter(competition_name=payload["selected"])
-    teams_in_league = list(qs.values_list("team_name", flat=True).distinct().order_by("team_name"))
-    
-    # Paare (value, label) fürs Liga-Select (value = Raw-Name, label = harmonisiert)
-    competitions = list(
-        TeamEventData.objects.values_list("competition_name", flat=True)
-        .distinct().order_by("competition_name")
-    )
+    # Teams der Liga kommen aus der Payload (Liga-Snapshot, keine weitere Abfrage)
+    teams_in_league = payload["teams"]
 
-    competitions_view = [(c, _comp_label(c)) for c in competitions]
+    # Paare (value, label) fürs Liga-/Saison-Select (value = ID, label = harmonisiert)
+    competitions_view = competition_registry.competitions()
+    seasons_view = [(s["id"], s["label"]) for s in payload["seasons"]]
 
 
     # Kontext fürs Template
     context = {
-        "competitions_view": competitions_view, 
-        "competitions": competitions,
+        "competitions_view": competitions_view,
+        "seasons_view": seasons_view,
         "teams": ["Alle"] + teams_in_league,
         "grouped_categories": grouped_categories,
         "selected": payload["selected"],
-        "selected_label": _comp_label(payload["selected"]),
+        "selected_season": payload["selected_season"],
+        "window": payload["window"],
+        "selected_label": payload["selected_label"],
         "selected_team": payload["selected_team"],
         "selected_categories": payload["selected_categories"],
         "metrics_options": [(m["key"], m["label"]) for m in payload["metrics_options"]],
@@ -676,6 +682,7 @@ def league_dashboard(request):
             "metric_format": payload["metric_format"],
             "quantiles": payload.get("quantiles"),
             "bench": payload.get("bench"),
+            "is_bundesliga": payload["is_bundesliga"],
         }),
         "error": payload["error"],
     }